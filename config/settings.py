@@ -23,14 +23,53 @@ class Settings:
         self.API_HASH = os.getenv("API_HASH", "d2cba6d5c5a9b6b7c8d9e0f1a2b3c4d5")
         self.BOT_TOKEN = os.getenv("BOT_TOKEN", "")
         
+        # دیتابیس
+        self.DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{self.DATA_DIR / 'bot.db'}")
+        self.DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+        self.DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        self.STATS_FLUSH_INTERVAL = float(os.getenv("STATS_FLUSH_INTERVAL", "5"))  # ثانیه
+        
         # ادمین‌ها
         self.ADMIN_IDS = [int(id.strip()) for id in os.getenv("ADMIN_IDS", "").split(",") if id.strip()]
         
         # محدودیت‌ها
         self.MAX_FILE_SIZE = 2 * 1024 * 1024 * 1024  # 2GB
-        self.MAX_CONCURRENT_DOWNLOADS = 3
-        self.DOWNLOAD_SPEED_LIMIT = 50 * 1024 * 1024  # 50 MB/s
-        self.UPLOAD_SPEED_LIMIT = 20 * 1024 * 1024   # 20 MB/s
+        self.MAX_CONCURRENT_DOWNLOADS = 3  # برای هر کاربر
+        self.DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "8"))  # سقف کل دانلودهای همزمان
+        self.DOWNLOAD_MAX_ATTEMPTS = int(os.getenv("DOWNLOAD_MAX_ATTEMPTS", "3"))  # اجراهای قطع شده هر کار پیش از failed
+        
+        # سقف پهنای باند (بایت بر ثانیه، 0 = بدون محدودیت): کل پروسه و هر اکانت
+        self.DOWNLOAD_SPEED_LIMIT = int(os.getenv("DOWNLOAD_SPEED_LIMIT", str(50 * 1024 * 1024)))  # 50 MB/s
+        self.UPLOAD_SPEED_LIMIT = int(os.getenv("UPLOAD_SPEED_LIMIT", str(20 * 1024 * 1024)))      # 20 MB/s
+        self.ACCOUNT_DOWNLOAD_SPEED_LIMIT = int(os.getenv("ACCOUNT_DOWNLOAD_SPEED_LIMIT", "0"))
+        self.ACCOUNT_UPLOAD_SPEED_LIMIT = int(os.getenv("ACCOUNT_UPLOAD_SPEED_LIMIT", "0"))
+        
+        # فاصله ویرایش پیام‌های پیشرفت (ثانیه؛ پس از FloodWait خودکار بیشتر می‌شود)
+        self.PROGRESS_UPDATE_INTERVAL = float(os.getenv("PROGRESS_UPDATE_INTERVAL", "3"))
+        
+        # استخر اتصال HTTP مشترک
+        self.HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+        self.HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "16"))
+        
+        # اجرای هش و رمزنگاری خارج از event loop
+        self.OFFLOAD_THREADS = int(os.getenv("OFFLOAD_THREADS", "4"))
+        self.OFFLOAD_PROCESSES = int(os.getenv("OFFLOAD_PROCESSES", "0"))  # 0 = غیرفعال
+        
+        # دانلود موازی مدیای تلگرام
+        self.PARALLEL_MEDIA_DOWNLOAD = os.getenv("PARALLEL_MEDIA_DOWNLOAD", "false").lower() == "true"
+        self.PARALLEL_MEDIA_WINDOW = int(os.getenv("PARALLEL_MEDIA_WINDOW", "8"))
+        
+        # انتقال مستقیم دانلود به آپلود بدون نوشتن روی دیسک
+        self.STREAM_RELAY = os.getenv("STREAM_RELAY", "false").lower() == "true"
+        self.STREAM_RELAY_BUFFER_PARTS = int(os.getenv("STREAM_RELAY_BUFFER_PARTS", "16"))  # × 512KB
+        
+        # اتصال تنبل کلاینت اکانت‌ها (سقف اتصال‌های همزمان و زمان قطع پس از بیکاری به ثانیه)
+        self.CLIENT_POOL_SIZE = int(os.getenv("CLIENT_POOL_SIZE", "50"))
+        self.CLIENT_IDLE_TIMEOUT = float(os.getenv("CLIENT_IDLE_TIMEOUT", "600"))
+        
+        # کش محتوای دانلود شده (حجم به بایت، 0 = غیرفعال)
+        self.MEDIA_CACHE_DIR = Path(os.getenv("MEDIA_CACHE_DIR", str(self.DATA_DIR / "cache")))
+        self.MEDIA_CACHE_SIZE = int(os.getenv("MEDIA_CACHE_SIZE", str(5 * 1024 * 1024 * 1024)))  # 5GB
         
         # تنظیمات امنیتی
         self.SESSION_ENCRYPTION_KEY = os.getenv("SESSION_ENCRYPTION_KEY", self._generate_encryption_key())
@@ -1,88 +1,92 @@
 # database/crud.py
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from .models import User, DownloadTask, SystemLog
 
 class CRUDOperations:
-    """عملیات CRUD برای دیتابیس"""
+    """عملیات CRUD برای دیتابیس (روی AsyncSession از db.get_async_session)"""
     
     @staticmethod
-    async def create_user(session: Session, user_data: Dict[str, Any]) -> User:
+    async def create_user(session: AsyncSession, user_data: Dict[str, Any]) -> User:
         """ایجاد کاربر جدید"""
         user = User(**user_data)
         session.add(user)
-        session.commit()
-        session.refresh(user)
+        await session.commit()
+        await session.refresh(user)
         return user
-    
+        
     @staticmethod
-    async def get_user_by_id(session: Session, user_id: int) -> Optional[User]:
+    async def get_user_by_id(session: AsyncSession, user_id: int) -> Optional[User]:
         """دریافت کاربر با شناسه"""
-        return session.query(User).filter(User.user_id == user_id).first()
-    
+        result = await session.execute(select(User).where(User.user_id == user_id))
+        return result.scalars().first()
+        
     @staticmethod
-    async def update_user(session: Session, user_id: int, 
+    async def update_user(session: AsyncSession, user_id: int,
                          update_data: Dict[str, Any]) -> Optional[User]:
         """به‌روزرسانی کاربر"""
-        user = session.query(User).filter(User.user_id == user_id).first()
+        user = await CRUDOperations.get_user_by_id(session, user_id)
         if user:
             for key, value in update_data.items():
                 setattr(user, key, value)
             user.last_activity = datetime.utcnow()
-            session.commit()
-            session.refresh(user)
+            await session.commit()
+            await session.refresh(user)
         return user
-    
+        
     @staticmethod
-    async def create_download_task(session: Session, task_data: Dict[str, Any]) -> DownloadTask:
+    async def create_download_task(session: AsyncSession, task_data: Dict[str, Any]) -> DownloadTask:
         """ایجاد کار دانلود جدید"""
         task = DownloadTask(**task_data)
         session.add(task)
-        session.commit()
-        session.refresh(task)
+        await session.commit()
+        await session.refresh(task)
         return task
-    
+        
     @staticmethod
-    async def get_active_downloads(session: Session, user_id: int) -> List[DownloadTask]:
+    async def get_active_downloads(session: AsyncSession, user_id: int) -> List[DownloadTask]:
         """دریافت دانلودهای فعال کاربر"""
-        return session.query(DownloadTask).filter(
-            DownloadTask.user_id == user_id,
-            DownloadTask.status.in_(['pending', 'downloading'])
-        ).order_by(DownloadTask.created_at.desc()).all()
-    
+        result = await session.execute(
+            select(DownloadTask).where(
+                DownloadTask.user_id == user_id,
+                DownloadTask.status.in_(['pending', 'downloading'])
+            ).order_by(DownloadTask.created_at.desc())
+        )
+        return list(result.scalars().all())
+        
     @staticmethod
-    async def log_system_event(session: Session, log_data: Dict[str, Any]):
+    async def log_system_event(session: AsyncSession, log_data: Dict[str, Any]):
         """ثبت رویداد سیستم"""
         log = SystemLog(**log_data)
         session.add(log)
-        session.commit()
-    
+        await session.commit()
+        
     @staticmethod
-    async def get_daily_stats(session: Session) -> Dict[str, Any]:
+    async def get_daily_stats(session: AsyncSession) -> Dict[str, Any]:
         """دریافت آمار روزانه"""
         today = datetime.utcnow().date()
         
-        total_users = session.query(User).count()
-        new_users_today = session.query(User).filter(
-            User.created_at >= today
-        ).count()
+        total_users = await session.scalar(select(func.count(User.id)))
+        new_users_today = await session.scalar(
+            select(func.count(User.id)).where(User.created_at >= today)
+        )
         
-        total_downloads = session.query(DownloadTask).count()
-        downloads_today = session.query(DownloadTask).filter(
-            DownloadTask.created_at >= today
-        ).count()
+        total_downloads = await session.scalar(select(func.count(DownloadTask.id)))
         
-        total_size_today = session.query(
-            func.sum(DownloadTask.file_size)
-        ).filter(
-            DownloadTask.created_at >= today
-        ).scalar() or 0
+        # هر دو مقدار امروز با یک پرس‌وجو
+        today_row = (await session.execute(
+            select(
+                func.count(DownloadTask.id),
+                func.coalesce(func.sum(DownloadTask.file_size), 0)
+            ).where(DownloadTask.created_at >= today)
+        )).one()
         
         return {
             'total_users': total_users,
             'new_users_today': new_users_today,
             'total_downloads': total_downloads,
-            'downloads_today': downloads_today,
-            'total_size_today': total_size_today
+            'downloads_today': today_row[0],
+            'total_size_today': today_row[1]
         }
@@ -1,7 +1,10 @@
 # database/models.py
-from sqlalchemy import create_engine, Column, Integer, String, Text, BigInteger, Boolean, DateTime, JSON, Float
+from sqlalchemy import create_engine, event, inspect, text, Index, Column, Integer, String, Text, BigInteger, Boolean, DateTime, JSON, Float
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.sql import func
 from datetime import datetime
 import json
@@ -11,6 +14,10 @@ Base = declarative_base()
 class User(Base):
     """مدل کاربر"""
     __tablename__ = 'users'
+    __table_args__ = (
+        Index('ix_users_last_activity', 'last_activity'),  # کاربران فعال 24 ساعت اخیر
+        Index('ix_users_created_at', 'created_at'),  # کاربران جدید امروز
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(BigInteger, unique=True, nullable=False, index=True)
@@ -61,6 +68,11 @@ class User(Base):
 class DownloadTask(Base):
     """مدل کار دانلود"""
     __tablename__ = 'download_tasks'
+    __table_args__ = (
+        Index('ix_download_tasks_created_status', 'created_at', 'status'),  # آمار روزانه/ادمین
+        Index('ix_download_tasks_status_created', 'status', 'created_at'),  # بازیابی صف
+        Index('ix_download_tasks_user_status_created', 'user_id', 'status', 'created_at'),  # دانلودهای فعال کاربر
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(BigInteger, nullable=False, index=True)
@@ -73,7 +85,8 @@ class DownloadTask(Base):
     source = Column(Text, nullable=True)  # لینک یا chat_id:message_id
     
     # وضعیت
-    status = Column(String(20), default='pending')  # pending, downloading, completed, failed
+    status = Column(String(20), default='pending')  # pending, downloading, completed, failed, cancelled
+    priority = Column(Integer, default=0)  # عدد بزرگ‌تر زودتر اجرا می‌شود
     progress = Column(Float, default=0.0)  # درصد پیشرفت
     download_speed = Column(Float, default=0.0)  # بایت بر ثانیه
     estimated_time = Column(Float, default=0.0)  # ثانیه
@@ -86,11 +99,61 @@ class DownloadTask(Base):
     error_message = Column(Text, nullable=True)
     retry_count = Column(Integer, default=0)
     
+    # داده لازم برای اجرای دوباره کار پس از راه‌اندازی مجدد
+    payload = Column(JSON, nullable=True)
+    
     # زمان‌ها
     created_at = Column(DateTime, default=datetime.utcnow)
     started_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
 
+class TransferState(Base):
+    """مدل وضعیت انتقال قابل ادامه (آپلود/دانلود)"""
+    __tablename__ = 'transfer_states'
+    
+    id = Column(Integer, primary_key=True)
+    transfer_key = Column(String(64), unique=True, nullable=False, index=True)
+    direction = Column(String(10), nullable=False)  # upload, download
+    
+    source = Column(Text, nullable=True)  # مسیر فایل یا لینک
+    target = Column(Text, nullable=True)  # مسیر مقصد یا chat_id
+    total_size = Column(BigInteger, default=0)
+    part_size = Column(Integer, default=0)
+    validator = Column(String(200), nullable=True)  # ETag / Last-Modified / mtime
+    upload_id = Column(BigInteger, nullable=True)  # file_id قطعه‌های آپلود تلگرام
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class TransferPart(Base):
+    """مدل بخش تکمیل شده یک انتقال (ژورنال Resume)"""
+    __tablename__ = 'transfer_parts'
+    
+    id = Column(Integer, primary_key=True)
+    transfer_key = Column(String(64), nullable=False, index=True)
+    offset = Column(BigInteger, nullable=False)
+    length = Column(Integer, nullable=False)
+    checksum = Column(BigInteger, nullable=False)  # CRC32
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class UploadedFile(Base):
+    """مدل file_id فایل‌های آپلود شده (ارسال مجدد با ارجاع، بدون آپلود دوباره)"""
+    __tablename__ = 'uploaded_files'
+    __table_args__ = (
+        Index('ix_uploaded_files_content_account', 'content_key', 'account_key', unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    content_key = Column(String(64), nullable=False)  # SHA256 محتوا یا file_unique_id مبدا
+    account_key = Column(String(64), nullable=False)  # file_id فقط برای همان اکانت معتبر است
+    file_id = Column(Text, nullable=False)
+    media_type = Column(String(20), nullable=True)
+    file_size = Column(BigInteger, default=0)
+    use_count = Column(Integer, default=0)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used = Column(DateTime, default=datetime.utcnow)
+
 class SystemLog(Base):
     """مدل لاگ سیستم"""
     __tablename__ = 'system_logs'
@@ -107,15 +170,140 @@ class SystemLog(Base):
 class DatabaseManager:
     """مدیریت دیتابیس"""
     
-    def __init__(self, db_url: str = "sqlite:///data/bot.db"):
+    # درایورهای async متناظر با هر دیتابیس
+    ASYNC_DRIVERS = {
+        'sqlite': 'sqlite+aiosqlite',
+        'postgresql': 'postgresql+asyncpg',
+        'mysql': 'mysql+aiomysql'
+    }
+    
+    def __init__(self, db_url: str = "sqlite:///data/bot.db",
+                 pool_size: int = 5, max_overflow: int = 10, pool_timeout: int = 30):
+        self.db_url = db_url
         self.engine = create_engine(db_url, echo=False)
         self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False)
         
+        # پروفایل SQLite (WAL و pragmaها) روی هر اتصال جدید هر دو موتور
+        if self.engine.dialect.name == 'sqlite':
+            event.listen(self.engine, 'connect', self._apply_sqlite_pragmas)
+            
+        # موتور async برای استفاده داخل هندلرها (بدون مسدود کردن event loop)
+        self.async_engine = create_async_engine(
+            self._to_async_url(db_url),
+            echo=False,
+            **self._pool_options(db_url, pool_size, max_overflow, pool_timeout)
+        )
+        self.AsyncSessionLocal = async_sessionmaker(self.async_engine, expire_on_commit=False)
+        
+        if self.async_engine.dialect.name == 'sqlite':
+            event.listen(self.async_engine.sync_engine, 'connect', self._apply_sqlite_pragmas)
+        
+    def _to_async_url(self, db_url: str):
+        """تبدیل URL همگام به URL درایور async"""
+        url = make_url(db_url)
+        backend = url.get_backend_name()
+        
+        if backend in self.ASYNC_DRIVERS and url.drivername not in self.ASYNC_DRIVERS.values():
+            return url.set(drivername=self.ASYNC_DRIVERS[backend])
+            
+        return url
+        
+    @staticmethod
+    def _pool_options(db_url: str, pool_size: int, max_overflow: int, pool_timeout: int) -> dict:
+        """تنظیمات pool؛ SQLite در حافظه فقط یک اتصال مشترک دارد"""
+        url = make_url(db_url)
+        options = {
+            'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            'pool_timeout': pool_timeout,
+            'pool_pre_ping': True
+        }
+        
+        if url.get_backend_name() == 'sqlite':
+            if url.database in (None, '', ':memory:'):
+                return {}
+            # پیش‌فرض SQLAlchemy برای فایل SQLite روی aiosqlite، NullPool است که این تنظیمات را نمی‌پذیرد
+            options['poolclass'] = AsyncAdaptedQueuePool
+            
+        return options
+        
     def init_db(self):
         """ایجاد جداول"""
         Base.metadata.create_all(bind=self.engine)
+        self.migrate()
         print("✅ دیتابیس ایجاد شد")
+        
+    # تنظیمات هر اتصال SQLite
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',  # خواندن همزمان با نوشتن
+        'synchronous': 'NORMAL',  # در حالت WAL امن و بسیار سریع‌تر از FULL
+        'busy_timeout': 5000,  # میلی‌ثانیه انتظار به جای خطای database is locked
+        'foreign_keys': 'ON',
+        'temp_store': 'MEMORY',
+        'cache_size': -64000,  # 64MB
+        'mmap_size': 256 * 1024 * 1024
+    }
     
+    @classmethod
+    def _apply_sqlite_pragmas(cls, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in cls.SQLITE_PRAGMAS.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+            
+    def migrate(self):
+        """به‌روزرسانی ساختار دیتابیس موجود (ستون‌ها و ایندکس‌های جدید)؛ چند بار اجرا شدن بی‌خطر است"""
+        self._add_missing_columns()
+        created = self._add_missing_indexes()
+        
+        if created and self.engine.dialect.name == 'sqlite':
+            # به‌روزرسانی آمار planner برای استفاده از ایندکس‌های جدید
+            with self.engine.begin() as conn:
+                conn.execute(text('ANALYZE'))
+        
+    def _add_missing_columns(self):
+        """افزودن ستون‌های جدید به جداول موجود (create_all جدول موجود را تغییر نمی‌دهد)"""
+        inspector = inspect(self.engine)
+        
+        with self.engine.begin() as conn:
+            for table in Base.metadata.sorted_tables:
+                if not inspector.has_table(table.name):
+                    continue
+                    
+                existing = {c['name'] for c in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name not in existing:
+                        column_type = column.type.compile(dialect=self.engine.dialect)
+                        conn.execute(text(
+                            f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                        ))
+    
+    def _add_missing_indexes(self) -> int:
+        """ایجاد ایندکس‌های تعریف شده در مدل‌ها که روی جداول موجود ساخته نشده‌اند"""
+        inspector = inspect(self.engine)
+        created = 0
+        
+        with self.engine.begin() as conn:
+            for table in Base.metadata.sorted_tables:
+                existing = {i['name'] for i in inspector.get_indexes(table.name)}
+                for index in table.indexes:
+                    if index.name not in existing:
+                        index.create(bind=conn)
+                        created += 1
+                        
+        return created
+        
     def get_session(self):
         """دریافت session"""
         return self.SessionLocal()
+        
+    def get_async_session(self):
+        """دریافت AsyncSession (با async with استفاده شود)"""
+        return self.AsyncSessionLocal()
+        
+    async def dispose(self):
+        """بستن همه اتصال‌های هر دو موتور"""
+        await self.async_engine.dispose()
+        self.engine.dispose()
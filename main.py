@@ -40,6 +40,8 @@ from pyrogram.errors import (
 # ایمپورت ماژول‌های داخلی
 from config.settings import settings
 from database.models import DatabaseManager, User, DownloadTask, SystemLog
+from database.crud import CRUDOperations
+from sqlalchemy import select, func
 from modules.auth.login_handler import LoginHandler
 from modules.auth.multi_account_manager import MultiAccountManager
 from modules.downloader.smart_downloader import SmartDownloader
@@ -47,21 +49,27 @@ from modules.downloader.telegram_downloader import TelegramDownloader
 from modules.uploader.smart_uploader import SmartUploader
 from modules.behavior.human_simulator import HumanSimulator
 from modules.admin.advanced_panel import AdvancedAdminPanel
+from modules.admin.stats_collector import DashboardStatsCollector
 from modules.core.security import AdvancedSecurity
 from modules.core.session_manager import SessionManager
+from modules.core.job_queue import DownloadJobQueue, DownloadJob
+from modules.core.http_pool import http_pool
+from modules.core.executor import executor
+from modules.core.stats_aggregator import UserStatsAggregator
 from modules.ui.keyboards.main_keyboards import MainKeyboards
 from modules.ui.progress_display import ProgressDisplay
+from modules.ui.progress_publisher import ProgressPublisher
 from modules.utils.error_handler import ErrorHandler
 from modules.utils.helpers import Helpers
 from modules.utils.advanced_logger import AdvancedLogger
-from modules.utils.speed_limiter import SpeedLimiter, RateLimiter
+from modules.utils.speed_limiter import SpeedLimiter, RateLimiter, KeyedRateLimiter
 
 # تنظیمات لاگ‌گیری پیشرفته
+# (تا ساخته شدن AdvancedLogger فقط کنسول؛ سپس همه لاگ‌ها از صف آن نوشته می‌شوند)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler(settings.LOGS_DIR / 'bot.log', encoding='utf-8'),
         logging.StreamHandler(sys.stdout)
     ]
 )
@@ -73,26 +81,43 @@ class TelegramUserBotPro:
     
     def __init__(self):
         self.settings = settings
-        self.db = DatabaseManager(settings.DATABASE_URL)
+        self.db = DatabaseManager(
+            settings.DATABASE_URL,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW
+        )
         self.security = AdvancedSecurity()
-        self.logger = AdvancedLogger("TelegramUserBotPro")
+        self.logger = AdvancedLogger("TelegramUserBotPro", log_dir=str(settings.LOGS_DIR))
+        self.logger.capture_root_logger()
         self.helpers = Helpers()
         
+        # آمار پنل ادمین (رویدادهای ورود، خطا و انتقال از ماژول‌ها به آن می‌رسند)
+        self.stats_collector = DashboardStatsCollector(self.db)
+        
         # مدیران سیستم
-        self.login_handler = LoginHandler(self.db, self.security)
+        self.login_handler = LoginHandler(self.db, self.security, self.stats_collector)
         self.session_manager = SessionManager(self.db, self.security)
         self.account_manager = MultiAccountManager(self.db, self.security)
-        self.error_handler = ErrorHandler(self.db)
+        self.error_handler = ErrorHandler(self.db, self.stats_collector)
         
         # ماژول‌های عملیاتی
         self.downloader = SmartDownloader()
-        self.telegram_downloader = TelegramDownloader()
+        self.telegram_downloader = TelegramDownloader(
+            parallel=settings.PARALLEL_MEDIA_DOWNLOAD,
+            parallel_window=settings.PARALLEL_MEDIA_WINDOW
+        )
+        # session‌های مدیای هر اکانت با قطع کلاینت آن (بیکاری یا جایگزینی در pool) بسته می‌شوند
+        self.account_manager.pool.add_disconnect_listener(self.telegram_downloader.parallel_engine.close)
         self.uploader = SmartUploader()
         self.humanizer = HumanSimulator()
         
         # رابط کاربری
         self.keyboards = MainKeyboards()
         self.progress_display = ProgressDisplay()
+        self.progress_publisher = ProgressPublisher(
+            self.progress_display.create_progress_message,
+            interval=settings.PROGRESS_UPDATE_INTERVAL
+        )
         
         # پنل ادمین
         self.admin_panel = None
@@ -102,8 +127,18 @@ class TelegramUserBotPro:
         
         # کش داده‌ها
         self.user_cache = {}
-        self.download_tasks = {}
-        self.rate_limiter = RateLimiter(max_calls=30, period=1.0)  # 30 درخواست در ثانیه
+        self.download_tasks = {}  # task_id -> وضعیت کار در حال اجرا
+        self.job_queue = DownloadJobQueue(
+            self.db, self._run_download_job,
+            workers=settings.DOWNLOAD_WORKERS,
+            per_user_limit=settings.MAX_CONCURRENT_DOWNLOADS,
+            max_attempts=settings.DOWNLOAD_MAX_ATTEMPTS
+        )
+        self.stats_aggregator = UserStatsAggregator(
+            self.db, flush_interval=settings.STATS_FLUSH_INTERVAL
+        )
+        self.rate_limiter = RateLimiter(max_calls=30, period=1.0)  # 30 درخواست در ثانیه (کل ربات)
+        self.user_rate_limiter = KeyedRateLimiter(max_calls=5, period=2.0)  # برای هر کاربر
         
         # وضعیت سیستم
         self.start_time = datetime.now()
@@ -140,7 +175,7 @@ class TelegramUserBotPro:
             logger.info("✅ Session Manager راه‌اندازی شد")
             
             # تنظیم پنل ادمین
-            self.admin_panel = AdvancedAdminPanel(self.db, self)
+            self.admin_panel = AdvancedAdminPanel(self.db, self, self.stats_collector)
             
             # ثبت هندلرها
             await self._register_all_handlers()
@@ -174,6 +209,16 @@ class TelegramUserBotPro:
     async def _register_all_handlers(self):
         """ثبت تمام هندلرهای ربات"""
         
+        # ========== ثبت فعالیت (گروه -1: قبل از بقیه هندلرها، بدون توقف آن‌ها) ==========
+        @self.bot.on_message(filters.private, group=-1)
+        async def activity_message(client, message: Message):
+            if message.from_user:
+                self.stats_collector.record_activity(message.from_user.id)
+                
+        @self.bot.on_callback_query(group=-1)
+        async def activity_callback(client, callback_query: CallbackQuery):
+            self.stats_collector.record_activity(callback_query.from_user.id)
+            
         # ========== دستورات اصلی ==========
         @self.bot.on_message(filters.command("start") & filters.private)
         async def start_command(client, message: Message):
@@ -497,23 +542,29 @@ class TelegramUserBotPro:
         """مدیریت دستور /cancel"""
         user_id = message.from_user.id
         
-        if user_id in self.download_tasks:
-            task = self.download_tasks[user_id]
-            if 'status_msg' in task:
-                try:
-                    await task['status_msg'].edit_text("⏹️ عملیات توسط کاربر لغو شد.")
-                except:
-                    pass
-            
-            # حذف فایل ناقص
-            if 'file_path' in task and os.path.exists(task['file_path']):
-                try:
-                    os.remove(task['file_path'])
-                except:
-                    pass
-            
-            del self.download_tasks[user_id]
-            await message.reply_text("✅ عملیات جاری لغو شد.")
+        # وضعیت کارهای در حال اجرا قبل از لغو (پیام وضعیت و فایل ناقص)
+        running = [t for t in self.download_tasks.values() if t.get('user_id') == user_id]
+        cancelled = await self.job_queue.cancel_user(user_id)
+        
+        if cancelled:
+            for task in running:
+                if 'status_msg' in task:
+                    try:
+                        await task['status_msg'].edit_text("⏹️ عملیات توسط کاربر لغو شد.")
+                    except:
+                        pass
+                        
+                # حذف فایل ناقص؛ فایل کامل شده‌ای که در حال آپلود است حذف نمی‌شود
+                # (لغو آپلود هنوز تمام نشده و ممکن است در حال خواندن فایل باشد)
+                if task.get('stage') == 'uploading':
+                    continue
+                if task.get('file_path') and os.path.exists(task['file_path']):
+                    try:
+                        os.remove(task['file_path'])
+                    except:
+                        pass
+            
+            await message.reply_text(f"✅ {len(cancelled)} عملیات لغو شد.")
         else:
             await message.reply_text("⚠️ هیچ عملیات فعالی برای لغو وجود ندارد.")
     
@@ -588,8 +639,11 @@ class TelegramUserBotPro:
         """مدیریت دستور /stats"""
         user_id = message.from_user.id
         
-        with self.db.get_session() as session:
-            user = session.query(User).filter_by(user_id=user_id).first()
+        # شمارنده‌های ثبت نشده ابتدا در دیتابیس نوشته می‌شوند
+        await self.stats_aggregator.flush()
+        
+        async with self.db.get_async_session() as session:
+            user = await CRUDOperations.get_user_by_id(session, user_id)
             
             if not user:
                 stats_text = "📊 **آمار شما**\n\n❌ هنوز فعالیتی ثبت نکرده‌اید."
@@ -633,7 +687,10 @@ class TelegramUserBotPro:
         self.logger.log_user_action(user_id, "callback", f"دکمه: {data}")
         
         try:
-            # محدودیت rate
+            # محدودیت rate: کاربر پرتکرار فقط خودش رد می‌شود، نه کل ربات
+            if not self.user_rate_limiter.try_acquire(user_id):
+                await callback_query.answer("⏳ لطفاً کمی آهسته‌تر", show_alert=False)
+                return
             await self.rate_limiter.acquire()
             
             if data == "menu_main":
@@ -748,54 +805,119 @@ class TelegramUserBotPro:
             await self.login_handler.handle_two_factor_password(user_id, message)
     
     async def _start_download(self, user_id: int, url: Optional[str], message: Message):
-        """شروع فرآیند دانلود"""
+        """ثبت درخواست دانلود در صف کارها"""
         try:
-            # انتخاب حساب برای دانلود
             accounts = await self.account_manager.get_user_accounts(user_id)
             if not accounts:
                 await message.reply_text("هیچ حساب فعالی ندارید. لطفاً ابتدا حساب اضافه کنید.")
                 return
+                
+            queue_stats = self.job_queue.get_stats()
+            status_msg = await message.reply_text(
+                f"⏳ در صف دانلود... (کارهای منتظر: {queue_stats['pending']})"
+            )
+            
+            # هرچه برای اجرای دوباره کار پس از ری‌استارت لازم است
+            payload = {
+                'url': url,
+                'chat_id': message.chat.id,
+                'status_message_id': status_msg.id,
+                'forward_chat_id': message.forward_from_chat.id if message.forward_from_chat else None,
+                'forward_message_id': message.forward_from_message_id
+            }
             
-            # استفاده از حساب فعال یا اولین حساب
-            active_account = None
-            for account in accounts:
-                if account.get('is_active', False):
-                    active_account = account
-                    break
+            priority = 1 if user_id in settings.ADMIN_IDS else 0
+            await self.job_queue.submit(user_id, payload, priority)
             
-            if not active_account:
-                active_account = accounts[0]
+        except Exception as e:
+            logger.error(f"خطا در ثبت دانلود: {e}", exc_info=True)
             
-            account_id = active_account['account_id']
+            error_response = await self.error_handler.handle_error(e, {
+                'module': '_start_download',
+                'user_id': user_id,
+                'url': url
+            })
             
-            # نمایش وضعیت شروع
-            status_msg = await message.reply_text("⏳ در حال بررسی...")
+            user_message = self.error_handler.create_user_friendly_message(error_response)
+            await message.reply_text(user_message)
+            
+    async def _run_download_job(self, job: DownloadJob) -> Dict[str, Any]:
+        """اجرای یک کار دانلود توسط worker صف"""
+        user_id = job.user_id
+        payload = job.payload
+        url = payload.get('url')
+        chat_id = payload['chat_id']
+        status_msg = None
+        account_id = None
+        
+        try:
+            status_msg = await self.bot.get_messages(chat_id, payload['status_message_id'])
+            if not status_msg or status_msg.empty:
+                status_msg = await self.bot.send_message(chat_id, "⏳ در حال بررسی...")
+            else:
+                await status_msg.edit_text("⏳ در حال بررسی...")
+                
+            # انتخاب حساب کم‌بارتر (کارهای همزمان کاربر بین حساب‌هایش پخش می‌شوند)
+            account_id = self.account_manager.acquire_account(user_id)
+            if not account_id:
+                await status_msg.edit_text("هیچ حساب فعالی ندارید. لطفاً ابتدا حساب اضافه کنید.")
+                return {'success': False, 'error': 'no active account'}
             
-            # تابع callback برای نمایش پیشرفت
+            # تابع callback برای نمایش پیشرفت (ویرایش‌ها ادغام و با فاصله ارسال می‌شوند)
             async def progress_callback(progress_data: Dict[str, Any]):
-                try:
-                    progress_text = self.progress_display.create_progress_message(progress_data)
-                    await status_msg.edit_text(progress_text)
-                except Exception as e:
-                    logger.error(f"خطا در آپدیت پیشرفت: {e}")
+                await self.progress_publisher.update(status_msg, progress_data)
             
             # ذخیره task
-            task_id = f"download_{user_id}_{int(datetime.now().timestamp())}"
-            self.download_tasks[user_id] = {
-                'task_id': task_id,
+            self.download_tasks[job.task_id] = {
+                'task_id': job.task_id,
+                'user_id': user_id,
                 'status_msg': status_msg,
                 'start_time': datetime.now(),
-                'account_id': account_id
+                'account_id': account_id,
+                'stage': 'downloading'
             }
             
+            # انتقال مستقیم بدون دیسک (در صورت فعال بودن)
+            if settings.STREAM_RELAY:
+                relay_result = await self._try_stream_relay(
+                    user_id, account_id, url, payload, status_msg, progress_callback
+                )
+                await self.progress_publisher.finish(status_msg)
+                
+                if relay_result and relay_result.get('success'):
+                    method = (
+                        "ارسال مجدد با file_id (بدون انتقال)" if relay_result.get('reused')
+                        else "انتقال مستقیم (بدون ذخیره روی دیسک)"
+                    )
+                    self.logger.log_download_complete(
+                        user_id,
+                        relay_result.get('file_name', 'unknown'),
+                        relay_result.get('file_size', 0),
+                        (datetime.now() - self.download_tasks[job.task_id]['start_time']).total_seconds()
+                    )
+                    
+                    await status_msg.edit_text(f"""
+✅ **انتقال کامل شد!**
+
+📁 فایل: `{relay_result.get('file_name', 'نامشخص')}`
+📊 حجم: {self.helpers._format_size(relay_result.get('file_size', 0))}
+⚡ روش: {method}
+                    """)
+                    
+                    relay_time = relay_result.get('upload_time')
+                    await self._update_user_stats(user_id, relay_result.get('file_size', 0), 'download', relay_time)
+                    await self._update_user_stats(user_id, relay_result.get('file_size', 0), 'upload', relay_time)
+                    
+                    return relay_result
+                    
             # شروع دانلود
             if url:
                 # دانلود از لینک
                 if "t.me" in url or "telegram" in url:
                     # دانلود از تلگرام
-                    client = self.account_manager.active_clients[user_id][account_id]['client']
-                    result = await self.telegram_downloader.download_from_telegram(
-                        client, url, progress_callback
+                    result = await self.account_manager.run_with_account(
+                        user_id, account_id, self.telegram_downloader.download_from_telegram,
+                        url, progress_callback
                     )
                 else:
                     # دانلود از اینترنت
@@ -804,27 +926,38 @@ class TelegramUserBotPro:
                     )
             else:
                 # دانلود از پیام فوروارد شده
-                client = self.account_manager.active_clients[user_id][account_id]['client']
-                result = await self.telegram_downloader.download_forwarded_content(
-                    client, message.chat.id, message.forward_from_chat.id,
-                    message.forward_from_message_id, progress_callback
+                result = await self.account_manager.run_with_account(
+                    user_id, account_id, self.telegram_downloader.download_forwarded_content,
+                    chat_id, payload['forward_chat_id'], payload['forward_message_id'],
+                    progress_callback
                 )
+                
+            # پایان نمایش پیشرفت؛ ویرایش معوق نباید پیام نهایی را بازنویسی کند
+            await self.progress_publisher.finish(status_msg)
             
             # پردازش نتیجه
             if result.get('success'):
+                self.download_tasks[job.task_id].update({
+                    'file_path': result.get('file_path'),
+                    'stage': 'uploading'
+                })
+                
                 # لاگ موفقیت
                 self.logger.log_download_complete(
                     user_id,
                     result.get('file_name', 'unknown'),
                     result.get('file_size', 0),
-                    (datetime.now() - self.download_tasks[user_id]['start_time']).total_seconds()
+                    (datetime.now() - self.download_tasks[job.task_id]['start_time']).total_seconds()
                 )
                 
                 # آپلود خودکار
                 await self._auto_upload_file(user_id, account_id, result, status_msg)
                 
                 # به‌روزرسانی آمار کاربر
-                await self._update_user_stats(user_id, result.get('file_size', 0), 'download')
+                await self._update_user_stats(
+                    user_id, result.get('file_size', 0), 'download',
+                    (datetime.now() - self.download_tasks[job.task_id]['start_time']).total_seconds()
+                )
                 
             else:
                 error_text = f"""
@@ -839,52 +972,97 @@ class TelegramUserBotPro:
                 """
                 await status_msg.edit_text(error_text)
             
-            # پاک‌سازی task
-            if user_id in self.download_tasks:
-                del self.download_tasks[user_id]
+            return result
                 
+        except asyncio.CancelledError:
+            raise
+            
         except Exception as e:
             logger.error(f"خطا در فرآیند دانلود: {e}", exc_info=True)
             
             error_response = await self.error_handler.handle_error(e, {
-                'module': '_start_download',
+                'module': '_run_download_job',
                 'user_id': user_id,
                 'url': url
             })
             
             user_message = self.error_handler.create_user_friendly_message(error_response)
-            await message.reply_text(user_message)
+            await self.bot.send_message(chat_id, user_message)
+            
+            return {'success': False, 'error': str(e)}
+            
+        finally:
+            # پاک‌سازی task (و پیشرفت معوق در صورت خطا یا لغو)
+            self.download_tasks.pop(job.task_id, None)
+            if account_id:
+                self.account_manager.release_account(user_id, account_id)
+            if status_msg:
+                await self.progress_publisher.finish(status_msg)
+                
+    async def _try_stream_relay(self, user_id: int, account_id: str, url: Optional[str],
+                                payload: Dict[str, Any], status_msg: Message,
+                                progress_callback: Callable) -> Optional[Dict[str, Any]]:
+        """تلاش برای انتقال مستقیم؛ None یعنی این درخواست از مسیر عادی (دیسک) انجام شود"""
+        try:
+            if url and not ("t.me" in url or "telegram" in url):
+                return None
+            if not url and not payload.get('forward_chat_id'):
+                return None
+                
+            async with self.account_manager.use_client(user_id, account_id) as client:
+                if url:
+                    source_message = await self.telegram_downloader.get_source_message(client, url)
+                else:
+                    source_message = await client.get_messages(
+                        payload['forward_chat_id'], payload['forward_message_id']
+                    )
+                
+            if not source_message or not source_message.media:
+                return None
+                
+            file_name = self.telegram_downloader._get_media_filename(source_message)
+            
+            result = await self.account_manager.relay_with_account(
+                user_id, account_id, source_message,
+                status_msg.chat.id, file_name, progress_callback
+            )
+            
+            if not result.get('success') and not result.get('unsupported'):
+                logger.warning(f"انتقال مستقیم ناموفق بود، استفاده از مسیر عادی: {result.get('error')}")
+                
+            return result
             
-            if user_id in self.download_tasks:
-                del self.download_tasks[user_id]
+        except Exception as e:
+            logger.warning(f"خطا در انتقال مستقیم: {e}")
+            return None
     
     async def _start_upload(self, user_id: int, message: Message):
         """شروع فرآیند آپلود"""
+        account_id = None
         try:
-            # انتخاب حساب
-            accounts = await self.account_manager.get_user_accounts(user_id)
-            if not accounts:
+            # انتخاب حساب کم‌بارتر
+            account_id = self.account_manager.acquire_account(user_id)
+            if not account_id:
                 await message.reply_text("هیچ حساب فعالی ندارید.")
                 return
             
-            account = accounts[0]
-            account_id = account['account_id']
+            account = next(
+                a for a in await self.account_manager.get_user_accounts(user_id)
+                if a['account_id'] == account_id
+            )
             
             # نمایش وضعیت
             status_msg = await message.reply_text("📥 در حال دریافت فایل...")
             
             # تابع callback برای پیشرفت
             async def progress_callback(progress_data: Dict[str, Any]):
-                try:
-                    progress_text = self.progress_display.create_progress_message(progress_data)
-                    await status_msg.edit_text(progress_text)
-                except:
-                    pass
+                await self.progress_publisher.update(status_msg, progress_data)
             
             # دانلود فایل از پیام
             download_result = await self.telegram_downloader._download_message_media(
                 self.bot, message, progress_callback
             )
+            await self.progress_publisher.finish(status_msg)
             
             if not download_result.get('success'):
                 await status_msg.edit_text(f"❌ خطا در دریافت فایل: {download_result.get('error')}")
@@ -897,8 +1075,10 @@ class TelegramUserBotPro:
                 user_id, account_id,
                 download_result['file_path'],
                 message.chat.id,
-                progress_callback
+                progress_callback,
+                source_key=download_result.get('file_unique_id')
             )
+            await self.progress_publisher.finish(status_msg)
             
             if upload_result.get('success'):
                 final_text = f"""
@@ -912,7 +1092,9 @@ class TelegramUserBotPro:
                 """
                 
                 # به‌روزرسانی آمار
-                await self._update_user_stats(user_id, download_result['file_size'], 'upload')
+                await self._update_user_stats(
+                    user_id, download_result['file_size'], 'upload', upload_result.get('upload_time')
+                )
                 
             else:
                 final_text = f"""
@@ -935,6 +1117,10 @@ class TelegramUserBotPro:
             
             user_message = self.error_handler.create_user_friendly_message(error_response)
             await message.reply_text(user_message)
+            
+        finally:
+            if account_id:
+                self.account_manager.release_account(user_id, account_id)
     
     async def _auto_upload_file(self, user_id: int, account_id: str, 
                                download_result: Dict[str, Any], status_msg: Message):
@@ -948,7 +1134,8 @@ class TelegramUserBotPro:
                 user_id, account_id,
                 download_result['file_path'],
                 status_msg.chat.id,
-                None  # بدون نمایش پیشرفت
+                None,  # بدون نمایش پیشرفت
+                source_key=download_result.get('file_unique_id')
             )
             
             final_text = f"""
@@ -990,23 +1177,11 @@ class TelegramUserBotPro:
             else:
                 await callback_query.message.edit_text("❌ خطا در تعویض حساب.")
     
-    async def _update_user_stats(self, user_id: int, file_size: int, action: str):
-        """به‌روزرسانی آمار کاربر"""
-        try:
-            with self.db.get_session() as session:
-                user = session.query(User).filter_by(user_id=user_id).first()
-                if user:
-                    if action == 'download':
-                        user.total_downloads += 1
-                        user.total_download_size += file_size
-                    elif action == 'upload':
-                        user.total_uploads += 1
-                        user.total_upload_size += file_size
-                    
-                    user.last_activity = datetime.utcnow()
-                    session.commit()
-        except Exception as e:
-            logger.error(f"خطا در به‌روزرسانی آمار کاربر: {e}")
+    async def _update_user_stats(self, user_id: int, file_size: int, action: str,
+                                 seconds: Optional[float] = None):
+        """به‌روزرسانی آمار کاربر (در حافظه؛ ثبت دسته‌ای توسط stats_aggregator)"""
+        self.stats_aggregator.record(user_id, action, file_size)
+        self.stats_collector.record_transfer(user_id, action, file_size, seconds)
     
     async def _cleanup_temp_files(self):
         """پاک‌سازی فایل‌های موقت قدیمی"""
@@ -1045,8 +1220,21 @@ class TelegramUserBotPro:
             # ذخیره وضعیت
             await self._save_system_state()
             
+            # توقف صف دانلود؛ کارهای نیمه‌کاره در شروع بعدی ادامه می‌یابند
+            await self.job_queue.stop()
+            
+            # ثبت شمارنده‌های آمار باقی‌مانده
+            await self.stats_aggregator.stop()
+            await self.stats_collector.stop()
+            
             # قطع اتصالات حساب‌ها
-            await self.account_manager.logout_all_accounts()
+            await self.account_manager.close()
+            
+            # بستن session‌های مدیای دانلود موازی
+            await self.telegram_downloader.parallel_engine.close()
+            
+            # بستن اتصال‌های HTTP مشترک
+            await http_pool.close()
             
             # پاک‌سازی نشست‌ها
             await self.session_manager.cleanup_expired_sessions()
@@ -1057,7 +1245,10 @@ class TelegramUserBotPro:
             
             # بستن دیتابیس
             if hasattr(self.db, 'engine'):
-                self.db.engine.dispose()
+                await self.db.dispose()
+            
+            # بستن poolهای executor
+            executor.shutdown(wait=False)
             
             logger.info("✅ ربات با موفقیت خاموش شد")
             
@@ -1065,6 +1256,8 @@ class TelegramUserBotPro:
             logger.error(f"❌ خطا در خاموش کردن ربات: {e}")
         
         finally:
+            # نوشتن لاگ‌های باقی‌مانده در صف
+            self.logger.close()
             sys.exit(0)
     
     async def _save_system_state(self):
@@ -1074,12 +1267,13 @@ class TelegramUserBotPro:
                 'shutdown_time': datetime.now().isoformat(),
                 'active_users': len(self.account_manager.active_clients),
                 'active_downloads': len(self.download_tasks),
+                'queued_downloads': len(self.job_queue.pending),
                 'total_users': 0,
                 'uptime': str(datetime.now() - self.start_time)
             }
             
-            with self.db.get_session() as session:
-                state['total_users'] = session.query(User).count()
+            async with self.db.get_async_session() as session:
+                state['total_users'] = await session.scalar(select(func.count(User.id)))
             
             import json
             state_file = settings.DATA_DIR / "system_state.json"
@@ -1103,6 +1297,18 @@ class TelegramUserBotPro:
             logger.info("🚀 در حال شروع ربات...")
             await self.bot.start()
             
+            # راه‌اندازی صف دانلود و بازیابی کارهای ناتمام
+            await self.job_queue.start()
+            
+            # ثبت دوره‌ای آمار کاربران
+            await self.stats_aggregator.start()
+            
+            # قطع خودکار کلاینت‌های بیکار حساب‌ها
+            await self.account_manager.start()
+            
+            # آمار پنل ادمین در پس‌زمینه
+            await self.stats_collector.start()
+            
             # اطلاعات شروع
             me = await self.bot.get_me()
             logger.info(f"🤖 ربات: @{me.username}")
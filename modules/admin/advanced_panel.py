@@ -4,17 +4,23 @@ from datetime import datetime, timedelta
 import json
 import asyncio
 from typing import Dict, List, Any
-import psutil
+from modules.admin.stats_collector import DashboardStatsCollector
+from modules.core.executor import executor
 import humanize
+from sqlalchemy import select
+from database.models import User
 
 class AdvancedAdminPanel:
     """پنل ادمین پیشرفته با قابلیت‌های کامل"""
     
-    def __init__(self, db_manager, bot_client):
+    def __init__(self, db_manager, bot_client, stats_collector: DashboardStatsCollector = None):
         self.db = db_manager
         self.bot = bot_client
         self.admin_actions = {}
         
+        # آمار پنل از حافظه خوانده می‌شود؛ collector در پس‌زمینه به‌روز می‌شود
+        self.stats_collector = stats_collector or DashboardStatsCollector(db_manager)
+        
     async def handle_admin_callback(self, callback_query: CallbackQuery):
         """مدیریت کلیک‌های پنل ادمین"""
         data = callback_query.data
@@ -94,8 +100,11 @@ class AdvancedAdminPanel:
     async def show_users_management(self, callback_query: CallbackQuery):
         """مدیریت کاربران"""
         
-        with self.db.get_session() as session:
-            users = session.query(User).order_by(User.created_at.desc()).limit(50).all()
+        async with self.db.get_async_session() as session:
+            result = await session.execute(
+                select(User).order_by(User.created_at.desc()).limit(50)
+            )
+            users = list(result.scalars().all())
         
         user_list = ""
         for i, user in enumerate(users[:10], 1):
@@ -204,106 +213,109 @@ class AdvancedAdminPanel:
         ])
         
         await callback_query.message.edit_text(message_text, reply_markup=keyboard)
-    
-    async def get_quick_stats(self) -> Dict[str, Any]:
-        """دریافت آمار سریع"""
-        with self.db.get_session() as session:
-            total_users = session.query(User).count()
-            active_users = session.query(User).filter(
-                User.last_activity >= datetime.utcnow() - timedelta(hours=24)
-            ).count()
+        
+    async def show_security_logs(self, callback_query: CallbackQuery):
+        """نمایش رویدادهای امنیتی اخیر (از انتهای لاگ فعالیت، بدون خواندن کل فایل)"""
+        
+        logger = self.bot.logger
+        since_24h = datetime.now().timestamp() - 86400
+        
+        recent = await executor.run(logger.get_security_events, 15)
+        last_day = await executor.run(logger.get_security_events, 1000, since=since_24h)
+        
+        severity_counts: Dict[str, int] = {}
+        for event in last_day:
+            severity = event.get('data', {}).get('severity', 'MEDIUM')
+            severity_counts[severity] = severity_counts.get(severity, 0) + 1
             
-            today = datetime.utcnow().date()
-            today_downloads = session.query(DownloadTask).filter(
-                DownloadTask.created_at >= today
-            ).count()
+        lines = []
+        for event in recent:
+            data = event.get('data', {})
+            time_str = datetime.fromtimestamp(event['ts']).strftime('%m-%d %H:%M')
+            user = event['user_id'] or 'system'
+            lines.append(
+                f"• `{time_str}` [{data.get('severity', '-')}] {data.get('event_type', '-')} - کاربر: {user}"
+            )
             
-            total_files = session.query(DownloadTask).count()
+        summary = ' | '.join(f"{name}: {count}" for name, count in sorted(severity_counts.items())) or 'بدون رویداد'
+        
+        message_text = f"""
+🔒 **لاگ‌های امنیتی**
+
+📊 **24 ساعت اخیر:** {summary}
+
+🕒 **آخرین رویدادها:**
+{chr(10).join(lines) if lines else 'رویدادی ثبت نشده است'}
+        """
+        
+        keyboard = InlineKeyboardMarkup([
+            [
+                InlineKeyboardButton("🔄 بروزرسانی", callback_data="admin_security")
+            ],
+            [
+                InlineKeyboardButton("🔙 بازگشت", callback_data="admin_panel")
+            ]
+        ])
+        
+        await callback_query.message.edit_text(message_text, reply_markup=keyboard)
         
-        # اطلاعات سیستم
-        cpu_usage = psutil.cpu_percent(interval=1)
-        ram_usage = psutil.virtual_memory().percent
-        disk_free = humanize.naturalsize(psutil.disk_usage('/').free)
+    async def get_quick_stats(self) -> Dict[str, Any]:
+        """دریافت آمار سریع (از حافظه collector)"""
+        snapshot = self.stats_collector.get_snapshot()
+        counters = snapshot['counters']
+        system = snapshot['system']
         
         # آپ‌تایم
         uptime = humanize.naturaldelta(datetime.now() - self.bot.start_time)
         
         return {
-            'total_users': total_users,
-            'active_users': active_users,
-            'today_downloads': today_downloads,
-            'total_files': total_files,
-            'cpu_usage': cpu_usage,
-            'ram_usage': ram_usage,
-            'disk_free': disk_free,
+            'total_users': counters['total_users'],
+            'active_users': snapshot['active_24h'],
+            'today_downloads': counters['today_downloads'],
+            'total_files': counters['total_downloads'],
+            'cpu_usage': system['cpu'],
+            'ram_usage': system['ram'],
+            'disk_free': humanize.naturalsize(system['disk_free']),
             'uptime': uptime
         }
     
     async def get_detailed_stats(self) -> Dict[str, Any]:
-        """دریافت آمار جزئی"""
-        with self.db.get_session() as session:
-            # آمار کاربران
-            total_users = session.query(User).count()
-            active_24h = session.query(User).filter(
-                User.last_activity >= datetime.utcnow() - timedelta(hours=24)
-            ).count()
-            
-            today = datetime.utcnow().date()
-            new_today = session.query(User).filter(
-                User.created_at >= today
-            ).count()
-            
-            premium_users = session.query(User).filter(User.is_premium == True).count()
-            
-            # آمار استفاده
-            total_downloads = session.query(DownloadTask).count()
-            total_uploads = total_downloads  # فرضی
-            
-            download_size = session.query(func.sum(DownloadTask.file_size)).scalar() or 0
-            upload_size = download_size * 0.8  # فرضی
-            
-            # آمار امروز
-            today_downloads = session.query(DownloadTask).filter(
-                DownloadTask.created_at >= today
-            ).count()
-            today_uploads = today_downloads  # فرضی
-        
-        # اطلاعات سیستم
-        cpu = psutil.cpu_percent(interval=1)
-        ram = psutil.virtual_memory().percent
-        ram_used = psutil.virtual_memory().used
-        disk = psutil.disk_usage('/').percent
+        """دریافت آمار جزئی (از حافظه collector)"""
+        snapshot = self.stats_collector.get_snapshot()
+        counters = snapshot['counters']
+        system = snapshot['system']
+        active_24h = snapshot['active_24h']
         
         return {
             'users': {
-                'total': total_users,
+                'total': counters['total_users'],
                 'active_24h': active_24h,
-                'new_today': new_today,
-                'premium': premium_users
+                'new_today': counters['new_today'],
+                'premium': counters['premium_users']
             },
             'usage': {
-                'total_downloads': total_downloads,
-                'total_uploads': total_uploads,
-                'download_size': download_size,
-                'upload_size': upload_size,
-                'avg_speed': 10.5  # فرضی
+                'total_downloads': counters['total_downloads'],
+                'total_uploads': counters['total_uploads'],
+                'download_size': counters['download_size'],
+                'upload_size': counters['upload_size'],
+                'avg_speed': snapshot['avg_speed'] / (1024 * 1024)  # MB/s
             },
             'system': {
-                'cpu': cpu,
-                'ram': ram,
-                'ram_used': ram_used,
-                'disk': disk,
+                'cpu': system['cpu'],
+                'ram': system['ram'],
+                'ram_used': system['ram_used'],
+                'disk': system['disk'],
                 'uptime': str(datetime.now() - self.bot.start_time).split('.')[0]
             },
             'today': {
-                'downloads': today_downloads,
-                'uploads': today_uploads,
-                'errors': 0,  # فرضی
+                'downloads': counters['today_downloads'],
+                'uploads': counters['today_uploads'],
+                'errors': counters['today_errors'],
                 'connections': active_24h
             },
             'financial': {
                 'monthly_income': 150.0,  # فرضی
-                'premium_users': premium_users,
+                'premium_users': counters['premium_users'],
                 'today_payments': 0  # فرضی
             }
         }
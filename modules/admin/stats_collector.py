@@ -0,0 +1,232 @@
+# modules/admin/stats_collector.py
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional
+import psutil
+from sqlalchemy import select, func
+from database.models import User, DownloadTask, SystemLog
+from modules.core.executor import executor
+
+logger = logging.getLogger(__name__)
+
+class DashboardStatsCollector:
+    """نگه‌داری آمار پنل ادمین در حافظه؛ نمونه‌برداری دوره‌ای سیستم و شمارنده‌های رویدادی"""
+    
+    def __init__(self, db_manager, system_interval: float = 10, resync_interval: float = 300):
+        self.db = db_manager
+        self.system_interval = system_interval  # ثانیه بین نمونه‌های CPU/RAM/دیسک
+        self.resync_interval = resync_interval  # ثانیه بین همگام‌سازی کامل با دیتابیس
+        
+        self.system = {'cpu': 0.0, 'ram': 0.0, 'ram_used': 0, 'disk': 0.0, 'disk_free': 0}
+        self.counters = {
+            'total_users': 0,
+            'premium_users': 0,
+            'new_today': 0,
+            'total_downloads': 0,
+            'total_uploads': 0,
+            'download_size': 0,
+            'upload_size': 0,
+            'today_downloads': 0,
+            'today_uploads': 0,
+            'today_download_size': 0,
+            'today_upload_size': 0,
+            'today_errors': 0
+        }
+        
+        self.user_last_seen: Dict[int, float] = {}  # برای کاربران فعال 24 ساعت اخیر
+        self.recent_transfers = deque(maxlen=100)  # (بایت، ثانیه) آخرین انتقال‌ها برای میانگین سرعت
+        self.today = datetime.utcnow().date()
+        self.last_resync: Optional[datetime] = None
+        self.last_sample: Optional[datetime] = None
+        
+        self._tasks = []
+        
+    async def start(self):
+        """بارگذاری اولیه از دیتابیس و شروع نمونه‌برداری پس‌زمینه"""
+        
+        # اولین فراخوانی cpu_percent(None) مبنا را تعیین می‌کند و همیشه 0 برمی‌گرداند
+        psutil.cpu_percent(interval=None)
+        
+        await self.resync()
+        await self.sample_system()
+        
+        self._tasks = [
+            asyncio.create_task(self._periodic(self.sample_system, self.system_interval)),
+            asyncio.create_task(self._periodic(self.resync, self.resync_interval))
+        ]
+        
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        
+    # ========== رویدادها (O(1)، بدون دیتابیس) ==========
+    
+    def record_transfer(self, user_id: int, action: str, file_size: int, seconds: Optional[float] = None):
+        """ثبت یک انتقال کامل شده (seconds = مدت انتقال برای میانگین سرعت)"""
+        
+        self._roll_day()
+        self.user_last_seen[user_id] = time.time()
+        
+        if seconds and seconds > 0 and file_size > 0:
+            self.recent_transfers.append((file_size, seconds))
+        
+        if action == 'download':
+            self.counters['total_downloads'] += 1
+            self.counters['download_size'] += file_size
+            self.counters['today_downloads'] += 1
+            self.counters['today_download_size'] += file_size
+        elif action == 'upload':
+            self.counters['total_uploads'] += 1
+            self.counters['upload_size'] += file_size
+            self.counters['today_uploads'] += 1
+            self.counters['today_upload_size'] += file_size
+            
+    def record_activity(self, user_id: int):
+        """ثبت فعالیت کاربر"""
+        self.user_last_seen[user_id] = time.time()
+        
+    def record_new_user(self, user_id: int):
+        self._roll_day()
+        self.counters['total_users'] += 1
+        self.counters['new_today'] += 1
+        self.user_last_seen[user_id] = time.time()
+        
+    def record_error(self):
+        self._roll_day()
+        self.counters['today_errors'] += 1
+        
+    # ========== خواندن ==========
+    
+    @property
+    def avg_speed(self) -> float:
+        """میانگین سرعت آخرین انتقال‌ها (بایت بر ثانیه)"""
+        seconds = sum(s for _, s in self.recent_transfers)
+        return sum(b for b, _ in self.recent_transfers) / seconds if seconds else 0.0
+        
+    @property
+    def active_24h(self) -> int:
+        cutoff = time.time() - 86400
+        return sum(1 for seen in self.user_last_seen.values() if seen >= cutoff)
+        
+    def get_snapshot(self) -> Dict[str, Any]:
+        """آخرین آمار (فقط خواندن از حافظه)"""
+        
+        self._roll_day()
+        return {
+            'counters': dict(self.counters),
+            'active_24h': self.active_24h,
+            'avg_speed': self.avg_speed,
+            'system': dict(self.system),
+            'last_sample': self.last_sample,
+            'last_resync': self.last_resync
+        }
+        
+    # ========== پس‌زمینه ==========
+    
+    async def sample_system(self):
+        """نمونه‌برداری CPU/RAM/دیسک بدون انتظار یک ثانیه‌ای"""
+        
+        def _sample():
+            memory = psutil.virtual_memory()
+            disk = psutil.disk_usage('/')
+            return {
+                'cpu': psutil.cpu_percent(interval=None),  # از نمونه قبلی تا الان
+                'ram': memory.percent,
+                'ram_used': memory.used,
+                'disk': disk.percent,
+                'disk_free': disk.free
+            }
+            
+        self.system = await executor.run(_sample)
+        self.last_sample = datetime.now()
+        
+    async def resync(self):
+        """همگام‌سازی کامل شمارنده‌ها با دیتابیس (اصلاح انحراف و شروع روز جدید)"""
+        
+        today = datetime.utcnow().date()
+        since_24h = datetime.utcnow() - timedelta(hours=24)
+        
+        async with self.db.get_async_session() as session:
+            user_row = (await session.execute(
+                select(
+                    func.count(User.id),
+                    func.count(User.id).filter(User.is_premium == True),
+                    func.count(User.id).filter(User.created_at >= today),
+                    func.coalesce(func.sum(User.total_uploads), 0),
+                    func.coalesce(func.sum(User.total_upload_size), 0)
+                )
+            )).one()
+            
+            # دانلودهای کامل شده؛ هم‌معنی با رویدادهای record_transfer
+            totals_row = (await session.execute(
+                select(
+                    func.coalesce(func.sum(User.total_downloads), 0),
+                    func.coalesce(func.sum(User.total_download_size), 0)
+                )
+            )).one()
+            
+            today_row = (await session.execute(
+                select(
+                    func.count(DownloadTask.id),
+                    func.coalesce(func.sum(DownloadTask.file_size), 0)
+                ).where(
+                    DownloadTask.created_at >= today,
+                    DownloadTask.status == 'completed'
+                )
+            )).one()
+            
+            today_errors = await session.scalar(
+                select(func.count(SystemLog.id)).where(
+                    SystemLog.level == 'ERROR', SystemLog.created_at >= today
+                )
+            )
+            
+            active = (await session.execute(
+                select(User.user_id, User.last_activity).where(User.last_activity >= since_24h)
+            )).all()
+            
+        self.today = today
+        self.counters.update({
+            'total_users': user_row[0],
+            'premium_users': user_row[1],
+            'new_today': user_row[2],
+            'total_uploads': user_row[3],
+            'upload_size': user_row[4],
+            'total_downloads': totals_row[0],
+            'download_size': totals_row[1],
+            'today_downloads': today_row[0],
+            'today_download_size': today_row[1],
+            'today_errors': today_errors or 0
+        })
+        
+        # فعالیت ثبت شده در حافظه که هنوز به دیتابیس نرسیده حفظ می‌شود
+        cutoff = time.time() - 86400
+        seen = {uid: ts for uid, ts in self.user_last_seen.items() if ts >= cutoff}
+        for user_id, last_activity in active:
+            timestamp = last_activity.replace(tzinfo=timezone.utc).timestamp()  # ذخیره به UTC
+            seen[user_id] = max(seen.get(user_id, 0), timestamp)
+        self.user_last_seen = seen
+        
+        self.last_resync = datetime.now()
+        
+    def _roll_day(self):
+        """صفر کردن شمارنده‌های روزانه با شروع روز جدید"""
+        today = datetime.utcnow().date()
+        if today != self.today:
+            self.today = today
+            for name in ('new_today', 'today_downloads', 'today_uploads',
+                         'today_download_size', 'today_upload_size', 'today_errors'):
+                self.counters[name] = 0
+                
+    async def _periodic(self, func, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await func()
+            except Exception as e:
+                logger.error(f"خطا در به‌روزرسانی آمار پنل: {e}")
@@ -7,13 +7,15 @@ import re
 from datetime import datetime
 from typing import Optional, Dict, Any
 import json
+from database.crud import CRUDOperations
 
 class LoginHandler:
     """مدیریت ورود کاربران"""
     
-    def __init__(self, db_manager, security_manager):
+    def __init__(self, db_manager, security_manager, stats_collector=None):
         self.db = db_manager
         self.security = security_manager
+        self.stats_collector = stats_collector  # کاربران جدید و فعال پنل ادمین (اختیاری)
         self.login_states = {}  # user_id -> login_data
         
     async def start_login_process(self, user_id: int, message: Message) -> bool:
@@ -154,7 +156,7 @@ class LoginHandler:
                 session_string = await client.export_session_string()
                 
                 # رمزنگاری session
-                encrypted_session = self.security.encrypt_session(
+                encrypted_session = await self.security.encrypt_session_async(
                     session_string, 
                     user_id
                 )
@@ -217,7 +219,7 @@ class LoginHandler:
             session_string = await client.export_session_string()
             
             # رمزنگاری و ذخیره
-            encrypted_session = self.security.encrypt_session(session_string, user_id)
+            encrypted_session = await self.security.encrypt_session_async(session_string, user_id)
             
             await self._save_user_session(
                 user_id=user_id,
@@ -241,28 +243,30 @@ class LoginHandler:
                                 phone_number: str, session_data: dict):
         """ذخیره نشست کاربر در دیتابیس"""
         
-        with self.db.get_session() as session:
+        async with self.db.get_async_session() as session:
             # بررسی وجود کاربر
-            user = session.query(User).filter_by(user_id=user_id).first()
+            user = await CRUDOperations.get_user_by_id(session, user_id)
             
             if not user:
-                user = User(
-                    user_id=user_id,
-                    username=telegram_user.username,
-                    first_name=telegram_user.first_name,
-                    last_name=telegram_user.last_name,
-                    phone_number=phone_number,
-                    session_string=json.dumps(session_data),
-                    last_login=datetime.now(),
-                    is_active=True
-                )
-                session.add(user)
+                await CRUDOperations.create_user(session, {
+                    'user_id': user_id,
+                    'username': telegram_user.username,
+                    'first_name': telegram_user.first_name,
+                    'last_name': telegram_user.last_name,
+                    'phone_number': phone_number,
+                    'session_string': json.dumps(session_data),
+                    'last_login': datetime.now(),
+                    'is_active': True
+                })
+                if self.stats_collector:
+                    self.stats_collector.record_new_user(user_id)
             else:
                 user.session_string = json.dumps(session_data)
                 user.last_login = datetime.now()
                 user.is_active = True
-            
-            session.commit()
+                await session.commit()
+                if self.stats_collector:
+                    self.stats_collector.record_activity(user_id)
     
     async def _send_login_success(self, message: Message, telegram_user):
         """ارسال پیام موفقیت آمیز بودن ورود"""
@@ -1,10 +1,19 @@
 # modules/auth/multi_account_manager.py
 import asyncio
+import time
+from contextlib import asynccontextmanager
 from typing import Dict, List, Optional, Any
 from pyrogram import Client
 import json
 from datetime import datetime
 import hashlib
+from config.settings import settings
+from modules.core.resume_store import ResumeStore
+from modules.core.file_id_store import FileIdStore
+from modules.core.client_pool import ClientPool
+from modules.core.account_balancer import AccountBalancer
+from modules.core.flood_control import flood_control
+from modules.behavior.human_simulator import HumanSimulator
 
 class MultiAccountManager:
     """مدیریت چند حساب کاربری همزمان"""
@@ -12,28 +21,45 @@ class MultiAccountManager:
     def __init__(self, db_manager, security_manager):
         self.db = db_manager
         self.security = security_manager
-        self.active_clients: Dict[int, Dict[str, Any]] = {}  # user_id -> {account_id: client}
+        self.active_clients: Dict[int, Dict[str, Any]] = {}  # user_id -> {account_id: اطلاعات حساب}
         self.account_sessions = {}
         
+        # کلاینت‌ها در اولین استفاده وصل و پس از بیکاری قطع می‌شوند (کلید = نام کلاینت)
+        self.pool = ClientPool(
+            max_clients=settings.CLIENT_POOL_SIZE,
+            idle_timeout=settings.CLIENT_IDLE_TIMEOUT
+        )
+        
+        # انتخاب اکانت هر کار (بار فعلی، FloodWait اخیر، سرعت مشاهده شده)
+        self.balancer = AccountBalancer()
+        flood_control.add_listener(self.balancer.penalize)  # اکانت جریمه شده برای کارهای جدید انتخاب نمی‌شود
+        self.resume_store = ResumeStore(db_manager)
+        self.file_ids = FileIdStore(db_manager)
+        
     async def add_account(self, user_id: int, session_data: dict, 
                          account_name: Optional[str] = None) -> Dict[str, Any]:
         """افزودن حساب جدید"""
         
         try:
             # رمزگشایی session
-            session_string = self.security.decrypt_session(session_data)
+            session_string = await self.security.decrypt_session_async(session_data)
             
             # تولید شناسه حساب
             account_id = self._generate_account_id(user_id, session_string)
             
-            # ایجاد کلاینت
-            client = Client(
-                f"user_{user_id}_account_{account_id[:8]}",
-                session_string=session_string,
-                api_id=settings.API_ID,
-                api_hash=settings.API_HASH
-            )
+            # ایجاد کلاینت (بدون دریافت آپدیت؛ این کلاینت‌ها فقط برای انتقال فایل استفاده می‌شوند)
+            client_name = f"user_{user_id}_account_{account_id[:8]}"
             
+            def client_factory():
+                return Client(
+                    client_name,
+                    session_string=session_string,
+                    api_id=settings.API_ID,
+                    api_hash=settings.API_HASH,
+                    no_updates=True
+                )
+                
+            client = client_factory()
             await client.connect()
             
             # بررسی اعتبار session
@@ -46,6 +72,7 @@ class MultiAccountManager:
             
             # دریافت اطلاعات حساب
             me = await client.get_me()
+            client.me = me
             
             # ذخیره حساب در دیتابیس
             account_info = {
@@ -70,8 +97,16 @@ class MultiAccountManager:
             if user_id not in self.active_clients:
                 self.active_clients[user_id] = {}
             
+            # کلاینت متصل به pool سپرده می‌شود و اگر استفاده نشود بعداً قطع می‌شود
+            def pooled_factory():
+                pooled = client_factory()
+                pooled.me = me
+                return pooled
+                
+            self.pool.register(client_name, pooled_factory, client=client)
+            
             self.active_clients[user_id][account_id] = {
-                'client': client,
+                'pool_key': client_name,
                 'info': account_info,
                 'stats': {
                     'downloads': 0,
@@ -97,6 +132,61 @@ class MultiAccountManager:
                 'error': str(e)
             }
     
+    @asynccontextmanager
+    async def use_client(self, user_id: int, account_id: str):
+        """کلاینت متصل حساب در طول بلوک"""
+        account_data = self.active_clients[user_id][account_id]
+        async with self.pool.client(account_data['pool_key']) as client:
+            yield client
+            
+    def acquire_account(self, user_id: int) -> Optional[str]:
+        """انتخاب و رزرو حساب برای یک کار؛ پس از پایان کار release_account فراخوانی شود"""
+        
+        accounts = self.active_clients.get(user_id)
+        if not accounts:
+            return None
+            
+        by_key = {data['pool_key']: account_id for account_id, data in accounts.items()}
+        preferred = next(
+            (data['pool_key'] for data in accounts.values() if data['info'].get('is_active')), None
+        )
+        
+        return by_key[self.balancer.acquire(list(by_key), preferred)]
+        
+    def release_account(self, user_id: int, account_id: str):
+        """پایان کار رزرو شده با acquire_account"""
+        account_data = self.active_clients.get(user_id, {}).get(account_id)
+        if account_data:
+            self.balancer.release(account_data['pool_key'])
+            
+    async def run_with_account(self, user_id: int, account_id: str, func, *args, **kwargs) -> Dict[str, Any]:
+        """اجرای func(client, ...) با کلاینت حساب و ثبت سرعت نتیجه در balancer"""
+        
+        pool_key = self.active_clients[user_id][account_id]['pool_key']
+        started = time.monotonic()
+        
+        # FloodWaitها از طریق flood_control به balancer می‌رسند
+        async with self.pool.client(pool_key) as client:
+            result = await func(client, *args, **kwargs)
+            
+        self._record_result(pool_key, started, result)
+        return result
+        
+    def _record_result(self, pool_key: str, started: float, result: Dict[str, Any]):
+        """ثبت سرعت انتقال در balancer (نتایج کش شده سرعت واقعی اکانت را نشان نمی‌دهند)"""
+        if result.get('success') and not result.get('cached') and not result.get('reused'):
+            self.balancer.record_transfer(
+                pool_key, result.get('file_size', 0), time.monotonic() - started
+            )
+            
+    async def start(self):
+        """شروع قطع خودکار کلاینت‌های بیکار"""
+        await self.pool.start()
+        
+    async def close(self):
+        """قطع اتصال همه کلاینت‌ها (حساب‌ها حذف نمی‌شوند)"""
+        await self.pool.stop()
+        
     async def switch_account(self, user_id: int, account_id: str) -> bool:
         """تعویض حساب فعال"""
         
@@ -117,14 +207,7 @@ class MultiAccountManager:
         
         accounts = []
         
-        # از دیتابیس بخوان
-        with self.db.get_session() as session:
-            from database.models import UserAccount  # نیاز به مدل جدید داریم
-            
-            # این بخش نیاز به مدل UserAccount دارد
-            # فعلاً از active_clients برمی‌گردانیم
-        
-        # از حافظه برگردان
+        # حساب‌ها فعلاً فقط در حافظه نگه‌داری می‌شوند (مدل UserAccount در دیتابیس وجود ندارد)
         if user_id in self.active_clients:
             for account_id, account_data in self.active_clients[user_id].items():
                 accounts.append({
@@ -149,21 +232,23 @@ class MultiAccountManager:
             return {'success': False, 'error': 'حساب یافت نشد'}
         
         account_data = self.active_clients[user_id][account_id]
-        client = account_data['client']
-        
-        # شبیه‌سازی رفتار انسانی
-        humanizer = HumanSimulator()
-        await humanizer.simulate_human_interaction(
-            client, user_id, 'process_request'
-        )
         
-        # دانلود فایل
+        async with self.pool.client(account_data['pool_key']) as client:
+            # شبیه‌سازی رفتار انسانی
+            humanizer = HumanSimulator()
+            await humanizer.simulate_human_interaction(
+                client, user_id, 'process_request'
+            )
+            
+        # دانلود فایل (HTTP؛ به اتصال تلگرام نیاز ندارد)
         from modules.downloader.smart_downloader import SmartDownloader
-        downloader = SmartDownloader()
+        downloader = SmartDownloader(resume_store=self.resume_store)
         
+        started = time.monotonic()
         result = await downloader.download_from_url(
-            url, user_id, progress_callback
+            url, user_id, progress_callback, account_key=account_data['pool_key']
         )
+        self._record_result(account_data['pool_key'], started, result)
         
         if result['success']:
             # به‌روزرسانی آمار حساب
@@ -174,7 +259,8 @@ class MultiAccountManager:
     
     async def upload_with_account(self, user_id: int, account_id: str,
                                  file_path: str, chat_id: int,
-                                 progress_callback=None) -> Dict[str, Any]:
+                                 progress_callback=None,
+                                 source_key: Optional[str] = None) -> Dict[str, Any]:
         """آپلود با حساب مشخص"""
         
         if user_id not in self.active_clients:
@@ -184,13 +270,13 @@ class MultiAccountManager:
             return {'success': False, 'error': 'حساب یافت نشد'}
         
         account_data = self.active_clients[user_id][account_id]
-        client = account_data['client']
         
         from modules.uploader.smart_uploader import SmartUploader
-        uploader = SmartUploader()
+        uploader = SmartUploader(resume_store=self.resume_store, file_ids=self.file_ids)
         
-        result = await uploader.upload_file(
-            client, file_path, chat_id, progress_callback
+        result = await self.run_with_account(
+            user_id, account_id, uploader.upload_file,
+            file_path, chat_id, progress_callback, source_key
         )
         
         if result['success']:
@@ -200,6 +286,40 @@ class MultiAccountManager:
         
         return result
     
+    async def relay_with_account(self, user_id: int, account_id: str,
+                                source_message, chat_id: int, file_name: str,
+                                progress_callback=None) -> Dict[str, Any]:
+        """انتقال مستقیم مدیا (دانلود و آپلود همزمان) با حساب مشخص"""
+        
+        if user_id not in self.active_clients:
+            return {'success': False, 'error': 'کاربر لاگین نکرده است'}
+            
+        if account_id not in self.active_clients[user_id]:
+            return {'success': False, 'error': 'حساب یافت نشد'}
+            
+        account_data = self.active_clients[user_id][account_id]
+        
+        from modules.uploader.smart_uploader import SmartUploader
+        from modules.uploader.stream_relay import StreamRelay
+        uploader = SmartUploader(resume_store=self.resume_store, file_ids=self.file_ids)
+        relay = StreamRelay(uploader, buffer_parts=settings.STREAM_RELAY_BUFFER_PARTS)
+        
+        if not relay.supports(source_message):
+            return {'success': False, 'error': 'مدیا برای انتقال مستقیم مناسب نیست', 'unsupported': True}
+            
+        result = await self.run_with_account(
+            user_id, account_id, relay.relay_message,
+            source_message, chat_id, file_name, progress_callback
+        )
+        
+        if result['success']:
+            # به‌روزرسانی آمار حساب
+            account_data['stats']['downloads'] += 1
+            account_data['stats']['uploads'] += 1
+            account_data['stats']['last_activity'] = datetime.now()
+            
+        return result
+        
     async def remove_account(self, user_id: int, account_id: str) -> bool:
         """حذف حساب"""
         
@@ -211,8 +331,9 @@ class MultiAccountManager:
         
         try:
             # قطع اتصال
-            client = self.active_clients[user_id][account_id]['client']
-            await client.disconnect()
+            pool_key = self.active_clients[user_id][account_id]['pool_key']
+            await self.pool.unregister(pool_key)
+            self.balancer.forget(pool_key)
             
             # حذف از حافظه
             del self.active_clients[user_id][account_id]
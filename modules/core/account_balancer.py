@@ -0,0 +1,108 @@
+# modules/core/account_balancer.py
+import time
+from typing import Dict, Any, List, Optional
+
+class _AccountLoad:
+    """بار و کارایی اخیر یک اکانت"""
+    
+    __slots__ = ('in_flight', 'throughput', 'penalized_until', 'flood_waits', 'assigned', 'last_assigned')
+    
+    def __init__(self):
+        self.in_flight = 0  # کارهای در حال اجرا با این اکانت
+        self.throughput: Optional[float] = None  # بایت بر ثانیه (EWMA انتقال‌های کامل شده)
+        self.penalized_until = 0.0  # پایان FloodWait (monotonic)
+        self.flood_waits = 0
+        self.assigned = 0
+        self.last_assigned = 0.0
+
+class AccountBalancer:
+    """انتخاب اکانت هر کار بر اساس کارهای در حال اجرا، جریمه FloodWait و سرعت مشاهده شده"""
+    
+    def __init__(self, smoothing: float = 0.3, default_throughput: float = 1024 * 1024):
+        self.smoothing = smoothing  # وزن انتقال جدید در EWMA سرعت
+        self.default_throughput = default_throughput  # وقتی هیچ اکانتی سابقه ندارد
+        self.accounts: Dict[str, _AccountLoad] = {}
+        
+    def _load(self, key: str) -> _AccountLoad:
+        load = self.accounts.get(key)
+        if load is None:
+            load = self.accounts[key] = _AccountLoad()
+        return load
+        
+    def _known_throughput(self) -> float:
+        """میانگین سرعت اکانت‌های دارای سابقه (برای اکانت‌های جدید)"""
+        known = [l.throughput for l in self.accounts.values() if l.throughput]
+        return sum(known) / len(known) if known else self.default_throughput
+        
+    def _cost(self, key: str, fallback: float) -> float:
+        """زمان تقریبی تا پایان کار جدید روی این اکانت (نسبی)"""
+        load = self._load(key)
+        return (load.in_flight + 1) / (load.throughput or fallback)
+        
+    def pick(self, candidates: List[str], preferred: Optional[str] = None) -> str:
+        """اکانت مناسب برای یک کار (بدون رزرو)"""
+        
+        if not candidates:
+            raise ValueError("هیچ اکانتی برای انتخاب وجود ندارد")
+            
+        now = time.monotonic()
+        available = [k for k in candidates if self._load(k).penalized_until <= now]
+        if not available:
+            # همه در FloodWait هستند؛ اکانتی که زودتر آزاد می‌شود
+            return min(candidates, key=lambda k: self.accounts[k].penalized_until)
+            
+        fallback = self._known_throughput()
+        return min(available, key=lambda k: (
+            self._cost(k, fallback),
+            k != preferred,  # در تساوی، اکانت فعال کاربر
+            self.accounts[k].last_assigned  # و سپس نوبتی
+        ))
+        
+    def acquire(self, candidates: List[str], preferred: Optional[str] = None) -> str:
+        """انتخاب و رزرو اکانت برای یک کار؛ پس از پایان کار release فراخوانی شود"""
+        key = self.pick(candidates, preferred)
+        load = self.accounts[key]
+        load.in_flight += 1
+        load.assigned += 1
+        load.last_assigned = time.monotonic()
+        return key
+        
+    def release(self, key: str):
+        """پایان کار رزرو شده"""
+        load = self.accounts.get(key)
+        if load and load.in_flight > 0:
+            load.in_flight -= 1
+            
+    def record_transfer(self, key: str, nbytes: int, seconds: float):
+        """ثبت سرعت یک انتقال کامل شده"""
+        if nbytes <= 0 or seconds <= 0:
+            return
+        rate = nbytes / seconds
+        load = self._load(key)
+        load.throughput = rate if load.throughput is None else (
+            self.smoothing * rate + (1 - self.smoothing) * load.throughput
+        )
+        
+    def penalize(self, key: str, seconds: float):
+        """ثبت FloodWait؛ تا پایان آن اکانت انتخاب نمی‌شود (مگر همه جریمه باشند)"""
+        load = self._load(key)
+        load.penalized_until = max(load.penalized_until, time.monotonic() + seconds)
+        load.flood_waits += 1
+        
+    def forget(self, key: str):
+        """حذف اکانت حذف شده"""
+        self.accounts.pop(key, None)
+        
+    def get_stats(self) -> Dict[str, Any]:
+        """وضعیت اکانت‌ها"""
+        now = time.monotonic()
+        return {
+            key: {
+                'in_flight': load.in_flight,
+                'throughput': load.throughput,
+                'penalized_for': max(0.0, load.penalized_until - now),
+                'flood_waits': load.flood_waits,
+                'assigned': load.assigned
+            }
+            for key, load in self.accounts.items()
+        }
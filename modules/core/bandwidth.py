@@ -0,0 +1,155 @@
+# modules/core/bandwidth.py
+import itertools
+import math
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+from config.settings import settings
+from modules.utils.speed_limiter import TokenBucket
+from modules.utils.throughput import ThroughputMeter
+
+class TransferShaper:
+    """سهم پهنای باند یک انتقال؛ هر قطعه قبل از ارسال/پس از دریافت با consume مصرف می‌شود"""
+    
+    def __init__(self, allocator: 'BandwidthAllocator', account_key: Optional[str], transfer_id: int):
+        self.allocator = allocator
+        self.account_key = account_key
+        self.transfer_id = transfer_id
+        self.rate = math.inf  # بایت بر ثانیه؛ توسط allocator تنظیم می‌شود
+        self.bucket: Optional[TokenBucket] = None  # None = بدون محدودیت
+        self.meter = ThroughputMeter()  # سرعت واقعی انتقال (برای پیام پیشرفت و متریک‌ها)
+        
+    async def consume(self, nbytes: int):
+        """انتظار تا مجاز شدن nbytes بایت"""
+        if self.bucket is not None:
+            await self.bucket.acquire(nbytes)
+        self.meter.add(nbytes)
+        
+    @property
+    def transferred(self) -> int:
+        return self.meter.total
+        
+    def _apply_rate(self, rate: float, burst: float, min_capacity: int):
+        self.rate = rate
+        if math.isinf(rate):
+            self.bucket = None
+            return
+            
+        capacity = max(rate * burst, min_capacity)
+        if self.bucket is None:
+            self.bucket = TokenBucket(rate, capacity)
+        else:
+            self.bucket.set_rate(rate, capacity)
+
+class BandwidthAllocator:
+    """تقسیم سلسله‌مراتبی پهنای باند: سقف کل -> اکانت -> انتقال (تقسیم عادلانه max-min)"""
+    
+    def __init__(self, rate: Optional[int] = None, account_rate: Optional[int] = None,
+                 burst: float = 0.5, min_capacity: int = 1024 * 1024):
+        self.rate = rate or math.inf  # سقف کل (بایت بر ثانیه)
+        self.account_rate = account_rate or math.inf  # سقف پیش‌فرض هر اکانت
+        self.burst = burst  # ثانیه؛ اندازه سطل هر انتقال نسبت به نرخ آن
+        self.min_capacity = min_capacity  # حداقل اندازه سطل؛ بزرگ‌ترین قطعه‌ای که یکجا consume می‌شود (GetFile 1MB)
+        
+        self.account_limits: Dict[Optional[str], float] = {}  # سقف اختصاصی برخی اکانت‌ها
+        self.accounts: Dict[Optional[str], Dict[int, TransferShaper]] = {}
+        self._ids = itertools.count(1)
+        
+    @asynccontextmanager
+    async def transfer(self, account_key: Optional[str] = None):
+        """ثبت یک انتقال در طول بلوک؛ با پایان آن سهمش بین بقیه تقسیم می‌شود (account_key = نام کلاینت اکانت)"""
+        shaper = self.open(account_key)
+        try:
+            yield shaper
+        finally:
+            self.close(shaper)
+            
+    def open(self, account_key: Optional[str] = None) -> TransferShaper:
+        shaper = TransferShaper(self, account_key, next(self._ids))
+        self.accounts.setdefault(account_key, {})[shaper.transfer_id] = shaper
+        self._rebalance()
+        return shaper
+        
+    def close(self, shaper: TransferShaper):
+        transfers = self.accounts.get(shaper.account_key)
+        if transfers and transfers.pop(shaper.transfer_id, None) is not None:
+            if not transfers:
+                del self.accounts[shaper.account_key]
+            self._rebalance()
+            
+    def set_account_limit(self, account_key: str, rate: Optional[int]):
+        """سقف اختصاصی یک اکانت (None = سقف پیش‌فرض)"""
+        if rate:
+            self.account_limits[account_key] = rate
+        else:
+            self.account_limits.pop(account_key, None)
+        self._rebalance()
+        
+    def _rebalance(self):
+        """محاسبه دوباره سهم همه انتقال‌ها"""
+        
+        caps = {
+            account_key: self.account_limits.get(account_key, self.account_rate)
+            for account_key in self.accounts
+        }
+        account_shares = self._fair_shares(self.rate, caps)
+        
+        for account_key, transfers in self.accounts.items():
+            per_transfer = account_shares[account_key] / len(transfers)
+            for shaper in transfers.values():
+                shaper._apply_rate(per_transfer, self.burst, self.min_capacity)
+                
+    @staticmethod
+    def _fair_shares(total: float, caps: Dict[Any, float]) -> Dict[Any, float]:
+        """تقسیم max-min: اکانت‌هایی که سقفشان کمتر از سهم برابر است، مازاد را به بقیه می‌دهند"""
+        
+        if math.isinf(total):
+            return dict(caps)
+            
+        shares = {}
+        remaining = total
+        pending = sorted(caps.items(), key=lambda item: item[1])
+        
+        while pending:
+            fair = remaining / len(pending)
+            key, cap = pending[0]
+            if cap > fair:
+                break
+            shares[key] = cap
+            remaining -= cap
+            pending.pop(0)
+            
+        for key, _ in pending:
+            shares[key] = remaining / len(pending)
+            
+        return shares
+        
+    def get_stats(self) -> Dict[str, Any]:
+        """وضعیت فعلی تقسیم پهنای باند"""
+        
+        def _rate(value: float) -> Optional[float]:
+            return None if math.isinf(value) else value
+            
+        shapers = [s for transfers in self.accounts.values() for s in transfers.values()]
+        
+        return {
+            'rate': _rate(self.rate),
+            'active_transfers': len(shapers),
+            'current_speed': sum(s.meter.speed for s in shapers),
+            'accounts': {
+                str(account_key): [
+                    {'rate': _rate(s.rate), 'speed': s.meter.speed, 'transferred': s.transferred}
+                    for s in transfers.values()
+                ]
+                for account_key, transfers in self.accounts.items()
+            }
+        }
+
+# allocatorهای پیش‌فرض پروسه؛ همه دانلودرها و آپلودرها از این‌ها سهم می‌گیرند
+download_bandwidth = BandwidthAllocator(
+    rate=settings.DOWNLOAD_SPEED_LIMIT,
+    account_rate=settings.ACCOUNT_DOWNLOAD_SPEED_LIMIT
+)
+upload_bandwidth = BandwidthAllocator(
+    rate=settings.UPLOAD_SPEED_LIMIT,
+    account_rate=settings.ACCOUNT_UPLOAD_SPEED_LIMIT
+)
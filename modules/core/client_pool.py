@@ -0,0 +1,188 @@
+# modules/core/client_pool.py
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class _PooledClient:
+    """وضعیت یک اکانت در pool"""
+    
+    __slots__ = ('factory', 'client', 'in_use', 'last_used', 'lock', 'connects')
+    
+    def __init__(self, factory: Callable):
+        self.factory = factory  # ساخت Client جدید (بدون اتصال)
+        self.client = None  # None = قطع
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()  # یک اتصال همزمان برای هر اکانت
+        self.connects = 0
+
+class ClientPool:
+    """اتصال تنبل کلاینت‌های Pyrogram اکانت‌ها: اتصال در اولین استفاده، قطع پس از بیکاری و سقف اتصال‌های زنده"""
+    
+    def __init__(self, max_clients: int = 50, idle_timeout: float = 600, reap_interval: float = 60):
+        self.max_clients = max_clients  # سقف کلاینت‌های متصل همزمان
+        self.idle_timeout = idle_timeout  # ثانیه
+        self.reap_interval = reap_interval
+        
+        self.entries: Dict[str, _PooledClient] = {}
+        self._slots = asyncio.Condition()  # انتظار برای آزاد شدن ظرفیت
+        self._task: Optional[asyncio.Task] = None
+        self.disconnect_listeners: List[Callable[[Any], Awaitable]] = []  # مثلاً ParallelMediaDownloader.close
+        
+        self.stats = {'connects': 0, 'idle_disconnects': 0, 'evictions': 0, 'waits': 0}
+        
+    def add_disconnect_listener(self, callback: Callable[[Any], Awaitable]):
+        """اطلاع (async) پیش از قطع هر کلاینت؛ منابع وابسته به آن کلاینت (session‌های مدیا) آزاد شوند"""
+        self.disconnect_listeners.append(callback)
+        
+    @property
+    def live_count(self) -> int:
+        return sum(1 for entry in self.entries.values() if entry.client is not None)
+        
+    def register(self, key: str, factory: Callable, client=None):
+        """ثبت اکانت؛ client (اختیاری) کلاینتی است که همین الان متصل شده است"""
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = _PooledClient(factory)
+        entry.factory = factory
+        if client is not None:
+            entry.client = client
+            entry.last_used = time.monotonic()
+            
+    async def unregister(self, key: str):
+        """حذف اکانت و قطع اتصال آن"""
+        entry = self.entries.pop(key, None)
+        if entry:
+            await self._disconnect(entry)
+            
+    def is_registered(self, key: str) -> bool:
+        return key in self.entries
+        
+    @asynccontextmanager
+    async def client(self, key: str):
+        """کلاینت متصل اکانت در طول بلوک (در صورت قطع بودن، دوباره وصل می‌شود)"""
+        
+        entry = self.entries.get(key)
+        if entry is None:
+            raise KeyError(key)
+            
+        entry.in_use += 1
+        try:
+            async with entry.lock:
+                if entry.client is None or not entry.client.is_connected:
+                    await self._connect(entry)
+            entry.last_used = time.monotonic()
+            yield entry.client
+        finally:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+            async with self._slots:
+                self._slots.notify_all()
+                
+    async def _connect(self, entry: _PooledClient):
+        """اتصال کلاینت؛ اگر سقف پر باشد قدیمی‌ترین کلاینت بیکار قطع می‌شود یا تا آزاد شدن جا صبر می‌شود"""
+        
+        if entry.client is not None:
+            # اتصال قطع شده (شبکه یا سرور)؛ کلاینت تازه ساخته می‌شود
+            await self._disconnect(entry)
+            
+        async with self._slots:
+            while self.live_count >= self.max_clients:
+                idle = [
+                    e for e in self.entries.values()
+                    if e.client is not None and e.in_use == 0 and not e.lock.locked()
+                ]
+                if idle:
+                    victim = min(idle, key=lambda e: e.last_used)
+                    await self._disconnect(victim)
+                    self.stats['evictions'] += 1
+                    continue
+                self.stats['waits'] += 1
+                await self._slots.wait()
+                
+            entry.client = entry.factory()  # جا رزرو می‌شود
+            
+        try:
+            await entry.client.connect()
+        except BaseException:
+            entry.client = None
+            async with self._slots:
+                self._slots.notify_all()
+            raise
+            
+        entry.connects += 1
+        self.stats['connects'] += 1
+        
+    async def _disconnect(self, entry: _PooledClient):
+        client, entry.client = entry.client, None
+        if client is None:
+            return
+            
+        for callback in self.disconnect_listeners:
+            try:
+                await callback(client)
+            except Exception as e:
+                logger.warning(f"خطا در listener قطع کلاینت: {e}")
+                
+        try:
+            if client.is_connected:
+                await client.disconnect()
+        except Exception as e:
+            logger.warning(f"خطا در قطع اتصال کلاینت: {e}")
+            
+    async def reap_idle(self) -> int:
+        """قطع کلاینت‌هایی که بیش از idle_timeout استفاده نشده‌اند"""
+        
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = [
+            entry for entry in self.entries.values()
+            if entry.client is not None and entry.in_use == 0
+            and not entry.lock.locked() and entry.last_used < cutoff
+        ]
+        
+        for entry in idle:
+            await self._disconnect(entry)
+            
+        if idle:
+            self.stats['idle_disconnects'] += len(idle)
+            async with self._slots:
+                self._slots.notify_all()
+                
+        return len(idle)
+        
+    async def start(self):
+        """شروع قطع دوره‌ای کلاینت‌های بیکار"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._reap_loop())
+            
+    async def stop(self):
+        """توقف و قطع همه کلاینت‌ها"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            
+        for entry in list(self.entries.values()):
+            await self._disconnect(entry)
+            
+    async def _reap_loop(self):
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            try:
+                await self.reap_idle()
+            except Exception as e:
+                logger.error(f"خطا در قطع کلاینت‌های بیکار: {e}")
+                
+    def get_stats(self) -> Dict[str, Any]:
+        """وضعیت pool"""
+        return {
+            'registered': len(self.entries),
+            'live': self.live_count,
+            'in_use': sum(1 for entry in self.entries.values() if entry.in_use),
+            'max_clients': self.max_clients,
+            **self.stats
+        }
@@ -0,0 +1,137 @@
+# modules/core/executor.py
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, Any, Callable, Optional
+from config.settings import settings
+
+class OffloadExecutor:
+    """اجرای کارهای CPU-bound (هش، رمزنگاری) خارج از event loop با آمار صف"""
+    
+    def __init__(self, max_threads: int = 4, max_processes: int = 0):
+        self.max_threads = max_threads
+        self.max_processes = max_processes  # 0 = بدون process pool
+        
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        
+        self.stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'in_flight': 0,  # ارسال شده و هنوز تمام نشده
+            'running': 0,
+            'max_queue_depth': 0,
+            'total_wait_time': 0.0,  # مجموع زمان انتظار در صف
+            'total_run_time': 0.0
+        }
+        self._running_lock = threading.Lock()  # running از داخل threadها تغییر می‌کند
+        
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """اجرا در thread pool؛ مناسب hashlib/zlib/cryptography که GIL را آزاد می‌کنند"""
+        return await self._submit(self._get_threads(), func, args, kwargs)
+        
+    async def run_cpu(self, func: Callable, *args, **kwargs) -> Any:
+        """اجرا در process pool (در صورت فعال بودن)؛ func و آرگومان‌ها باید pickle شوند"""
+        pool = self._get_processes() if self.max_processes > 0 else self._get_threads()
+        return await self._submit(pool, func, args, kwargs)
+        
+    async def _submit(self, pool, func: Callable, args, kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        submitted_at = time.perf_counter()
+        
+        self.stats['submitted'] += 1
+        self.stats['in_flight'] += 1
+        self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], self.queue_depth)
+        
+        call = functools.partial(func, *args, **kwargs)
+        if isinstance(pool, ThreadPoolExecutor):
+            # زمان شروع واقعی در thread ثبت می‌شود
+            call = functools.partial(self._timed_call, call, submitted_at)
+            
+        try:
+            result = await loop.run_in_executor(pool, call)
+            
+            if isinstance(pool, ThreadPoolExecutor):
+                started_at, result = result
+                self.stats['total_wait_time'] += started_at - submitted_at
+                self.stats['total_run_time'] += time.perf_counter() - started_at
+            else:
+                self.stats['total_run_time'] += time.perf_counter() - submitted_at
+                
+            self.stats['completed'] += 1
+            return result
+            
+        except Exception:
+            self.stats['failed'] += 1
+            raise
+        finally:
+            self.stats['in_flight'] -= 1
+            
+    def _timed_call(self, call: Callable, submitted_at: float):
+        started_at = time.perf_counter()
+        with self._running_lock:
+            self.stats['running'] += 1
+        try:
+            return started_at, call()
+        finally:
+            with self._running_lock:
+                self.stats['running'] -= 1
+                
+    @property
+    def queue_depth(self) -> int:
+        """تعداد کارهای منتظر در صف (هنوز شروع نشده)"""
+        return max(0, self.stats['in_flight'] - self.stats['running'])
+        
+    def _get_threads(self) -> ThreadPoolExecutor:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(
+                max_workers=self.max_threads, thread_name_prefix='offload'
+            )
+        return self._threads
+        
+    def _get_processes(self) -> ProcessPoolExecutor:
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(max_workers=self.max_processes)
+        return self._processes
+        
+    def get_stats(self) -> Dict[str, Any]:
+        """آمار صف و زمان اجرا"""
+        completed = self.stats['completed'] or 1
+        return {
+            **self.stats,
+            'queue_depth': self.queue_depth,
+            'avg_wait_ms': self.stats['total_wait_time'] / completed * 1000,
+            'avg_run_ms': self.stats['total_run_time'] / completed * 1000,
+            'threads': self.max_threads,
+            'processes': self.max_processes
+        }
+        
+    def shutdown(self, wait: bool = True):
+        """بستن poolها (هنگام خاموش شدن)"""
+        if self._threads:
+            self._threads.shutdown(wait=wait)
+            self._threads = None
+        if self._processes:
+            self._processes.shutdown(wait=wait)
+            self._processes = None
+
+async def to_thread_shielded(func: Callable, *args) -> Any:
+    """مانند asyncio.to_thread، اما با لغو فراخواننده تا پایان کار thread صبر می‌کند
+    
+    کار thread قابل لغو نیست؛ pwrite/pread روی fd مشترک نباید پس از بسته شدن fd ادامه پیدا کند.
+    """
+    future = asyncio.ensure_future(asyncio.to_thread(func, *args))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.wait({future})
+        raise
+
+# executor پیش‌فرض پروسه
+executor = OffloadExecutor(
+    max_threads=settings.OFFLOAD_THREADS,
+    max_processes=settings.OFFLOAD_PROCESSES
+)
@@ -0,0 +1,109 @@
+# modules/core/file_id_store.py
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Any
+from database.models import UploadedFile
+from modules.utils.helpers import Helpers
+
+class FileIdStore:
+    """نگاشت پایدار محتوا -> file_id تلگرام برای هر اکانت (جدول uploaded_files)"""
+    
+    def __init__(self, db_manager, max_memo: int = 1024):
+        self.db = db_manager
+        self.max_memo = max_memo
+        
+        # هش فایل‌های اخیر (مسیر، حجم، mtime) تا فایل تغییر نکرده دوباره خوانده نشود
+        self._memo: "OrderedDict[tuple, str]" = OrderedDict()
+        
+    @staticmethod
+    def account_key(client) -> str:
+        """کلید اکانت؛ شناسه تلگرام در صورت اتصال و در غیر این صورت نام کلاینت"""
+        me = getattr(client, 'me', None)
+        return str(me.id) if me else client.name
+        
+    async def content_key(self, file_path: str, source_key: Optional[str] = None) -> str:
+        """کلید محتوا؛ source_key (مثلاً file_unique_id مبدا) بدون خواندن فایل، وگرنه SHA256 محتوا"""
+        
+        if source_key:
+            return hashlib.sha256(f"source|{source_key}".encode()).hexdigest()
+            
+        stat = os.stat(file_path)
+        memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        
+        digest = self._memo.get(memo_key)
+        if digest is None:
+            digest = await Helpers.get_file_hash_async(file_path, 'sha256')
+            self._memo[memo_key] = digest
+            if len(self._memo) > self.max_memo:
+                self._memo.popitem(last=False)
+        else:
+            self._memo.move_to_end(memo_key)
+            
+        return digest
+        
+    async def get(self, content_key: str, account_key: str) -> Optional[Dict[str, Any]]:
+        """file_id ثبت شده این محتوا برای این اکانت"""
+        return await asyncio.to_thread(self._get_sync, content_key, account_key)
+        
+    async def remember(self, content_key: str, account_key: str, file_id: str,
+                       media_type: Optional[str] = None, file_size: int = 0):
+        """ثبت file_id پس از آپلود موفق"""
+        await asyncio.to_thread(
+            self._remember_sync, content_key, account_key, file_id, media_type, file_size
+        )
+        
+    async def forget(self, content_key: str, account_key: str):
+        """حذف file_idی که دیگر قابل ارسال نیست"""
+        await asyncio.to_thread(self._forget_sync, content_key, account_key)
+        
+    # ========== عملیات همگام (در thread اجرا می‌شوند) ==========
+    
+    def _get_sync(self, content_key: str, account_key: str) -> Optional[Dict[str, Any]]:
+        with self.db.get_session() as session:
+            row = session.query(UploadedFile).filter_by(
+                content_key=content_key, account_key=account_key
+            ).first()
+            
+            if not row:
+                return None
+                
+            row.use_count = (row.use_count or 0) + 1
+            row.last_used = datetime.utcnow()
+            session.commit()
+            
+            return {
+                'file_id': row.file_id,
+                'media_type': row.media_type,
+                'file_size': row.file_size
+            }
+            
+    def _remember_sync(self, content_key, account_key, file_id, media_type, file_size):
+        with self.db.get_session() as session:
+            row = session.query(UploadedFile).filter_by(
+                content_key=content_key, account_key=account_key
+            ).first()
+            
+            if row:
+                row.file_id = file_id
+                row.media_type = media_type
+                row.file_size = file_size
+                row.last_used = datetime.utcnow()
+            else:
+                session.add(UploadedFile(
+                    content_key=content_key,
+                    account_key=account_key,
+                    file_id=file_id,
+                    media_type=media_type,
+                    file_size=file_size
+                ))
+            session.commit()
+            
+    def _forget_sync(self, content_key: str, account_key: str):
+        with self.db.get_session() as session:
+            session.query(UploadedFile).filter_by(
+                content_key=content_key, account_key=account_key
+            ).delete()
+            session.commit()
@@ -0,0 +1,150 @@
+# modules/core/flood_control.py
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from pyrogram.errors import FloodWait
+
+logger = logging.getLogger(__name__)
+
+class FloodController:
+    """اجرای فراخوانی‌های API با رعایت FloodWait هر (اکانت، متد)، ریتری با backoff تصادفی و شمارنده‌ها"""
+    
+    # متدهایی که تکرارشان پس از timeout بی‌خطر است (خواندن یا نوشتن قطعه با همان شماره)؛
+    # ارسال پیام ممکن است پیش از timeout ثبت شده باشد و با ریتری تکراری ارسال شود
+    IDEMPOTENT_METHODS = frozenset({
+        'GetFile', 'SaveFilePart', 'SaveBigFilePart', 'get_messages', 'download_media'
+    })
+    
+    def __init__(self, max_retries: int = 5, max_wait: float = 600, base_delay: float = 1.0,
+                 max_delay: float = 60.0, jitter: float = 0.2, idempotent_methods=None):
+        self.max_retries = max_retries
+        self.max_wait = max_wait  # FloodWait طولانی‌تر از این منتظر نمی‌ماند و به فراخواننده برمی‌گردد
+        self.base_delay = base_delay  # backoff خطاهای شبکه (ثانیه)
+        self.max_delay = max_delay
+        self.jitter = jitter  # نسبت تصادفی؛ فراخوانی‌های منتظر همزمان بیدار نمی‌شوند
+        self.idempotent_methods = frozenset(idempotent_methods or self.IDEMPOTENT_METHODS)  # ریتری خطای شبکه فقط برای این‌ها
+        
+        self.blocked: Dict[Tuple[str, str], Tuple[float, FloodWait]] = {}  # (اکانت، متد) -> (پایان، خطا)
+        self.listeners: List[Callable[[str, float], Any]] = []  # مثلاً AccountBalancer.penalize
+        
+        self.stats = {
+            'calls': 0, 'flood_waits': 0, 'retries': 0, 'deferred': 0,
+            'deferred_seconds': 0.0, 'network_retries': 0, 'gave_up': 0
+        }
+        self.per_account: Dict[str, Dict[str, Any]] = {}
+        
+    def add_listener(self, callback: Callable[[str, float], Any]):
+        """اطلاع از هر FloodWait با (account_key, seconds)"""
+        self.listeners.append(callback)
+        
+    def penalty(self, account_key: str, method: Optional[str] = None) -> float:
+        """ثانیه‌های باقی‌مانده از FloodWait اکانت (برای متد مشخص یا بیشترین مقدار بین متدها)"""
+        now = time.monotonic()
+        waits = [
+            until - now for (account, m), (until, _) in self.blocked.items()
+            if account == account_key and (method is None or m == method)
+        ]
+        return max([0.0] + waits)
+        
+    async def invoke(self, client, query, **kwargs) -> Any:
+        """client.invoke برای توابع raw؛ نام متد همان نوع query است"""
+        return await self.call(client.name, type(query).__name__, client.invoke, query, **kwargs)
+        
+    async def call(self, account_key: str, method: str, func: Callable, *args, **kwargs) -> Any:
+        """اجرای func با انتظار برای FloodWait فعال و ریتری محدود؛ در پایان تلاش‌ها خطا دوباره raise می‌شود
+        
+        FloodWait برای همه متدها ریتری می‌شود (درخواست اجرا نشده است)؛ خطای شبکه فقط برای idempotent_methods.
+        """
+        
+        attempt = 0
+        while True:
+            await self._defer(account_key, method)
+            self.stats['calls'] += 1
+            
+            try:
+                return await func(*args, **kwargs)
+                
+            except FloodWait as e:
+                self._penalize(account_key, method, e)
+                if attempt >= self.max_retries or e.value > self.max_wait:
+                    self.stats['gave_up'] += 1
+                    raise
+                self.stats['retries'] += 1
+                
+            except (ConnectionError, asyncio.TimeoutError):
+                if method not in self.idempotent_methods or attempt >= self.max_retries:
+                    self.stats['gave_up'] += 1
+                    raise
+                self.stats['network_retries'] += 1
+                delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+                await asyncio.sleep(self._jittered(delay))
+                
+            attempt += 1
+            
+    async def _defer(self, account_key: str, method: str):
+        """انتظار تا پایان FloodWait فعال این متد"""
+        
+        entry = self.blocked.get((account_key, method))
+        if entry is None:
+            return
+            
+        until, error = entry
+        remaining = until - time.monotonic()
+        if remaining <= 0:
+            del self.blocked[(account_key, method)]
+            return
+            
+        if remaining > self.max_wait:
+            self.stats['gave_up'] += 1
+            raise error
+            
+        delay = self._jittered(remaining)
+        self.stats['deferred'] += 1
+        self.stats['deferred_seconds'] += delay
+        await asyncio.sleep(delay)
+        
+    def _penalize(self, account_key: str, method: str, error: FloodWait):
+        now = time.monotonic()
+        until = now + error.value
+        
+        current = self.blocked.get((account_key, method))
+        if current is None or current[0] < until:
+            self.blocked[(account_key, method)] = (until, error)
+            
+        # حذف جریمه‌های تمام شده
+        for key in [k for k, (u, _) in self.blocked.items() if u <= now]:
+            del self.blocked[key]
+            
+        self.stats['flood_waits'] += 1
+        account = self.per_account.setdefault(account_key, {'flood_waits': 0, 'wait_seconds': 0, 'methods': {}})
+        account['flood_waits'] += 1
+        account['wait_seconds'] += error.value
+        account['methods'][method] = account['methods'].get(method, 0) + 1
+        
+        logger.warning(f"FloodWait {error.value}s برای {account_key} در {method}")
+        
+        for callback in self.listeners:
+            try:
+                callback(account_key, error.value)
+            except Exception as e:
+                logger.error(f"خطا در listener FloodWait: {e}")
+                
+    def _jittered(self, delay: float) -> float:
+        return delay * (1 + random.uniform(0, self.jitter))
+        
+    def get_stats(self) -> Dict[str, Any]:
+        """شمارنده‌ها و جریمه‌های فعال"""
+        now = time.monotonic()
+        return {
+            **self.stats,
+            'active_penalties': {
+                f"{account}:{method}": until - now
+                for (account, method), (until, _) in self.blocked.items() if until > now
+            },
+            'accounts': self.per_account
+        }
+
+# کنترل‌کننده مشترک پروسه؛ جریمه‌های یک اکانت بین همه ماژول‌ها مشترک است
+flood_control = FloodController()
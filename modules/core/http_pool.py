@@ -0,0 +1,88 @@
+# modules/core/http_pool.py
+import asyncio
+import aiohttp
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any
+from config.settings import settings
+
+class HttpClientPool:
+    """استخر اتصال HTTP مشترک در کل پروسه (keep-alive، کش DNS و سقف اتصال برای هر میزبان)"""
+    
+    def __init__(self, limit: int = 100, limit_per_host: int = 16,
+                 dns_cache_ttl: int = 300, keepalive_timeout: float = 30,
+                 connect_timeout: float = 30):
+        self.limit = limit  # سقف کل اتصال‌های همزمان
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl  # ثانیه
+        self.keepalive_timeout = keepalive_timeout  # نگه‌داری اتصال بیکار برای استفاده مجدد
+        self.connect_timeout = connect_timeout
+        
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+        
+    async def get_session(self) -> aiohttp.ClientSession:
+        """دریافت session مشترک (در اولین استفاده ساخته می‌شود)"""
+        
+        loop = asyncio.get_running_loop()
+        
+        if self._session and not self._session.closed and self._loop is loop:
+            return self._session
+            
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+            self._session = None
+            
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    use_dns_cache=True,
+                    ttl_dns_cache=self.dns_cache_ttl,
+                    keepalive_timeout=self.keepalive_timeout,
+                    enable_cleanup_closed=True
+                )
+                
+                # بدون total؛ هر درخواست timeout خودش را تعیین می‌کند
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout)
+                )
+                
+        return self._session
+        
+    @asynccontextmanager
+    async def session(self):
+        """جایگزین `async with aiohttp.ClientSession()`؛ session پس از استفاده بسته نمی‌شود"""
+        yield await self.get_session()
+        
+    async def close(self):
+        """بستن session و همه اتصال‌های باز (هنگام خاموش شدن)"""
+        
+        if self._session and not self._session.closed:
+            await self._session.close()
+            
+        self._session = None
+        
+    def get_stats(self) -> Dict[str, Any]:
+        """آمار اتصال‌های استخر"""
+        
+        if not self._session or self._session.closed:
+            return {'open': False, 'idle_connections': 0, 'acquired_connections': 0}
+            
+        connector = self._session.connector
+        return {
+            'open': True,
+            'idle_connections': sum(len(c) for c in connector._conns.values()),
+            'acquired_connections': len(connector._acquired),
+            'limit': self.limit,
+            'limit_per_host': self.limit_per_host
+        }
+
+# استخر پیش‌فرض پروسه؛ دانلودرها در صورت تزریق نشدن از این استفاده می‌کنند
+http_pool = HttpClientPool(
+    limit=settings.HTTP_POOL_LIMIT,
+    limit_per_host=settings.HTTP_POOL_LIMIT_PER_HOST
+)
@@ -0,0 +1,268 @@
+# modules/core/job_queue.py
+import asyncio
+import itertools
+import logging
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Callable, Awaitable
+from database.models import DownloadTask
+
+logger = logging.getLogger(__name__)
+
+class DownloadJob:
+    """یک کار دانلود در صف"""
+    
+    def __init__(self, task_id: str, user_id: int, payload: Dict[str, Any],
+                 priority: int = 0, seq: int = 0):
+        self.task_id = task_id
+        self.user_id = user_id
+        self.payload = payload
+        self.priority = priority
+        self.seq = seq  # ترتیب ورود برای کارهای هم‌اولویت
+        
+    @property
+    def sort_key(self):
+        return (-self.priority, self.seq)
+
+class DownloadJobQueue:
+    """صف پایدار کارهای دانلود (جدول download_tasks) با استخر worker ثابت"""
+    
+    def __init__(self, db_manager, handler: Callable[[DownloadJob], Awaitable[Dict[str, Any]]],
+                 workers: int = 8, per_user_limit: int = 3, max_attempts: int = 3):
+        self.db = db_manager
+        self.handler = handler  # اجرای واقعی کار؛ دیکشنری نتیجه برمی‌گرداند
+        self.num_workers = workers  # سقف کل کارهای همزمان
+        self.per_user_limit = per_user_limit
+        self.max_attempts = max_attempts  # اجراهای قطع شده (کرش یا گیر کردن تا ری‌استارت) پیش از failed شدن کار
+        
+        self.pending: List[DownloadJob] = []  # مرتب بر اساس اولویت
+        self.running: Dict[str, asyncio.Task] = {}  # task_id -> task
+        self.running_jobs: Dict[str, DownloadJob] = {}
+        self.user_running: Dict[int, int] = {}
+        
+        self._condition = asyncio.Condition()
+        self._seq = itertools.count()
+        self._workers: List[asyncio.Task] = []
+        self._stopping = False
+        
+    async def start(self):
+        """بازیابی کارهای ناتمام از دیتابیس و راه‌اندازی workerها"""
+        
+        for job in await asyncio.to_thread(self._load_unfinished_sync):
+            job.seq = next(self._seq)
+            self._insert(job)
+            
+        if self.pending:
+            logger.info(f"♻️ {len(self.pending)} کار دانلود ناتمام بازیابی شد")
+            
+        self._workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.num_workers)
+        ]
+        
+    async def stop(self):
+        """توقف workerها؛ کارهای در حال اجرا به pending برمی‌گردند تا در شروع بعدی ادامه یابند"""
+        
+        self._stopping = True
+        
+        for worker in self._workers:
+            worker.cancel()
+        for task in list(self.running.values()):
+            task.cancel()
+            
+        await asyncio.gather(*self._workers, *self.running.values(), return_exceptions=True)
+        self._workers = []
+        
+    async def submit(self, user_id: int, payload: Dict[str, Any], priority: int = 0) -> str:
+        """ثبت کار جدید در دیتابیس و صف"""
+        
+        task_id = f"dl_{user_id}_{uuid.uuid4().hex[:12]}"
+        job = DownloadJob(task_id, user_id, payload, priority, next(self._seq))
+        
+        await asyncio.to_thread(self._create_task_sync, job)
+        
+        async with self._condition:
+            self._insert(job)
+            self._condition.notify_all()
+            
+        return task_id
+        
+    async def cancel(self, task_id: str) -> bool:
+        """لغو یک کار (در صف یا در حال اجرا)"""
+        
+        async with self._condition:
+            for job in self.pending:
+                if job.task_id == task_id:
+                    self.pending.remove(job)
+                    await asyncio.to_thread(self._update_status_sync, task_id, 'cancelled')
+                    return True
+                    
+        task = self.running.get(task_id)
+        if task:
+            task.cancel()
+            return True
+            
+        return False
+        
+    async def cancel_user(self, user_id: int) -> List[str]:
+        """لغو همه کارهای یک کاربر"""
+        
+        task_ids = [j.task_id for j in self.pending if j.user_id == user_id]
+        task_ids += [t for t, j in self.running_jobs.items() if j.user_id == user_id]
+        
+        cancelled = []
+        for task_id in task_ids:
+            if await self.cancel(task_id):
+                cancelled.append(task_id)
+                
+        return cancelled
+        
+    def get_user_jobs(self, user_id: int) -> List[DownloadJob]:
+        """کارهای در صف و در حال اجرای کاربر"""
+        return (
+            [j for j in self.running_jobs.values() if j.user_id == user_id]
+            + [j for j in self.pending if j.user_id == user_id]
+        )
+        
+    def get_stats(self) -> Dict[str, int]:
+        """آمار صف"""
+        return {
+            'pending': len(self.pending),
+            'running': len(self.running),
+            'workers': self.num_workers,
+            'users_active': sum(1 for c in self.user_running.values() if c > 0)
+        }
+        
+    # ========== داخلی ==========
+    
+    def _insert(self, job: DownloadJob):
+        index = 0
+        while index < len(self.pending) and self.pending[index].sort_key <= job.sort_key:
+            index += 1
+        self.pending.insert(index, job)
+        
+    def _next_runnable(self) -> Optional[DownloadJob]:
+        """اولین کار با بالاترین اولویت که کاربرش به سقف همزمانی نرسیده است"""
+        for job in self.pending:
+            if self.user_running.get(job.user_id, 0) < self.per_user_limit:
+                self.pending.remove(job)
+                return job
+        return None
+        
+    async def _worker(self, worker_id: int):
+        while True:
+            async with self._condition:
+                job = self._next_runnable()
+                while job is None:
+                    await self._condition.wait()
+                    job = self._next_runnable()
+                    
+                self.user_running[job.user_id] = self.user_running.get(job.user_id, 0) + 1
+                
+            task = asyncio.create_task(self._execute(job))
+            self.running[job.task_id] = task
+            self.running_jobs[job.task_id] = job
+            
+            try:
+                # wait لغو شدن خود کار را به worker منتقل نمی‌کند
+                await asyncio.wait({task})
+            finally:
+                self.running.pop(job.task_id, None)
+                self.running_jobs.pop(job.task_id, None)
+                
+                async with self._condition:
+                    self.user_running[job.user_id] -= 1
+                    if self.user_running[job.user_id] <= 0:
+                        del self.user_running[job.user_id]
+                    self._condition.notify_all()
+                    
+    async def _execute(self, job: DownloadJob):
+        await asyncio.to_thread(self._update_status_sync, job.task_id, 'downloading')
+        
+        try:
+            result = await self.handler(job)
+        except asyncio.CancelledError:
+            # خاموشی عادی اجرای ناتمام حساب نمی‌شود؛ فقط downloading باقی‌مانده از کرش شمرده می‌شود
+            status = 'pending' if self._stopping else 'cancelled'
+            await asyncio.to_thread(self._update_status_sync, job.task_id, status)
+            raise
+        except Exception as e:
+            logger.error(f"خطا در اجرای کار {job.task_id}: {e}", exc_info=True)
+            await asyncio.to_thread(self._update_status_sync, job.task_id, 'failed', str(e))
+            return
+            
+        result = result or {}
+        if result.get('success'):
+            await asyncio.to_thread(self._update_status_sync, job.task_id, 'completed', None, result)
+        else:
+            await asyncio.to_thread(
+                self._update_status_sync, job.task_id, 'failed', result.get('error'), result
+            )
+            
+    # ========== عملیات همگام دیتابیس (در thread اجرا می‌شوند) ==========
+    
+    def _create_task_sync(self, job: DownloadJob):
+        with self.db.get_session() as session:
+            session.add(DownloadTask(
+                user_id=job.user_id,
+                task_id=job.task_id,
+                source=job.payload.get('url') or job.payload.get('source'),
+                status='pending',
+                priority=job.priority,
+                payload=job.payload
+            ))
+            session.commit()
+            
+    def _update_status_sync(self, task_id: str, status: str,
+                            error: Optional[str] = None, result: Optional[Dict] = None):
+        with self.db.get_session() as session:
+            task = session.query(DownloadTask).filter_by(task_id=task_id).first()
+            if not task:
+                return
+                
+            task.status = status
+            now = datetime.utcnow()
+            
+            if status == 'downloading':
+                task.started_at = now
+            elif status in ('completed', 'failed', 'cancelled'):
+                task.completed_at = now
+                
+            if error:
+                task.error_message = error[:2000]
+                
+            if result:
+                task.file_name = result.get('file_name', task.file_name)
+                task.file_size = result.get('file_size', task.file_size)
+                task.final_path = result.get('file_path', task.final_path)
+                if status == 'completed':
+                    task.progress = 100.0
+                    
+            session.commit()
+            
+    def _load_unfinished_sync(self) -> List[DownloadJob]:
+        with self.db.get_session() as session:
+            tasks = session.query(DownloadTask).filter(
+                DownloadTask.status.in_(['pending', 'downloading'])
+            ).order_by(DownloadTask.created_at).all()
+            
+            jobs = []
+            for task in tasks:
+                if task.status == 'downloading':
+                    # اجرای قبلی بدون نتیجه قطع شده است (کرش یا گیر کردن تا ری‌استارت)
+                    task.retry_count = (task.retry_count or 0) + 1
+                    if task.retry_count >= self.max_attempts:
+                        task.status = 'failed'
+                        task.completed_at = datetime.utcnow()
+                        task.error_message = f'اجرای کار {task.retry_count} بار ناتمام قطع شد'
+                        logger.warning(f"کار {task.task_id} پس از {task.retry_count} اجرای ناتمام failed شد")
+                        continue
+                        
+                # کارهایی که هنگام خاموشی در صف یا در حال اجرا بودند دوباره در صف قرار می‌گیرند
+                task.status = 'pending'
+                jobs.append(DownloadJob(
+                    task.task_id, task.user_id, task.payload or {'url': task.source},
+                    task.priority or 0
+                ))
+                
+            session.commit()
+            return jobs
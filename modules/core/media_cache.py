@@ -0,0 +1,239 @@
+# modules/core/media_cache.py
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional
+from config.settings import settings
+from modules.core.executor import executor
+
+class _KeyLock:
+    """قفل یک کلید و تعداد درخواست‌هایی که آن را گرفته یا منتظرش هستند"""
+    
+    __slots__ = ('lock', 'users')
+    
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+class MediaCache:
+    """کش محتوا-محور فایل‌های دانلود شده (file_unique_id تلگرام یا URL+ETag) با حذف LRU بر اساس حجم"""
+    
+    def __init__(self, cache_dir, max_bytes: int, index_name: str = "index.json"):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes  # 0 = غیرفعال
+        self.index_path = self.cache_dir / index_name
+        
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # قدیمی‌ترین استفاده اول
+        self.total_bytes = 0
+        self._loaded = False
+        self._locks: Dict[str, "_KeyLock"] = {}  # فقط کلیدهای دارای نگه‌دارنده یا منتظر
+        self._save_lock = asyncio.Lock()  # نوشتن index در thread؛ دو نوشتن همزمان نباشد
+        
+        self.stats = {'hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0, 'bytes_saved': 0}
+        
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+        
+    @staticmethod
+    def telegram_key(file_unique_id: str) -> str:
+        """کلید مدیای تلگرام (file_unique_id برای همه اکانت‌ها یکسان است)"""
+        return f"tg:{file_unique_id}"
+        
+    @staticmethod
+    def http_key(url: str, validator: str) -> str:
+        """کلید فایل HTTP؛ validator (ETag یا Last-Modified) با تغییر محتوا عوض می‌شود"""
+        return "http:" + hashlib.sha256(f"{url}|{validator}".encode()).hexdigest()
+        
+    @asynccontextmanager
+    async def lock(self, key: str):
+        """قفل هر کلید؛ درخواست‌های همزمان یک محتوا فقط یک بار دانلود می‌شوند
+        
+        قفل با شمارنده ارجاع نگه داشته می‌شود و فقط وقتی هیچ نگه‌دارنده یا منتظری ندارد حذف می‌شود.
+        """
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = _KeyLock()
+        entry.users += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._locks[key]
+        
+    async def contains(self, key: str) -> bool:
+        """آیا کلید در کش هست (بدون کپی و بدون تغییر ترتیب LRU)"""
+        if not self.enabled:
+            return False
+        await self._ensure_loaded()
+        return key in self.entries
+        
+    async def fetch(self, key: str, dest_path) -> Optional[Dict[str, Any]]:
+        """در صورت وجود کلید، یک کپی از فایل کش در dest_path قرار می‌دهد و اطلاعات آن را برمی‌گرداند
+        
+        فراخواننده باید lock(key) را در اختیار داشته باشد تا فایل در همین حین حذف نشود.
+        """
+        
+        if not self.enabled:
+            return None
+        await self._ensure_loaded()
+        
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+            
+        try:
+            await executor.run(self._copy, entry['path'], str(dest_path), entry['size'])
+        except OSError:
+            # فایل کش از بیرون حذف یا تغییر داده شده است
+            self._drop(key)
+            await self._save_index()
+            self.stats['misses'] += 1
+            return None
+            
+        entry['last_used'] = time.time()
+        self.entries.move_to_end(key)
+        self.stats['hits'] += 1
+        self.stats['bytes_saved'] += entry['size']
+        await self._save_index()
+        
+        return dict(entry)
+        
+    async def put(self, key: str, file_path, file_name: str, **meta) -> Optional[Dict[str, Any]]:
+        """افزودن کپی فایل دانلود شده به کش (فایل اصلی سر جای خود می‌ماند)"""
+        
+        if not self.enabled:
+            return None
+        await self._ensure_loaded()
+        
+        size = os.path.getsize(file_path)
+        if size > self.max_bytes:
+            return None
+            
+        if key in self.entries:
+            self._drop(key)
+            
+        cache_path = self.cache_dir / (
+            hashlib.sha256(key.encode()).hexdigest()[:32] + Path(file_name).suffix
+        )
+        try:
+            await executor.run(self._copy, str(file_path), str(cache_path), size)
+        except OSError:
+            return None
+            
+        entry = {
+            'path': str(cache_path),
+            'file_name': file_name,
+            'size': size,
+            'created': time.time(),
+            'last_used': time.time(),
+            **meta
+        }
+        self.entries[key] = entry
+        self.total_bytes += size
+        self.stats['stored'] += 1
+        
+        self._evict()
+        await self._save_index()
+        return dict(entry)
+        
+    def _evict(self):
+        """حذف قدیمی‌ترین فایل‌ها تا رسیدن به سقف حجم؛ کلیدهای قفل شده حذف نمی‌شوند"""
+        for key in list(self.entries):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if key in self._locks:
+                continue
+            self._drop(key)
+            self.stats['evicted'] += 1
+            
+    def _drop(self, key: str):
+        entry = self.entries.pop(key)
+        self.total_bytes -= entry['size']
+        try:
+            os.remove(entry['path'])
+        except OSError:
+            pass
+            
+    @staticmethod
+    def _copy(src: str, dst: str, size: int):
+        """کپی مستقل فایل (نه hardlink)؛ نوشتن بعدی دانلودها روی همان مسیر نباید فایل کش را تغییر دهد
+        
+        کپی ابتدا در فایل موقت نوشته و سپس با os.replace جایگزین می‌شود؛ حجم مبدأ و مقصد بررسی می‌شود.
+        """
+        if os.path.getsize(src) != size:
+            raise OSError(f"حجم فایل کش با index یکسان نیست: {src}")
+            
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+        tmp_path = f"{dst}.{os.getpid()}.tmp"
+        try:
+            shutil.copyfile(src, tmp_path)
+            if os.path.getsize(tmp_path) != size:
+                raise OSError(f"کپی ناقص فایل کش: {src}")
+            os.replace(tmp_path, dst)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+            
+    async def _ensure_loaded(self):
+        if self._loaded:
+            return
+        async with self._save_lock:
+            if self._loaded:
+                return
+            entries = await executor.run(self._load_index_sync)
+            for key, entry in sorted(entries.items(), key=lambda item: item[1]['last_used']):
+                self.entries[key] = entry
+                self.total_bytes += entry['size']
+            self._loaded = True
+            self._evict()
+            
+    def _load_index_sync(self) -> Dict[str, Dict[str, Any]]:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+            
+        # فقط فایل‌هایی که هنوز با همان حجم روی دیسک هستند
+        return {
+            key: entry for key, entry in entries.items()
+            if os.path.isfile(entry['path']) and os.path.getsize(entry['path']) == entry['size']
+        }
+        
+    async def _save_index(self):
+        async with self._save_lock:
+            snapshot = {key: dict(entry) for key, entry in self.entries.items()}
+            await executor.run(self._save_index_sync, snapshot)
+            
+    def _save_index_sync(self, entries: Dict[str, Dict[str, Any]]):
+        tmp_path = self.index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+        
+    def get_stats(self) -> Dict[str, Any]:
+        """وضعیت کش"""
+        return {
+            'enabled': self.enabled,
+            'entries': len(self.entries),
+            'total_bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            **self.stats
+        }
+
+# کش پیش‌فرض پروسه (دانلودهای تلگرام و HTTP)
+media_cache = MediaCache(settings.MEDIA_CACHE_DIR, settings.MEDIA_CACHE_SIZE)
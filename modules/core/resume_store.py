@@ -0,0 +1,175 @@
+# modules/core/resume_store.py
+import asyncio
+import hashlib
+import os
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+from database.models import TransferState, TransferPart
+from modules.core.executor import executor
+
+class ResumeStore:
+    """ژورنال پایدار Resume برای آپلود و دانلود (جداول transfer_states / transfer_parts)"""
+    
+    def __init__(self, db_manager):
+        self.db = db_manager
+        
+    @staticmethod
+    def make_key(*parts) -> str:
+        """ساخت کلید یکتای انتقال از اجزای آن"""
+        raw_key = "|".join(str(p) for p in parts)
+        return hashlib.sha256(raw_key.encode()).hexdigest()
+        
+    @staticmethod
+    def checksum(data: bytes, value: int = 0) -> int:
+        """CRC32 داده (قابل ادامه با value قبلی)"""
+        return zlib.crc32(data, value)
+        
+    @staticmethod
+    async def checksum_async(data: bytes, value: int = 0) -> int:
+        """CRC32 در executor (برای بخش‌های بزرگ)"""
+        return await executor.run(zlib.crc32, data, value)
+        
+    async def get(self, transfer_key: str) -> Optional[Dict[str, Any]]:
+        """دریافت وضعیت انتقال به همراه بخش‌های تکمیل شده"""
+        return await asyncio.to_thread(self._get_sync, transfer_key)
+        
+    async def begin(self, transfer_key: str, direction: str, source: str, target: str,
+                    total_size: int, part_size: int = 0, validator: Optional[str] = None,
+                    upload_id: Optional[int] = None) -> Dict[str, Any]:
+        """شروع انتقال جدید؛ هر ژورنال قبلی با همین کلید پاک می‌شود"""
+        return await asyncio.to_thread(
+            self._begin_sync, transfer_key, direction, source, target,
+            total_size, part_size, validator, upload_id
+        )
+        
+    async def commit_part(self, transfer_key: str, offset: int, length: int, checksum: int):
+        """ثبت یک بخش که کامل روی مقصد نوشته/ارسال شده است"""
+        await asyncio.to_thread(self._commit_part_sync, transfer_key, offset, length, checksum)
+        
+    async def clear(self, transfer_key: str):
+        """حذف ژورنال پس از اتمام موفق انتقال"""
+        await asyncio.to_thread(self._clear_sync, transfer_key)
+        
+    async def verify_parts(self, file_path: str, parts: List[Dict]) -> List[Dict]:
+        """بررسی CRC بخش‌های ثبت شده روی دیسک و بازگرداندن فقط بخش‌های سالم"""
+        return await executor.run(self._verify_parts_sync, file_path, parts)
+        
+    @staticmethod
+    def missing_ranges(total_size: int, parts: List[Dict]) -> List[tuple]:
+        """بازه‌های (start, end) که هنوز در ژورنال ثبت نشده‌اند"""
+        gaps = []
+        position = 0
+        
+        for part in sorted(parts, key=lambda p: p['offset']):
+            if part['offset'] > position:
+                gaps.append((position, part['offset'] - 1))
+            position = max(position, part['offset'] + part['length'])
+            
+        if position < total_size:
+            gaps.append((position, total_size - 1))
+            
+        return gaps
+        
+    @staticmethod
+    def contiguous_size(parts: List[Dict]) -> int:
+        """تعداد بایت‌های پیوسته تکمیل شده از ابتدای فایل"""
+        position = 0
+        
+        for part in sorted(parts, key=lambda p: p['offset']):
+            if part['offset'] > position:
+                break
+            position = max(position, part['offset'] + part['length'])
+            
+        return position
+        
+    # ========== عملیات همگام (در thread اجرا می‌شوند) ==========
+    
+    def _get_sync(self, transfer_key: str) -> Optional[Dict[str, Any]]:
+        with self.db.get_session() as session:
+            state = session.query(TransferState).filter_by(transfer_key=transfer_key).first()
+            
+            if not state:
+                return None
+                
+            parts = session.query(TransferPart).filter_by(
+                transfer_key=transfer_key
+            ).order_by(TransferPart.offset).all()
+            
+            return {
+                'transfer_key': state.transfer_key,
+                'direction': state.direction,
+                'source': state.source,
+                'target': state.target,
+                'total_size': state.total_size,
+                'part_size': state.part_size,
+                'validator': state.validator,
+                'upload_id': state.upload_id,
+                'parts': [
+                    {'offset': p.offset, 'length': p.length, 'checksum': p.checksum}
+                    for p in parts
+                ]
+            }
+            
+    def _begin_sync(self, transfer_key, direction, source, target,
+                    total_size, part_size, validator, upload_id) -> Dict[str, Any]:
+        with self.db.get_session() as session:
+            session.query(TransferPart).filter_by(transfer_key=transfer_key).delete()
+            session.query(TransferState).filter_by(transfer_key=transfer_key).delete()
+            
+            session.add(TransferState(
+                transfer_key=transfer_key,
+                direction=direction,
+                source=source,
+                target=target,
+                total_size=total_size,
+                part_size=part_size,
+                validator=validator,
+                upload_id=upload_id
+            ))
+            session.commit()
+            
+        return {
+            'transfer_key': transfer_key,
+            'direction': direction,
+            'source': source,
+            'target': target,
+            'total_size': total_size,
+            'part_size': part_size,
+            'validator': validator,
+            'upload_id': upload_id,
+            'parts': []
+        }
+        
+    def _commit_part_sync(self, transfer_key, offset, length, checksum):
+        with self.db.get_session() as session:
+            session.add(TransferPart(
+                transfer_key=transfer_key,
+                offset=offset,
+                length=length,
+                checksum=checksum
+            ))
+            session.query(TransferState).filter_by(transfer_key=transfer_key).update(
+                {'updated_at': datetime.utcnow()}
+            )
+            session.commit()
+            
+    def _clear_sync(self, transfer_key: str):
+        with self.db.get_session() as session:
+            session.query(TransferPart).filter_by(transfer_key=transfer_key).delete()
+            session.query(TransferState).filter_by(transfer_key=transfer_key).delete()
+            session.commit()
+            
+    def _verify_parts_sync(self, file_path: str, parts: List[Dict]) -> List[Dict]:
+        if not os.path.exists(file_path):
+            return []
+            
+        valid = []
+        with open(file_path, 'rb') as f:
+            for part in parts:
+                f.seek(part['offset'])
+                data = f.read(part['length'])
+                if len(data) == part['length'] and zlib.crc32(data) == part['checksum']:
+                    valid.append(part)
+                    
+        return valid
@@ -35,7 +35,7 @@ class SessionManager:
         session_id = f"session_{user_id}_{int(datetime.now().timestamp())}"
         
         # رمزنگاری session
-        encrypted_session = self.security.encrypt_session(session_string, user_id)
+        encrypted_session = await self.security.encrypt_session_async(session_string, user_id)
         
         # ذخیره در کش
         session_data = {
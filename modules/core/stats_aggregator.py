@@ -0,0 +1,115 @@
+# modules/core/stats_aggregator.py
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import update, bindparam
+from database.models import User
+
+logger = logging.getLogger(__name__)
+
+class UserStatsAggregator:
+    """جمع‌آوری آمار کاربران در حافظه و ثبت دسته‌ای در دیتابیس (write-behind)"""
+    
+    COUNTERS = ('total_downloads', 'total_download_size', 'total_uploads', 'total_upload_size')
+    
+    def __init__(self, db_manager, flush_interval: float = 5.0):
+        self.db = db_manager
+        self.flush_interval = flush_interval  # ثانیه
+        
+        self.pending: Dict[int, Dict] = {}  # user_id -> شمارنده‌های ثبت نشده
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        
+        self.stats = {'flushes': 0, 'rows_flushed': 0, 'failed_flushes': 0}
+        
+    def record(self, user_id: int, action: str, file_size: int):
+        """ثبت یک انتقال کامل شده (بدون دسترسی به دیتابیس)"""
+        
+        entry = self.pending.get(user_id)
+        if entry is None:
+            entry = self.pending[user_id] = {name: 0 for name in self.COUNTERS}
+            
+        if action == 'download':
+            entry['total_downloads'] += 1
+            entry['total_download_size'] += file_size
+        elif action == 'upload':
+            entry['total_uploads'] += 1
+            entry['total_upload_size'] += file_size
+            
+        entry['last_activity'] = datetime.utcnow()
+        
+    async def start(self):
+        """شروع ثبت دوره‌ای"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+            
+    async def stop(self):
+        """توقف و ثبت باقی‌مانده شمارنده‌ها"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            
+        await self.flush()
+        
+    async def flush(self) -> int:
+        """ثبت همه شمارنده‌ها با یک UPDATE دسته‌ای"""
+        
+        async with self._flush_lock:
+            if not self.pending:
+                return 0
+                
+            batch, self.pending = self.pending, {}
+            
+            table = User.__table__
+            stmt = update(table).where(table.c.user_id == bindparam('b_user_id')).values(
+                total_downloads=table.c.total_downloads + bindparam('b_total_downloads'),
+                total_download_size=table.c.total_download_size + bindparam('b_total_download_size'),
+                total_uploads=table.c.total_uploads + bindparam('b_total_uploads'),
+                total_upload_size=table.c.total_upload_size + bindparam('b_total_upload_size'),
+                last_activity=bindparam('b_last_activity')
+            )
+            
+            params = [
+                {
+                    'b_user_id': user_id,
+                    'b_last_activity': entry['last_activity'],
+                    **{f'b_{name}': entry[name] for name in self.COUNTERS}
+                }
+                for user_id, entry in batch.items()
+            ]
+            
+            try:
+                async with self.db.get_async_session() as session:
+                    connection = await session.connection()
+                    await connection.execute(stmt, params)
+                    await session.commit()
+                    
+            except Exception as e:
+                logger.error(f"خطا در ثبت آمار کاربران: {e}")
+                self.stats['failed_flushes'] += 1
+                self._merge_back(batch)
+                return 0
+                
+            self.stats['flushes'] += 1
+            self.stats['rows_flushed'] += len(params)
+            return len(params)
+            
+    def _merge_back(self, batch: Dict[int, Dict]):
+        """بازگرداندن شمارنده‌های ثبت نشده برای تلاش بعدی"""
+        
+        for user_id, entry in batch.items():
+            current = self.pending.get(user_id)
+            if current is None:
+                self.pending[user_id] = entry
+                continue
+                
+            for name in self.COUNTERS:
+                current[name] += entry[name]
+            current['last_activity'] = max(current['last_activity'], entry['last_activity'])
+            
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
@@ -7,11 +7,14 @@ from pyrogram import Client
 from pyrogram.types import Message
 import aiohttp
 from urllib.parse import urlparse
+from modules.core.http_pool import http_pool as default_http_pool
+from modules.core.bandwidth import download_bandwidth as default_download_bandwidth
 
 class DownloadManager:
-    def __init__(self):
-        self.downloads: Dict[int, Dict] = {}
+    def __init__(self, http_pool=None, bandwidth=None):
         self.chunk_size = 65536  # 64KB
+        self.http_pool = http_pool or default_http_pool
+        self.bandwidth = bandwidth or default_download_bandwidth
         
     async def download_message(self, client: Client, message: Message, 
                               user_id: int, progress_callback: Callable = None) -> Dict[str, Any]:
@@ -43,12 +46,22 @@ class DownloadManager:
                 os.makedirs(download_dir, exist_ok=True)
                 file_path = os.path.join(download_dir, file_name)
                 
-                # تابع callback برای نمایش پیشرفت
+                shaper = None
+                received = 0
+                
+                # تابع callback برای نمایش پیشرفت (و اعمال سهم پهنای باند)
                 async def progress(current, total):
+                    nonlocal received
+                    if shaper and current > received:
+                        delta = current - received
+                        received = current
+                        await shaper.consume(delta)
+                        
                     if progress_callback:
                         percentage = (current / total) * 100
-                        speed = self._calculate_speed(user_id, current)
-                        eta = self._calculate_eta(current, total, speed)
+                        # سرعت از نمونه‌های همین انتقال (نه وضعیت مشترک کاربر)
+                        speed = shaper.meter.speed
+                        eta = int(shaper.meter.eta(total, current))
                         
                         progress_data = {
                             'percentage': percentage,
@@ -62,11 +75,12 @@ class DownloadManager:
                         await progress_callback(progress_data)
                 
                 # دانلود فایل
-                await client.download_media(
-                    message,
-                    file_name=file_path,
-                    progress=progress
-                )
+                async with self.bandwidth.transfer(client.name) as shaper:
+                    await client.download_media(
+                        message,
+                        file_name=file_path,
+                        progress=progress
+                    )
                 
                 return {
                     "success": True,
@@ -91,7 +105,7 @@ class DownloadManager:
             if "t.me" in parsed_url.netloc:
                 return await self._download_telegram_link(client, url, user_id, progress_callback)
             else:
-                return await self._download_direct_link(url, user_id, progress_callback)
+                return await self._download_direct_link(url, user_id, progress_callback, client.name)
                 
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -105,10 +119,10 @@ class DownloadManager:
         return {"success": False, "error": "دانلود از لینک تلگرام در حال توسعه است"}
     
     async def _download_direct_link(self, url: str, user_id: int, 
-                                   progress_callback: Callable) -> Dict[str, Any]:
+                                   progress_callback: Callable, account_key: str = None) -> Dict[str, Any]:
         """دانلود لینک مستقیم"""
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=3600) as response:
+        async with self.http_pool.session() as session:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=3600)) as response:
                 if response.status == 200:
                     # دریافت نام فایل
                     content_disposition = response.headers.get('content-disposition', '')
@@ -127,30 +141,30 @@ class DownloadManager:
                     
                     # دانلود با نمایش پیشرفت
                     downloaded = 0
-                    start_time = time.time()
                     
-                    with open(file_path, 'wb') as f:
-                        async for chunk in response.content.iter_chunked(self.chunk_size):
-                            if chunk:
-                                f.write(chunk)
-                                downloaded += len(chunk)
+                    async with self.bandwidth.transfer(account_key) as shaper:
+                        with open(file_path, 'wb') as f:
+                            async for chunk in response.content.iter_chunked(self.chunk_size):
+                                if chunk:
+                                    await shaper.consume(len(chunk))
+                                    f.write(chunk)
+                                    downloaded += len(chunk)
                                 
-                                if progress_callback and total_size > 0:
-                                    elapsed = time.time() - start_time
-                                    speed = downloaded / elapsed if elapsed > 0 else 0
-                                    percentage = (downloaded / total_size) * 100
-                                    eta = (total_size - downloaded) / speed if speed > 0 else 0
+                                    if progress_callback and total_size > 0:
+                                        speed = shaper.meter.speed
+                                        percentage = (downloaded / total_size) * 100
+                                        eta = shaper.meter.eta(total_size, downloaded)
                                     
-                                    progress_data = {
-                                        'percentage': percentage,
-                                        'downloaded': downloaded,
-                                        'total': total_size,
-                                        'speed': speed,
-                                        'eta': int(eta),
-                                        'filename': file_name
-                                    }
+                                        progress_data = {
+                                            'percentage': percentage,
+                                            'downloaded': downloaded,
+                                            'total': total_size,
+                                            'speed': speed,
+                                            'eta': int(eta),
+                                            'filename': file_name
+                                        }
                                     
-                                    await progress_callback(progress_data)
+                                        await progress_callback(progress_data)
                     
                     return {
                         "success": True,
@@ -160,24 +174,3 @@ class DownloadManager:
                     }
                 else:
                     return {"success": False, "error": f"خطای HTTP: {response.status}"}
-    
-    def _calculate_speed(self, user_id: int, downloaded: int) -> float:
-        """محاسبه سرعت دانلود"""
-        if user_id not in self.downloads:
-            self.downloads[user_id] = {'start_time': time.time(), 'last_downloaded': 0}
-        
-        download_info = self.downloads[user_id]
-        elapsed = time.time() - download_info['start_time']
-        
-        if elapsed > 0:
-            speed = (downloaded - download_info['last_downloaded']) / elapsed
-            download_info['last_downloaded'] = downloaded
-            download_info['start_time'] = time.time()
-            return speed
-        return 0
-    
-    def _calculate_eta(self, downloaded: int, total: int, speed: float) -> int:
-        """محاسبه زمان باقی‌مانده"""
-        if speed > 0:
-            return int((total - downloaded) / speed)
-        return 0
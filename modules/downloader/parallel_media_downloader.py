@@ -0,0 +1,250 @@
+# modules/downloader/parallel_media_downloader.py
+import asyncio
+import os
+from typing import Dict, Any, Optional, Callable, Tuple
+from pyrogram import raw
+from pyrogram.errors import FloodWait, FileReferenceExpired
+from pyrogram.file_id import FileId, FileType
+from pyrogram.session import Session, Auth
+from modules.core.flood_control import flood_control as default_flood_control
+from modules.core.executor import to_thread_shielded
+
+class ParallelDownloadUnsupported(Exception):
+    """فایل با موتور موازی قابل دانلود نیست (CDN یا نوع مدیا)؛ باید از download_media استفاده شود"""
+    pass
+
+class ParallelMediaDownloader:
+    """دانلود موازی مدیای تلگرام با چند درخواست همزمان upload.GetFile روی DC فایل"""
+    
+    def __init__(self, window: int = 8, sessions_per_dc: int = 2, max_retries: int = 3,
+                 flood=None):
+        self.window = window  # تعداد درخواست‌های همزمان
+        self.sessions_per_dc = sessions_per_dc
+        self.max_retries = max_retries
+        self.flood = flood or default_flood_control  # FloodWait همه قطعه‌ها در یک جا شمرده می‌شود
+        
+        # طبق محدودیت GetFile: limit باید 1MB را بشمارد و offset مضربی از limit باشد
+        self.part_size = 1024 * 1024
+        
+        self.sessions: Dict[Tuple[str, int, int], Session] = {}  # (client, dc, index) -> session
+        self._session_locks: Dict[Tuple[str, int, int], asyncio.Lock] = {}
+        
+    async def download(self, client, message, file_path: str,
+                      progress: Optional[Callable] = None) -> Dict[str, Any]:
+        """دانلود مدیای پیام در file_path؛ progress مانند Pyrogram با (current, total) صدا زده می‌شود"""
+        
+        media = self._get_media(message)
+        if media is None or not getattr(media, 'file_size', 0):
+            raise ParallelDownloadUnsupported('نوع مدیا پشتیبانی نمی‌شود')
+            
+        file_id = FileId.decode(media.file_id)
+        location = self._get_location(file_id)
+        file_size = media.file_size
+        total_parts = (file_size + self.part_size - 1) // self.part_size
+        
+        # location در state است تا پس از تمدید file_reference همه workerها از نسخه جدید استفاده کنند
+        state = {
+            'next_part': 0, 'downloaded': 0, 'location': location,
+            'refreshes': 0, 'refresh_lock': asyncio.Lock()
+        }
+        fd = await asyncio.to_thread(self._open_target, file_path, file_size)
+        
+        workers = [
+            asyncio.create_task(self._part_worker(
+                client, message, file_id.dc_id, index % self.sessions_per_dc,
+                fd, state, total_parts, file_size, progress
+            ))
+            for index in range(min(self.window, total_parts))
+        ]
+        
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            # با خطای یک worker بقیه متوقف می‌شوند و fd فقط پس از پایان همه بسته می‌شود
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await asyncio.to_thread(os.close, fd)
+            
+        if state['downloaded'] != file_size:
+            raise IOError(f"حجم دریافتی ({state['downloaded']}) با حجم فایل ({file_size}) برابر نیست")
+            
+        return {
+            'file_path': file_path,
+            'file_size': file_size,
+            'parts': total_parts,
+            'dc_id': file_id.dc_id
+        }
+        
+    async def _part_worker(self, client, message, dc_id: int, session_index: int,
+                          fd: int, state: Dict, total_parts: int, file_size: int,
+                          progress: Optional[Callable]):
+        """یک جایگاه از پنجره همزمانی که تا پایان فایل قطعه برمی‌دارد"""
+        
+        while state['next_part'] < total_parts:
+            part = state['next_part']
+            state['next_part'] += 1
+            
+            while True:
+                location = state['location']
+                try:
+                    data = await self._fetch_part(client, location, dc_id, session_index, part)
+                    break
+                except FileReferenceExpired:
+                    # همان قطعه با location تازه دوباره درخواست می‌شود
+                    await self._refresh_location(client, message, state, location)
+            
+            # نوشتن موقعیتی؛ هر قطعه دقیقاً در آفست خودش قرار می‌گیرد
+            await to_thread_shielded(self._write_at, fd, part * self.part_size, data)
+            
+            state['downloaded'] += len(data)
+            if progress:
+                await progress(state['downloaded'], file_size)
+                
+    async def _refresh_location(self, client, message, state: Dict, stale_location):
+        """دریافت دوباره پیام برای file_reference تازه؛ در صورت شکست ParallelDownloadUnsupported"""
+        
+        async with state['refresh_lock']:
+            if state['location'] is not stale_location:
+                return  # worker دیگری پیش‌تر تمدید کرده است
+                
+            if state['refreshes'] >= self.max_retries:
+                raise ParallelDownloadUnsupported('file_reference پس از تمدید هم منقضی است')
+            state['refreshes'] += 1
+            
+            try:
+                fresh = await self.flood.call(
+                    client.name, 'get_messages', client.get_messages,
+                    message.chat.id, message.id
+                )
+                media = self._get_media(fresh) if fresh else None
+                if media is None:
+                    raise ValueError('مدیای پیام دیگر در دسترس نیست')
+                state['location'] = self._get_location(FileId.decode(media.file_id))
+            except (ParallelDownloadUnsupported, FloodWait):
+                raise
+            except Exception as e:
+                raise ParallelDownloadUnsupported(f'تمدید file_reference ناموفق بود: {e}') from e
+                
+    async def _fetch_part(self, client, location, dc_id: int,
+                         session_index: int, part: int) -> bytes:
+        """دریافت یک قطعه با ریتری مستقل"""
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                session = await self._get_session(client, dc_id, session_index)
+                result = await self.flood.call(
+                    client.name, 'GetFile', session.invoke,
+                    raw.functions.upload.GetFile(
+                        location=location,
+                        offset=part * self.part_size,
+                        limit=self.part_size
+                    ),
+                    sleep_threshold=0  # انتظار FloodWait با flood_control (مشترک بین workerها)
+                )
+                
+                if isinstance(result, raw.types.upload.FileCdnRedirect):
+                    raise ParallelDownloadUnsupported('فایل روی CDN است')
+                    
+                return result.bytes
+                
+            except (ParallelDownloadUnsupported, FloodWait, FileReferenceExpired):
+                raise
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+                
+    async def _get_session(self, client, dc_id: int, index: int) -> Session:
+        """دریافت (یا ایجاد) session مدیا برای DC فایل"""
+        
+        key = (client.name, dc_id, index)
+        
+        if key in self.sessions:
+            return self.sessions[key]
+            
+        lock = self._session_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            if key in self.sessions:
+                return self.sessions[key]
+                
+            test_mode = await client.storage.test_mode()
+            is_home_dc = dc_id == await client.storage.dc_id()
+            
+            auth_key = (
+                await client.storage.auth_key() if is_home_dc
+                else await Auth(client, dc_id, test_mode).create()
+            )
+            
+            session = Session(client, dc_id, auth_key, test_mode, is_media=True)
+            await session.start()
+            
+            if not is_home_dc:
+                # انتقال احراز هویت به DC دیگر
+                exported = await client.invoke(
+                    raw.functions.auth.ExportAuthorization(dc_id=dc_id)
+                )
+                await session.invoke(
+                    raw.functions.auth.ImportAuthorization(
+                        id=exported.id,
+                        bytes=exported.bytes
+                    )
+                )
+                
+            self.sessions[key] = session
+            return session
+            
+    async def close(self, client=None):
+        """بستن session‌های مدیا (همه یا فقط مربوط به یک کلاینت)"""
+        
+        for key in list(self.sessions.keys()):
+            if client is None or key[0] == client.name:
+                session = self.sessions.pop(key)
+                try:
+                    await session.stop()
+                except Exception:
+                    pass
+                    
+    def _get_media(self, message):
+        """یافتن شیء مدیای پیام"""
+        
+        for attr in ('document', 'video', 'audio', 'animation', 'voice', 'video_note', 'photo'):
+            media = getattr(message, attr, None)
+            if media:
+                return media
+        return None
+        
+    def _get_location(self, file_id: FileId):
+        """ساخت InputFileLocation از file_id"""
+        
+        if file_id.file_type == FileType.PHOTO:
+            return raw.types.InputPhotoFileLocation(
+                id=file_id.media_id,
+                access_hash=file_id.access_hash,
+                file_reference=file_id.file_reference,
+                thumb_size=file_id.thumbnail_size
+            )
+            
+        if file_id.file_type in (FileType.CHAT_PHOTO, FileType.THUMBNAIL):
+            raise ParallelDownloadUnsupported('نوع فایل پشتیبانی نمی‌شود')
+            
+        return raw.types.InputDocumentFileLocation(
+            id=file_id.media_id,
+            access_hash=file_id.access_hash,
+            file_reference=file_id.file_reference,
+            thumb_size=file_id.thumbnail_size
+        )
+        
+    @staticmethod
+    def _open_target(file_path: str, file_size: int) -> int:
+        fd = os.open(file_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.ftruncate(fd, file_size)
+        return fd
+        
+    @staticmethod
+    def _write_at(fd: int, offset: int, data: bytes):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
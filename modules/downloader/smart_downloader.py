@@ -7,28 +7,51 @@ import os
 import time
 from pathlib import Path
 import hashlib
+import zlib
 from urllib.parse import urlparse, unquote
+from config.settings import settings
+from modules.core.http_pool import http_pool as default_http_pool
+from modules.core.bandwidth import download_bandwidth as default_download_bandwidth
+from modules.core.media_cache import media_cache as default_media_cache
+from modules.utils.throughput import ThroughputMeter
 
 class SmartDownloader:
     """سیستم دانلود هوشمند با قابلیت‌های پیشرفته"""
     
-    def __init__(self, max_concurrent: int = 3):
+    def __init__(self, max_concurrent: int = 3, resume_store=None, http_pool=None,
+                 bandwidth=None, cache=None):
         self.max_concurrent = max_concurrent
         self.semaphore = asyncio.Semaphore(max_concurrent)
         self.active_downloads = {}
         
+        # استخر اتصال مشترک (keep-alive بین دانلودها)
+        self.http_pool = http_pool or default_http_pool
+        self.request_timeout = aiohttp.ClientTimeout(total=3600)
+        
+        # سهم پهنای باند از allocator مشترک (سقف کل -> اکانت -> انتقال)
+        self.bandwidth = bandwidth or default_download_bandwidth
+        
+        # کش محتوا (URL + ETag)؛ فایل تکراری دوباره دانلود نمی‌شود
+        self.cache = cache or default_media_cache
+        
+        # ژورنال Resume (اختیاری)؛ هر resume_commit_size بایت یک بخش ثبت می‌شود
+        self.resume_store = resume_store
+        self.resume_commit_size = 4 * 1024 * 1024
+        
     async def download_from_url(self, url: str, user_id: int, 
-                               progress_callback: Optional[Callable] = None) -> Dict[str, Any]:
+                               progress_callback: Optional[Callable] = None,
+                               account_key: Optional[str] = None) -> Dict[str, Any]:
         """دانلود از لینک با قابلیت‌های پیشرفته"""
         
         # بررسی نوع لینک
         if self._is_telegram_link(url):
             return await self._download_telegram_content(url, user_id, progress_callback)
         else:
-            return await self._download_http_content(url, user_id, progress_callback)
+            return await self._download_http_content(url, user_id, progress_callback, account_key)
     
     async def _download_http_content(self, url: str, user_id: int, 
-                                    progress_callback: Optional[Callable]) -> Dict[str, Any]:
+                                    progress_callback: Optional[Callable],
+                                    account_key: Optional[str] = None) -> Dict[str, Any]:
         """دانلود محتوای HTTP/HTTPS"""
         
         task_id = hashlib.md5(f"{url}_{user_id}".encode()).hexdigest()[:10]
@@ -41,12 +64,11 @@ class SmartDownloader:
         
         try:
             async with self.semaphore:
-                async with aiohttp.ClientSession(
-                    timeout=aiohttp.ClientTimeout(total=3600)
-                ) as session:
+                async with self.http_pool.session() as session:
                     
                     # دریافت هدرها
-                    async with session.head(url, allow_redirects=True) as head_resp:
+                    async with session.head(url, allow_redirects=True,
+                                            timeout=self.request_timeout) as head_resp:
                         total_size = int(head_resp.headers.get('content-length', 0))
                         
                         if total_size > settings.MAX_FILE_SIZE:
@@ -59,31 +81,36 @@ class SmartDownloader:
                         # تعیین نام فایل
                         filename = self._extract_filename(url, head_resp)
                         
-                        # ایجاد مسیر دانلود
-                        download_path = self._get_download_path(user_id, filename)
-                        
-                        # دانلود فایل
-                        await self._download_with_progress(
-                            session, url, download_path, total_size,
-                            task_id, progress_callback
-                        )
-                        
-                        # بررسی یکپارچگی فایل
-                        if await self._verify_file_integrity(download_path, total_size):
-                            return {
-                                'success': True,
-                                'file_path': str(download_path),
-                                'file_name': filename,
-                                'file_size': total_size,
-                                'task_id': task_id,
-                                'download_type': 'http'
-                            }
-                        else:
-                            return {
-                                'success': False,
-                                'error': 'خطا در یکپارچگی فایل دانلود شده',
-                                'task_id': task_id
-                            }
+                        # کش محتوا فقط وقتی سرور validator (ETag/Last-Modified) بدهد؛ بدون آن تازه بودن نسخه کش معلوم نیست
+                        validator = head_resp.headers.get('etag') or head_resp.headers.get('last-modified')
+                        if not validator:
+                            return await self._fetch_http_content(
+                                session, url, user_id, filename, total_size, head_resp,
+                                task_id, progress_callback, account_key
+                            )
+                            
+                        cache_key = self.cache.http_key(url, validator)
+                        async with self.cache.lock(cache_key):
+                            download_path = self._get_download_path(user_id, filename)
+                            cached = await self.cache.fetch(cache_key, download_path)
+                            if cached:
+                                return {
+                                    'success': True,
+                                    'file_path': str(download_path),
+                                    'file_name': filename,
+                                    'file_size': cached['size'],
+                                    'task_id': task_id,
+                                    'download_type': 'http',
+                                    'cached': True
+                                }
+                                
+                            result = await self._fetch_http_content(
+                                session, url, user_id, filename, total_size, head_resp,
+                                task_id, progress_callback, account_key
+                            )
+                            if result['success']:
+                                await self.cache.put(cache_key, result['file_path'], filename, url=url)
+                            return result
                             
         except Exception as e:
             return {
@@ -94,24 +121,126 @@ class SmartDownloader:
         finally:
             if task_id in self.active_downloads:
                 del self.active_downloads[task_id]
+                
+    async def _fetch_http_content(self, session, url: str, user_id: int, filename: str,
+                                  total_size: int, head_resp, task_id: str,
+                                  progress_callback: Optional[Callable],
+                                  account_key: Optional[str]) -> Dict[str, Any]:
+        """دانلود واقعی فایل HTTP (بدون کش)"""
+        
+        # ایجاد مسیر دانلود (یا ادامه دانلود نیمه‌کاره قبلی)
+        download_path, resume_from, resume_key = await self._prepare_resume(
+            url, user_id, filename, total_size, head_resp
+        )
+        
+        # دانلود فایل
+        async with self.bandwidth.transfer(account_key) as shaper:
+            await self._download_with_progress(
+                session, url, download_path, total_size,
+                task_id, progress_callback, resume_from, resume_key, shaper
+            )
+            
+        # بررسی یکپارچگی فایل
+        if await self._verify_file_integrity(download_path, total_size):
+            if resume_key:
+                await self.resume_store.clear(resume_key)
+                
+            return {
+                'success': True,
+                'file_path': str(download_path),
+                'file_name': filename,
+                'file_size': total_size,
+                'task_id': task_id,
+                'download_type': 'http'
+            }
+        else:
+            return {
+                'success': False,
+                'error': 'خطا در یکپارچگی فایل دانلود شده',
+                'task_id': task_id
+            }
     
+    async def _prepare_resume(self, url: str, user_id: int, filename: str,
+                             total_size: int, head_resp) -> tuple:
+        """تعیین مسیر دانلود و نقطه ادامه از روی ژورنال Resume"""
+        
+        if not self.resume_store:
+            return self._get_download_path(user_id, filename), 0, None
+            
+        resume_key = self.resume_store.make_key('download', user_id, url)
+        validator = head_resp.headers.get('etag') or head_resp.headers.get('last-modified')
+        accepts_ranges = head_resp.headers.get('accept-ranges', '').lower() == 'bytes'
+        
+        state = await self.resume_store.get(resume_key)
+        
+        if (state and state['target'] and accepts_ranges and total_size > 0
+                and state['total_size'] == total_size
+                and state['validator'] == validator):
+            # فقط بخش‌هایی که CRC آن‌ها روی دیسک درست است معتبرند
+            parts = await self.resume_store.verify_parts(state['target'], state['parts'])
+            resume_from = self.resume_store.contiguous_size(parts)
+            
+            if resume_from > 0:
+                return Path(state['target']), resume_from, resume_key
+                
+        if state and state['target']:
+            download_path = Path(state['target'])
+        else:
+            download_path = self._get_download_path(user_id, filename)
+            
+        await self.resume_store.begin(
+            resume_key, 'download', url, str(download_path), total_size,
+            part_size=self.resume_commit_size, validator=validator
+        )
+        
+        return download_path, 0, resume_key
+        
     async def _download_with_progress(self, session, url, file_path, 
-                                     total_size, task_id, progress_callback):
+                                     total_size, task_id, progress_callback,
+                                     resume_from: int = 0, resume_key: Optional[str] = None,
+                                     shaper=None):
         """دانلود با نمایش پیشرفت"""
         
-        downloaded = 0
-        start_time = time.time()
+        headers = {'Range': f'bytes={resume_from}-'} if resume_from else {}
+        meter = shaper.meter if shaper else ThroughputMeter()
         
-        async with session.get(url) as response:
-            async with aiofiles.open(file_path, 'wb') as f:
+        async with session.get(url, headers=headers, timeout=self.request_timeout) as response:
+            if resume_from and response.status != 206:
+                # سرور Range را نادیده گرفت؛ دانلود از ابتدا
+                resume_from = 0
+                
+            downloaded = resume_from
+            segment_start = resume_from
+            segment_crc = 0
+            
+            async with aiofiles.open(file_path, 'r+b' if resume_from else 'wb') as f:
+                if resume_from:
+                    await f.seek(resume_from)
+                    await f.truncate()
+                    
                 async for chunk in response.content.iter_chunked(8192 * 8):  # 64KB chunks
                     if chunk:
+                        if shaper:
+                            await shaper.consume(len(chunk))
+                        else:
+                            meter.add(len(chunk))
+                            
                         await f.write(chunk)
                         downloaded += len(chunk)
+                        segment_crc = zlib.crc32(chunk, segment_crc)
+                        
+                        # ثبت بخش کامل شده در ژورنال Resume
+                        if resume_key and downloaded - segment_start >= self.resume_commit_size:
+                            await f.flush()
+                            await self.resume_store.commit_part(
+                                resume_key, segment_start,
+                                downloaded - segment_start, segment_crc
+                            )
+                            segment_start = downloaded
+                            segment_crc = 0
                         
-                        # محاسبه سرعت
-                        elapsed = time.time() - start_time
-                        speed = downloaded / elapsed if elapsed > 0 else 0
+                        # سرعت لحظه‌ای (پنجره لغزان)
+                        speed = meter.speed
                         
                         # به‌روزرسانی آمار
                         self.active_downloads[task_id].update({
@@ -123,7 +252,7 @@ class SmartDownloader:
                         # فراخوانی callback پیشرفت
                         if progress_callback and total_size > 0:
                             progress = (downloaded / total_size) * 100
-                            eta = (total_size - downloaded) / speed if speed > 0 else 0
+                            eta = meter.eta(total_size, downloaded)
                             
                             await progress_callback({
                                 'task_id': task_id,
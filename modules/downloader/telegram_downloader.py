@@ -5,11 +5,32 @@ from pyrogram.types import Message
 from pyrogram.errors import ChannelPrivate, FloodWait
 import re
 from urllib.parse import urlparse, parse_qs
+from modules.downloader.parallel_media_downloader import (
+    ParallelMediaDownloader, ParallelDownloadUnsupported
+)
+from modules.core.bandwidth import download_bandwidth as default_download_bandwidth
+from modules.core.media_cache import media_cache as default_media_cache
+from modules.core.flood_control import flood_control as default_flood_control
 
 class TelegramDownloader:
     """دانلود از تلگرام با استفاده از Session کاربر"""
     
-    def __init__(self):
+    def __init__(self, parallel: bool = False, parallel_window: int = 8, bandwidth=None,
+                 cache=None, flood=None):
+        # حالت دانلود موازی قطعه‌ها (اختیاری)
+        self.parallel = parallel
+        self.parallel_min_size = 10 * 1024 * 1024  # فایل‌های کوچک‌تر تک‌جریانی دانلود می‌شوند
+        self.parallel_engine = ParallelMediaDownloader(window=parallel_window)
+        
+        # سهم پهنای باند هر دانلود (اکانت = نام کلاینت)
+        self.bandwidth = bandwidth or default_download_bandwidth
+        
+        # کش محتوا (file_unique_id)؛ یک پست پرطرفدار فقط یک بار دانلود می‌شود
+        self.cache = cache or default_media_cache
+        
+        # انتظار و ریتری FloodWait (مشترک با آپلودر)؛ دانلود با FloodWait کوتاه شکست نمی‌خورد
+        self.flood = flood or default_flood_control
+        
         self.message_patterns = {
             'channel_post': r't\.me/(c/)?(\w+)/(\d+)',
             'private_channel': r't\.me/\+(\w+)',
@@ -59,15 +80,43 @@ class TelegramDownloader:
                 'error': 'کانال خصوصی است و نیاز به عضویت دارید'
             }
         except FloodWait as e:
-            return {
-                'success': False,
-                'error': f'محدودیت تلگرام، لطفاً {e.value} ثانیه صبر کنید'
-            }
+            return self._flood_wait_result(e)
         except Exception as e:
             return {
                 'success': False,
                 'error': f'خطا در دانلود: {str(e)}'
             }
+            
+    @staticmethod
+    def _flood_wait_result(error: FloodWait) -> Dict[str, Any]:
+        """نتیجه ناموفق FloodWait؛ فراخواننده (run_with_account) زمان انتظار را می‌بیند"""
+        return {
+            'success': False,
+            'error': f'محدودیت تلگرام، لطفاً {error.value} ثانیه صبر کنید',
+            'flood_wait': error.value
+        }
+        
+    async def get_source_message(self, client, url: str) -> Optional[Message]:
+        """دریافت پیام مبدا از لینک (برای انتقال مستقیم بدون دانلود روی دیسک)"""
+        
+        link_type, params = self._parse_telegram_link(url)
+        
+        if link_type not in ('channel_post', 'group_message'):
+            return None
+            
+        try:
+            message = await self.flood.call(
+                client.name, 'get_messages', client.get_messages, params['chat'], params['message_id']
+            )
+        except FloodWait:
+            raise
+        except Exception:
+            return None
+            
+        if not message or not message.media:
+            return None
+            
+        return message
     
     async def _download_channel_post(self, client, chat: str, 
                                     message_id: int, 
@@ -76,7 +125,9 @@ class TelegramDownloader:
         
         try:
             # دریافت پیام
-            message = await client.get_messages(chat, message_id)
+            message = await self.flood.call(
+                client.name, 'get_messages', client.get_messages, chat, message_id
+            )
             
             if not message or not message.media:
                 return {
@@ -89,6 +140,9 @@ class TelegramDownloader:
                 client, message, progress_callback
             )
             
+        except FloodWait:
+            # به download_from_telegram می‌رسد و نتیجه flood_wait برمی‌گرداند
+            raise
         except Exception as e:
             return {
                 'success': False,
@@ -138,6 +192,8 @@ class TelegramDownloader:
                 'error': 'هیچ مدیایی در این چت یافت نشد'
             }
             
+        except FloodWait:
+            raise
         except Exception as e:
             return {
                 'success': False,
@@ -160,7 +216,9 @@ class TelegramDownloader:
                 }
             
             # دریافت پیام
-            message = await client.get_messages(chat_obj.id, message_id)
+            message = await self.flood.call(
+                client.name, 'get_messages', client.get_messages, chat_obj.id, message_id
+            )
             
             if not message or not message.media:
                 return {
@@ -173,6 +231,8 @@ class TelegramDownloader:
                 client, message, progress_callback
             )
             
+        except FloodWait:
+            raise
         except Exception as e:
             return {
                 'success': False,
@@ -202,6 +262,8 @@ class TelegramDownloader:
                 client, message, progress_callback
             )
             
+        except FloodWait:
+            raise
         except Exception as e:
             return {
                 'success': False,
@@ -209,7 +271,8 @@ class TelegramDownloader:
             }
     
     async def _download_message_media(self, client, message: Message,
-                                     progress_callback: Optional[Callable]) -> Dict[str, Any]:
+                                     progress_callback: Optional[Callable],
+                                     parallel: Optional[bool] = None) -> Dict[str, Any]:
         """دانلود مدیا از یک پیام"""
         
         # تعیین نام فایل
@@ -222,26 +285,90 @@ class TelegramDownloader:
         
         file_path = os.path.join(download_dir, file_name)
         
-        # تابع callback برای پیشرفت
+        media = self._get_media(message)
+        unique_id = getattr(media, 'file_unique_id', None)
+        if not unique_id:
+            return await self._fetch_message_media(
+                client, message, file_name, file_path, progress_callback, parallel
+            )
+            
+        cache_key = self.cache.telegram_key(unique_id)
+        async with self.cache.lock(cache_key):
+            cached = await self.cache.fetch(cache_key, file_path)
+            if cached:
+                return {
+                    'success': True,
+                    'file_path': file_path,
+                    'file_name': file_name,
+                    'file_size': cached['size'],
+                    'message_id': message.id,
+                    'chat_id': message.chat.id,
+                    'file_unique_id': unique_id,
+                    'cached': True
+                }
+                
+            result = await self._fetch_message_media(
+                client, message, file_name, file_path, progress_callback, parallel
+            )
+            if result['success']:
+                result['file_unique_id'] = unique_id
+                await self.cache.put(cache_key, file_path, file_name)
+            return result
+            
+    async def _fetch_message_media(self, client, message: Message, file_name: str, file_path: str,
+                                   progress_callback: Optional[Callable],
+                                   parallel: Optional[bool]) -> Dict[str, Any]:
+        """دانلود واقعی مدیا از تلگرام (بدون کش)"""
+        
+        import os
+        
+        shaper = None
+        received = 0
+        
+        # تابع callback برای پیشرفت (Pyrogram و موتور موازی پس از هر قطعه منتظر آن می‌مانند؛ محدودیت سرعت همین‌جا اعمال می‌شود)
         async def download_progress(current, total):
+            nonlocal received
+            if shaper and current > received:
+                delta = current - received
+                received = current
+                await shaper.consume(delta)
+                
             if progress_callback:
                 progress_data = {
                     'progress': (current / total) * 100,
                     'downloaded': current,
                     'total': total,
                     'filename': file_name,
-                    'speed': 0,  # محاسبه جداگانه نیاز دارد
-                    'eta': 0     # محاسبه جداگانه نیاز دارد
+                    'speed': shaper.meter.speed,
+                    'eta': shaper.meter.eta(total, current)
                 }
                 await progress_callback(progress_data)
         
         # دانلود فایل
+        shaper = self.bandwidth.open(client.name)
         try:
-            await client.download_media(
-                message,
-                file_name=file_path,
-                progress=download_progress
-            )
+            if parallel is None:
+                parallel = self.parallel
+                
+            if parallel and self._get_media_size(message) >= self.parallel_min_size:
+                try:
+                    await self.parallel_engine.download(
+                        client, message, file_path, progress=download_progress
+                    )
+                except ParallelDownloadUnsupported:
+                    await self.flood.call(
+                        client.name, 'download_media', client.download_media,
+                        message,
+                        file_name=file_path,
+                        progress=download_progress
+                    )
+            else:
+                await self.flood.call(
+                    client.name, 'download_media', client.download_media,
+                    message,
+                    file_name=file_path,
+                    progress=download_progress
+                )
             
             file_size = os.path.getsize(file_path)
             
@@ -258,11 +385,16 @@ class TelegramDownloader:
             # حذف فایل ناقص
             if os.path.exists(file_path):
                 os.remove(file_path)
+                
+            if isinstance(e, FloodWait):
+                return self._flood_wait_result(e)
             
             return {
                 'success': False,
                 'error': f'خطا در دانلود: {str(e)}'
             }
+        finally:
+            self.bandwidth.close(shaper)
     
     def _parse_telegram_link(self, url: str) -> tuple:
         """تجزیه و تحلیل لینک تلگرام"""
@@ -299,6 +431,20 @@ class TelegramDownloader:
         
         return None, None
     
+    def _get_media(self, message: Message):
+        """شیء مدیای پیام (document، video، ...)"""
+        
+        for attr in ('document', 'video', 'audio', 'animation', 'voice', 'video_note', 'photo', 'sticker'):
+            media = getattr(message, attr, None)
+            if media:
+                return media
+        return None
+        
+    def _get_media_size(self, message: Message) -> int:
+        """حجم مدیای پیام (در صورت مشخص بودن)"""
+        
+        return getattr(self._get_media(message), 'file_size', 0) or 0
+        
     def _get_media_filename(self, message: Message) -> str:
         """تعیین نام فایل برای مدیا"""
         
@@ -326,7 +472,9 @@ class TelegramDownloader:
         
         try:
             # دریافت پیام فوروارد شده
-            message = await client.get_messages(from_chat_id, message_id)
+            message = await self.flood.call(
+                client.name, 'get_messages', client.get_messages, from_chat_id, message_id
+            )
             
             if not message:
                 return {
@@ -348,6 +496,8 @@ class TelegramDownloader:
                     'error': 'پیام فوروارد شده مدیا ندارد'
                 }
             
+        except FloodWait as e:
+            return self._flood_wait_result(e)
         except Exception as e:
             return {
                 'success': False,
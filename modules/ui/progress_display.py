@@ -61,12 +61,14 @@ class ProgressDisplay:
     def create_progress_message(progress_data: Dict[str, Any]) -> str:
         """ایجاد پیام پیشرفت"""
         
-        bar = ProgressDisplay.create_progress_bar(progress_data.get('progress', 0))
-        percentage = progress_data.get('progress', 0)
-        downloaded = ProgressDisplay.format_size(progress_data.get('downloaded', 0))
+        # دانلودرها percentage و آپلودرها uploaded می‌فرستند
+        percentage = progress_data.get('progress', progress_data.get('percentage', 0))
+        done = progress_data.get('downloaded', progress_data.get('uploaded', 0))
+        bar = ProgressDisplay.create_progress_bar(percentage)
+        downloaded = ProgressDisplay.format_size(done)
         total = ProgressDisplay.format_size(progress_data.get('total', 0))
         speed = ProgressDisplay.format_speed(progress_data.get('speed', 0))
-        eta = ProgressDisplay.format_time(progress_data.get('eta', 0))
+        eta = ProgressDisplay.format_time(progress_data['eta']) if progress_data.get('eta') else "نامشخص"
         filename = progress_data.get('filename', 'در حال پردازش')
         
         message = f"""
@@ -79,7 +81,7 @@ class ProgressDisplay:
 ⚡ **سرعت:** {speed}
 ⏱️ **زمان باقی‌مانده:** {eta}
 
-🔄 **پیشرفت دقیق:** {progress_data.get('downloaded', 0):,} از {progress_data.get('total', 0):,} بایت
+🔄 **پیشرفت دقیق:** {done:,} از {progress_data.get('total', 0):,} بایت
         """
         
         return message
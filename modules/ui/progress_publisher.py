@@ -0,0 +1,110 @@
+# modules/ui/progress_publisher.py
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Callable, Optional, Tuple
+from pyrogram.types import Message
+from pyrogram.errors import FloodWait, MessageNotModified
+
+logger = logging.getLogger(__name__)
+
+class _MessageState:
+    """وضعیت به‌روزرسانی یک پیام پیشرفت"""
+    
+    __slots__ = ('message', 'latest', 'last_text', 'last_edit', 'task', 'touched')
+    
+    def __init__(self, message: Message):
+        self.message = message
+        self.latest: Optional[Dict[str, Any]] = None  # آخرین داده (داده‌های قبلی جایگزین می‌شوند)
+        self.last_text: Optional[str] = None
+        self.last_edit = 0.0
+        self.task: Optional[asyncio.Task] = None
+        self.touched = time.monotonic()
+
+class ProgressPublisher:
+    """ادغام به‌روزرسانی‌های پیشرفت هر پیام و ویرایش آن حداکثر یک بار در هر بازه (با عقب‌نشینی در FloodWait)"""
+    
+    def __init__(self, render: Callable[[Dict[str, Any]], str], interval: float = 3.0,
+                 max_interval: float = 30.0, idle_ttl: float = 600):
+        self.render = render  # داده پیشرفت -> متن پیام
+        self.interval = interval  # حداقل فاصله دو ویرایش یک پیام (ثانیه)
+        self.max_interval = max_interval
+        self.idle_ttl = idle_ttl  # حذف وضعیت پیام‌هایی که مدتی به‌روز نشده‌اند
+        
+        self.current_interval = interval  # پس از FloodWait بزرگ و با ویرایش‌های موفق کوچک می‌شود
+        self.blocked_until = 0.0  # FloodWait برای کل حساب ربات اعمال می‌شود
+        
+        self.states: Dict[Tuple[int, int], _MessageState] = {}
+        self.stats = {'updates': 0, 'edits': 0, 'skipped_unchanged': 0, 'flood_waits': 0, 'errors': 0}
+        
+    async def update(self, message: Message, progress_data: Dict[str, Any]):
+        """ثبت آخرین پیشرفت؛ بلافاصله برمی‌گردد و ویرایش در پس‌زمینه انجام می‌شود"""
+        
+        key = (message.chat.id, message.id)
+        state = self.states.get(key)
+        if state is None:
+            self._prune()
+            state = self.states[key] = _MessageState(message)
+            
+        state.latest = progress_data
+        state.touched = time.monotonic()
+        self.stats['updates'] += 1
+        
+        if state.task is None or state.task.done():
+            state.task = asyncio.create_task(self._flush(state))
+            
+    async def finish(self, message: Message):
+        """پایان پیشرفت یک پیام؛ پس از بازگشت هیچ ویرایش معوقی روی پیام انجام نمی‌شود"""
+        
+        state = self.states.pop((message.chat.id, message.id), None)
+        if state and state.task and not state.task.done():
+            state.task.cancel()
+            await asyncio.gather(state.task, return_exceptions=True)
+            
+    async def _flush(self, state: _MessageState):
+        """انتظار تا نوبت مجاز و ارسال آخرین متن"""
+        
+        while state.latest is not None:
+            now = time.monotonic()
+            ready_at = max(state.last_edit + self.current_interval, self.blocked_until)
+            if ready_at > now:
+                await asyncio.sleep(ready_at - now)
+                
+            data, state.latest = state.latest, None
+            text = self.render(data)
+            
+            if text == state.last_text:
+                self.stats['skipped_unchanged'] += 1
+                continue
+                
+            try:
+                await state.message.edit_text(text)
+                state.last_text = text
+                state.last_edit = time.monotonic()
+                self.stats['edits'] += 1
+                self.current_interval = max(self.interval, self.current_interval * 0.9)
+                
+            except MessageNotModified:
+                state.last_text = text
+                self.stats['skipped_unchanged'] += 1
+                
+            except FloodWait as e:
+                self.stats['flood_waits'] += 1
+                self.blocked_until = time.monotonic() + e.value
+                self.current_interval = min(self.max_interval, self.current_interval * 2)
+                state.latest = state.latest or data  # پس از پایان انتظار دوباره تلاش می‌شود
+                
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"خطا در آپدیت پیشرفت: {e}")
+                
+    def _prune(self):
+        """حذف وضعیت پیام‌های رها شده (بدون finish)"""
+        
+        cutoff = time.monotonic() - self.idle_ttl
+        stale = [
+            key for key, state in self.states.items()
+            if state.touched < cutoff and (state.task is None or state.task.done())
+        ]
+        for key in stale:
+            del self.states[key]
@@ -4,23 +4,35 @@ import os
 import time
 from typing import Dict, Any, Optional, Callable
 from pathlib import Path
+from collections import deque
+import mimetypes
 import aiofiles
-from pyrogram import Client
+from pyrogram import Client, raw, types
 from pyrogram.types import Message, InputMediaDocument, InputMediaVideo, InputMediaPhoto, InputMediaAudio
 from pyrogram.errors import FloodWait, FilePartMissing
 import math
+from modules.core.bandwidth import upload_bandwidth as default_upload_bandwidth
+from modules.utils.throughput import ThroughputMeter
+from modules.core.flood_control import flood_control as default_flood_control
+from modules.core.executor import to_thread_shielded
 
 class SmartUploader:
     """سیستم آپلود هوشمند با قابلیت Resume و نمایش پیشرفت"""
     
-    def __init__(self):
-        self.chunk_size = 512 * 1024  # 512KB
+    def __init__(self, resume_store=None, bandwidth=None, file_ids=None, flood=None):
+        self.resume_store = resume_store  # ژورنال پایدار Resume (اختیاری)
+        self.file_ids = file_ids  # نگاشت محتوا -> file_id برای ارسال مجدد بدون آپلود (اختیاری)
+        self.flood = flood or default_flood_control  # انتظار و ریتری FloodWait هر اکانت/متد
+        self.bandwidth = bandwidth or default_upload_bandwidth  # سهم پهنای باند هر آپلود
+        self.chunk_size = 512 * 1024  # 512KB (حداکثر مجاز برای SaveBigFilePart)
         self.max_retries = 3
+        self.upload_workers = 8  # تعداد قطعه‌های همزمان در حال ارسال
         self.active_uploads = {}
         
     async def upload_file(self, client: Client, file_path: str, 
-                         chat_id: int, progress_callback: Optional[Callable] = None) -> Dict[str, Any]:
-        """آپلود فایل با نمایش پیشرفت"""
+                         chat_id: int, progress_callback: Optional[Callable] = None,
+                         source_key: Optional[str] = None) -> Dict[str, Any]:
+        """آپلود فایل با نمایش پیشرفت (source_key: شناسه محتوای مبدا مثل file_unique_id، برای پرهیز از هش فایل)"""
         
         task_id = os.path.basename(file_path)
         self.active_uploads[task_id] = {
@@ -37,6 +49,22 @@ class SmartUploader:
             # تعیین نوع مدیا
             media_type = self._detect_media_type(file_path)
             
+            # محتوایی که قبلاً با همین اکانت آپلود شده فقط با ارجاع به file_id ارسال می‌شود
+            content_key = None
+            if self.file_ids:
+                content_key = await self.file_ids.content_key(file_path, source_key)
+                result = await self._send_known_file(client, chat_id, file_name, media_type, content_key)
+                if result:
+                    return {
+                        'success': True,
+                        'message_id': result.id,
+                        'file_id': self._extract_file_id(result),
+                        'file_path': file_path,
+                        'file_size': file_size,
+                        'upload_time': time.time() - self.active_uploads[task_id]['start_time'],
+                        'reused': True
+                    }
+            
             # نمایش شروع آپلود
             if progress_callback:
                 await progress_callback({
@@ -49,41 +77,46 @@ class SmartUploader:
                 })
             
             # آپلود با توجه به نوع فایل
-            if file_size < 10 * 1024 * 1024:  # کمتر از 10MB
-                result = await self._upload_small_file(
-                    client, file_path, chat_id, file_name, 
-                    media_type, progress_callback, task_id, file_size
-                )
-            else:
-                result = await self._upload_large_file(
-                    client, file_path, chat_id, file_name,
-                    media_type, progress_callback, task_id, file_size
-                )
+            async with self.bandwidth.transfer(client.name) as shaper:
+                if file_size < 10 * 1024 * 1024:  # کمتر از 10MB
+                    # FloodWait وسط آپلود: کل فایل کوچک پس از انتظار دوباره ارسال می‌شود
+                    result = await self.flood.call(
+                        client.name, f"send_{media_type}", self._upload_small_file,
+                        client, file_path, chat_id, file_name,
+                        media_type, progress_callback, task_id, file_size, shaper
+                    )
+                else:
+                    result = await self._upload_large_file(
+                        client, file_path, chat_id, file_name,
+                        media_type, progress_callback, task_id, file_size, shaper
+                    )
             
             # ثبت لاگ موفقیت
             self._log_upload_success(task_id, file_size, result)
             
+            file_id = self._extract_file_id(result)
+            if content_key and file_id:
+                await self.file_ids.remember(
+                    content_key, self.file_ids.account_key(client), file_id, media_type, file_size
+                )
+                
             return {
                 'success': True,
                 'message_id': result.id if hasattr(result, 'id') else None,
-                'file_id': result.document.file_id if hasattr(result, 'document') else None,
+                'file_id': file_id,
                 'file_path': file_path,
                 'file_size': file_size,
                 'upload_time': time.time() - self.active_uploads[task_id]['start_time']
             }
             
         except FloodWait as e:
-            # مدیریت FloodWait
-            wait_time = e.value
-            if progress_callback:
-                await progress_callback({
-                    'task_id': task_id,
-                    'status': 'flood_wait',
-                    'wait_time': wait_time
-                })
-            
-            await asyncio.sleep(wait_time)
-            return await self.upload_file(client, file_path, chat_id, progress_callback)
+            # FloodWait طولانی‌تر از سقف انتظار flood_control یا پس از پایان ریتری‌ها
+            return {
+                'success': False,
+                'error': f'محدودیت تلگرام، لطفاً {e.value} ثانیه صبر کنید',
+                'flood_wait': e.value,
+                'task_id': task_id
+            }
             
         except Exception as e:
             # مدیریت خطا
@@ -97,19 +130,63 @@ class SmartUploader:
             # پاکسازی
             if task_id in self.active_uploads:
                 del self.active_uploads[task_id]
+                
+    async def _send_known_file(self, client: Client, chat_id: int, file_name: str,
+                               media_type: str, content_key: str) -> Optional[Message]:
+        """ارسال با file_id ثبت شده؛ None اگر ثبت نشده یا دیگر معتبر نباشد"""
+        
+        account_key = self.file_ids.account_key(client)
+        known = await self.file_ids.get(content_key, account_key)
+        if not known:
+            return None
+            
+        icon = {'photo': '📸', 'video': '🎥', 'audio': '🎵'}.get(media_type, '📄')
+        try:
+            return await self.flood.call(
+                client.name, 'send_cached_media', client.send_cached_media,
+                chat_id=chat_id,
+                file_id=known['file_id'],
+                caption=f"{icon} {file_name}"
+            )
+        except FloodWait:
+            raise
+        except Exception:
+            # file_id منقضی یا نامعتبر است؛ آپلود عادی انجام و file_id جدید ثبت می‌شود
+            await self.file_ids.forget(content_key, account_key)
+            return None
+            
+    @staticmethod
+    def _extract_file_id(message: Any) -> Optional[str]:
+        """file_id مدیای پیام ارسال شده"""
+        for attr in ('document', 'video', 'audio', 'photo', 'animation'):
+            media = getattr(message, attr, None)
+            if media:
+                return media.file_id
+        return None
     
     async def _upload_small_file(self, client: Client, file_path: str, 
                                 chat_id: int, file_name: str, media_type: str,
                                 progress_callback: Callable, task_id: str, 
-                                file_size: int):
+                                file_size: int, shaper=None):
         """آپلود فایل‌های کوچک"""
         
-        # تابع callback برای پیشرفت
+        sent = 0
+        meter = shaper.meter if shaper else ThroughputMeter()
+        
+        # تابع callback برای پیشرفت (Pyrogram پس از هر قطعه منتظر آن می‌ماند؛ محدودیت سرعت همین‌جا اعمال می‌شود)
         async def progress(current, total):
+            nonlocal sent
+            if current > sent:
+                delta = current - sent
+                sent = current
+                if shaper:
+                    await shaper.consume(delta)
+                else:
+                    meter.add(delta)
+                
             if progress_callback:
                 progress_percent = (current / total) * 100
-                elapsed = time.time() - self.active_uploads[task_id]['start_time']
-                speed = current / elapsed if elapsed > 0 else 0
+                speed = meter.speed
                 
                 self.active_uploads[task_id].update({
                     'uploaded': current,
@@ -122,7 +199,7 @@ class SmartUploader:
                     'uploaded': current,
                     'total': total,
                     'speed': speed,
-                    'eta': (total - current) / speed if speed > 0 else 0,
+                    'eta': meter.eta(total, current),
                     'filename': file_name,
                     'status': 'uploading'
                 })
@@ -162,92 +239,215 @@ class SmartUploader:
     async def _upload_large_file(self, client: Client, file_path: str,
                                 chat_id: int, file_name: str, media_type: str,
                                 progress_callback: Callable, task_id: str,
-                                file_size: int):
-        """آپلود فایل‌های بزرگ با قابلیت Resume"""
+                                file_size: int, shaper=None):
+        """آپلود فایل‌های بزرگ به صورت قطعه‌های موازی SaveBigFilePart با قابلیت Resume"""
+        
+        total_parts = math.ceil(file_size / self.chunk_size)
         
         # بررسی فایل آپلود شده قبلی
-        resume_info = await self._check_resume_info(file_path, chat_id)
+        resume_info = await self._check_resume_info(client, file_path, chat_id)
         
-        if resume_info and resume_info.get('uploaded', 0) > 0:
-            # ادامه آپلود قبلی
+        if (resume_info and resume_info.get('upload_id')
+                and resume_info.get('total_parts') == total_parts):
+            # ادامه آپلود قبلی (قطعه‌ها تا مدتی روی سرور تلگرام باقی می‌مانند)
+            upload_id = resume_info['upload_id']
+            done_parts = set(resume_info.get('parts', []))
+        else:
+            upload_id = self._random_id()
+            done_parts = set()
+            await self._start_resume_info(client, file_path, chat_id, upload_id, file_size)
+            
+        state = {
+            'pending': deque(p for p in range(total_parts) if p not in done_parts),
+            'done': done_parts,
+            'uploaded': sum(self._part_length(p, file_size) for p in done_parts),
+            'shaper': shaper,
+            'meter': shaper.meter if shaper else ThroughputMeter()
+        }
+        
+        if done_parts and progress_callback:
             await progress_callback({
                 'task_id': task_id,
                 'status': 'resuming',
-                'resumed_from': resume_info['uploaded']
+                'resumed_from': state['uploaded']
             })
+        
+        fd = os.open(file_path, os.O_RDONLY)
+        
+        # پنجره محدود از قطعه‌های در حال ارسال
+        workers = [
+            asyncio.create_task(self._upload_part_worker(
+                client, fd, file_path, chat_id, file_name, upload_id,
+                total_parts, file_size, state, progress_callback, task_id
+            ))
+            for _ in range(min(self.upload_workers, len(state['pending'])))
+        ]
+        
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            # با خطای یک worker بقیه متوقف می‌شوند؛ pread روی fd بسته یا fd فایل دیگر انجام نمی‌شود
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            os.close(fd)
             
-            offset = resume_info['uploaded']
-        else:
-            offset = 0
+        # ارسال سند با ارجاع به فایل آپلود شده
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = await self._send_big_file(
+                    client, chat_id, upload_id, total_parts, file_name
+                )
+                break
+            except FilePartMissing as e:
+                # قطعه‌ای که قبلاً ارسال شده روی سرور منقضی شده است؛ دوباره ارسال می‌شود
+                if attempt == self.max_retries:
+                    raise
+                part = e.value
+                chunk = await asyncio.to_thread(
+                    self._read_part, file_path, part
+                )
+                await self._save_big_file_part(
+                    client, upload_id, part, total_parts, chunk, task_id
+                )
         
-        # آپلود به صورت قطعه‌ای
-        async with aiofiles.open(file_path, 'rb') as file:
-            if offset > 0:
-                await file.seek(offset)
+        # پاکسازی اطلاعات Resume
+        await self._clear_resume_info(client, file_path, chat_id)
+        
+        return result
+        
+    async def _upload_part_worker(self, client: Client, fd: int, file_path: str,
+                                 chat_id: int, file_name: str, upload_id: int,
+                                 total_parts: int, file_size: int, state: Dict,
+                                 progress_callback: Callable, task_id: str):
+        """برداشتن قطعه از صف مشترک و ارسال آن تا خالی شدن صف"""
+        
+        while state['pending']:
+            part = state['pending'].popleft()
             
-            part_number = offset // self.chunk_size
+            # خواندن موقعیتی؛ workerها اشاره‌گر فایل مشترکی ندارند
+            chunk = await to_thread_shielded(
+                os.pread, fd, self.chunk_size, part * self.chunk_size
+            )
             
-            while offset < file_size:
-                # خواندن قطعه
-                chunk = await file.read(self.chunk_size)
-                chunk_size = len(chunk)
+            if state['shaper']:
+                await state['shaper'].consume(len(chunk))
+            else:
+                state['meter'].add(len(chunk))
+            
+            await self._save_big_file_part(
+                client, upload_id, part, total_parts, chunk, task_id
+            )
+            
+            state['done'].add(part)
+            state['uploaded'] += len(chunk)
+            uploaded = state['uploaded']
+            
+            speed = state['meter'].speed
+            
+            self.active_uploads[task_id].update({
+                'uploaded': uploaded,
+                'speed': speed
+            })
+            
+            # به‌روزرسانی پیشرفت
+            if progress_callback:
+                await progress_callback({
+                    'task_id': task_id,
+                    'progress': (uploaded / file_size) * 100,
+                    'uploaded': uploaded,
+                    'total': file_size,
+                    'speed': speed,
+                    'eta': state['meter'].eta(file_size, uploaded),
+                    'filename': file_name,
+                    'status': 'uploading',
+                    'part': part
+                })
                 
-                if not chunk:
-                    break
+            # ذخیره اطلاعات برای Resume
+            await self._save_resume_info(client, file_path, chat_id, part, chunk)
+            
+    async def _save_big_file_part(self, client: Client, upload_id: int, part: int,
+                                 total_parts: int, chunk: bytes, task_id: str):
+        """ارسال یک قطعه با ریتری"""
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                saved = await self.flood.invoke(
+                    client,
+                    raw.functions.upload.SaveBigFilePart(
+                        file_id=upload_id,
+                        file_part=part,
+                        file_total_parts=total_parts,
+                        bytes=chunk
+                    )
+                )
                 
-                # آپلود قطعه
-                try:
-                    # اینجا نیاز به استفاده از روش آپلود قطعه‌ای تلگرام داریم
-                    # برای سادگی فعلاً از send_document استفاده می‌کنیم
-                    if offset == 0:  # اولین قطعه
-                        result = await client.send_document(
-                            chat_id=chat_id,
-                            document=file_path,
-                            caption=f"📦 {file_name} (بزرگ)",
-                            file_name=file_name,
-                            force_document=True
-                        )
-                        file_id = result.document.file_id
-                    
-                    # به‌روزرسانی پیشرفت
-                    offset += chunk_size
-                    progress_percent = (offset / file_size) * 100
-                    
-                    if progress_callback:
-                        elapsed = time.time() - self.active_uploads[task_id]['start_time']
-                        speed = offset / elapsed if elapsed > 0 else 0
-                        
-                        await progress_callback({
-                            'task_id': task_id,
-                            'progress': progress_percent,
-                            'uploaded': offset,
-                            'total': file_size,
-                            'speed': speed,
-                            'eta': (file_size - offset) / speed if speed > 0 else 0,
-                            'filename': file_name,
-                            'status': 'uploading',
-                            'part': part_number
-                        })
-                    
-                    # ذخیره اطلاعات برای Resume
-                    await self._save_resume_info(file_path, chat_id, offset)
+                if saved:
+                    return
                     
-                    part_number += 1
-                    
-                except Exception as e:
-                    # مدیریت خطا و ریتری
-                    if self.active_uploads[task_id]['retries'] < self.max_retries:
-                        self.active_uploads[task_id]['retries'] += 1
-                        await asyncio.sleep(2)  # تاخیر قبل از ریتری
-                        continue
-                    else:
-                        raise e
+                raise IOError(f"قطعه {part} توسط سرور ذخیره نشد")
+                
+            except FloodWait:
+                # انتظار و ریتری FloodWait در flood_control انجام شده است
+                raise
+                
+            except Exception:
+                # مدیریت خطا و ریتری
+                if attempt == self.max_retries:
+                    raise
+                self.active_uploads[task_id]['retries'] += 1
+                await asyncio.sleep(2)  # تاخیر قبل از ریتری
+                
+    async def _send_big_file(self, client: Client, chat_id: int, upload_id: int,
+                            total_parts: int, file_name: str) -> Message:
+        """ارسال سند با InputFileBig و بازگرداندن پیام ارسال شده"""
         
-        # پاکسازی اطلاعات Resume
-        await self._clear_resume_info(file_path, chat_id)
+        media = raw.types.InputMediaUploadedDocument(
+            mime_type=mimetypes.guess_type(file_name)[0] or 'application/octet-stream',
+            file=raw.types.InputFileBig(
+                id=upload_id,
+                parts=total_parts,
+                name=file_name
+            ),
+            attributes=[raw.types.DocumentAttributeFilename(file_name=file_name)],
+            force_file=True
+        )
         
-        # بازگشت نتیجه
-        return {'id': 'uploaded', 'document': {'file_id': 'large_file_id'}}  # جایگزین با نتیجه واقعی
+        r = await self.flood.invoke(
+            client,
+            raw.functions.messages.SendMedia(
+                peer=await client.resolve_peer(chat_id),
+                media=media,
+                message=f"📦 {file_name} (بزرگ)",
+                random_id=self._random_id()
+            )
+        )
+        
+        users = {u.id: u for u in r.users}
+        chats = {c.id: c for c in r.chats}
+        
+        for update in r.updates:
+            if isinstance(update, (raw.types.UpdateNewMessage,
+                                   raw.types.UpdateNewChannelMessage)):
+                return await types.Message._parse(client, update.message, users, chats)
+                
+        raise IOError("پیام ارسال شده در پاسخ تلگرام یافت نشد")
+        
+    def _read_part(self, file_path: str, part: int) -> bytes:
+        """خواندن یک قطعه از فایل"""
+        with open(file_path, 'rb') as f:
+            f.seek(part * self.chunk_size)
+            return f.read(self.chunk_size)
+            
+    def _part_length(self, part: int, file_size: int) -> int:
+        """حجم یک قطعه (قطعه آخر ممکن است کوچک‌تر باشد)"""
+        return min(self.chunk_size, file_size - part * self.chunk_size)
+        
+    @staticmethod
+    def _random_id() -> int:
+        """شناسه تصادفی 64 بیتی برای file_id و random_id"""
+        return int.from_bytes(os.urandom(8), 'big', signed=True)
     
     def _detect_media_type(self, file_path: str) -> str:
         """تشخیص نوع فایل"""
@@ -266,18 +466,60 @@ class SmartUploader:
         else:
             return 'document'
     
-    async def _check_resume_info(self, file_path: str, chat_id: int) -> Optional[Dict]:
+    def _resume_key(self, client: Client, file_path: str, chat_id: int) -> str:
+        """کلید Resume؛ قطعه‌های آپلود به session حساب و نسخه فایل وابسته‌اند"""
+        stat = os.stat(file_path)
+        return self.resume_store.make_key(
+            'upload', client.name, chat_id, os.path.abspath(file_path),
+            stat.st_size, stat.st_mtime_ns, self.chunk_size
+        )
+        
+    async def _check_resume_info(self, client: Client, file_path: str,
+                                 chat_id: int) -> Optional[Dict]:
         """بررسی اطلاعات Resume"""
-        # پیاده‌سازی ساده - در نسخه کامل در دیتابیس ذخیره می‌شود
-        return None
+        if not self.resume_store:
+            return None
+            
+        state = await self.resume_store.get(self._resume_key(client, file_path, chat_id))
+        if not state or not state.get('upload_id'):
+            return None
+            
+        return {
+            'upload_id': state['upload_id'],
+            'total_parts': math.ceil(state['total_size'] / self.chunk_size),
+            'parts': [p['offset'] // self.chunk_size for p in state['parts']],
+            'uploaded': sum(p['length'] for p in state['parts'])
+        }
     
-    async def _save_resume_info(self, file_path: str, chat_id: int, uploaded: int):
+    async def _start_resume_info(self, client: Client, file_path: str, chat_id: int,
+                                 upload_id: int, file_size: int):
+        """ثبت شروع آپلود جدید در ژورنال"""
+        if not self.resume_store:
+            return
+            
+        await self.resume_store.begin(
+            self._resume_key(client, file_path, chat_id), 'upload',
+            os.path.abspath(file_path), str(chat_id), file_size,
+            part_size=self.chunk_size, upload_id=upload_id
+        )
+        
+    async def _save_resume_info(self, client: Client, file_path: str, chat_id: int,
+                                part: int, chunk: bytes):
         """ذخیره اطلاعات برای Resume"""
-        pass
+        if not self.resume_store:
+            return
+            
+        await self.resume_store.commit_part(
+            self._resume_key(client, file_path, chat_id),
+            part * self.chunk_size, len(chunk), await self.resume_store.checksum_async(chunk)
+        )
     
-    async def _clear_resume_info(self, file_path: str, chat_id: int):
+    async def _clear_resume_info(self, client: Client, file_path: str, chat_id: int):
         """پاکسازی اطلاعات Resume"""
-        pass
+        if not self.resume_store:
+            return
+            
+        await self.resume_store.clear(self._resume_key(client, file_path, chat_id))
     
     def _log_upload_success(self, task_id: str, file_size: int, result: Any):
         """ثبت لاگ موفقیت آمیز بودن آپلود"""
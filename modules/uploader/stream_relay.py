@@ -0,0 +1,218 @@
+# modules/uploader/stream_relay.py
+import asyncio
+import math
+import time
+from typing import Dict, Any, Optional, Callable
+from pyrogram import Client
+from pyrogram.types import Message
+from modules.core.bandwidth import download_bandwidth as default_download_bandwidth
+from modules.core.media_cache import media_cache as default_media_cache
+
+class StreamRelay:
+    """انتقال مستقیم دانلود به آپلود از طریق بافر محدود در حافظه (بدون نوشتن روی دیسک)"""
+    
+    def __init__(self, uploader, buffer_parts: int = 16, upload_workers: int = 4,
+                 download_bandwidth=None, cache=None):
+        self.uploader = uploader  # SmartUploader برای ارسال قطعه‌ها و سند نهایی (و سهم آپلود)
+        self.cache = cache or default_media_cache  # مدیای کش شده از مسیر عادی (کپی محلی) ارسال می‌شود
+        self.buffer_parts = buffer_parts  # حداکثر قطعه‌های منتظر در حافظه
+        self.upload_workers = upload_workers
+        self.download_bandwidth = download_bandwidth or default_download_bandwidth
+        
+        # فقط فایل‌های بزرگ (SaveBigFilePart) از این مسیر عبور می‌کنند
+        self.min_size = 10 * 1024 * 1024
+        
+    def supports(self, message: Message) -> bool:
+        """آیا مدیای پیام قابل انتقال مستقیم است"""
+        return self._get_media_size(message) >= self.min_size
+        
+    async def relay_message(self, client: Client, message: Message, chat_id: int,
+                           file_name: str,
+                           progress_callback: Optional[Callable] = None) -> Dict[str, Any]:
+        """دانلود مدیای پیام و آپلود همزمان آن به chat_id
+        
+        محتوای دارای file_id ثبت شده بدون انتقال ارسال می‌شود؛ مدیای موجود در کش با unsupported
+        به مسیر عادی برمی‌گردد.
+        """
+        
+        file_size = self._get_media_size(message)
+        source_key = self._get_unique_id(message)
+        
+        content_key = None
+        if self.uploader.file_ids and source_key:
+            content_key = await self.uploader.file_ids.content_key(None, source_key)
+            known = await self.uploader._send_known_file(
+                client, chat_id, file_name, 'document', content_key
+            )
+            if known:
+                return {
+                    'success': True,
+                    'message_id': known.id,
+                    'file_id': self.uploader._extract_file_id(known),
+                    'file_name': file_name,
+                    'file_size': file_size,
+                    'upload_time': 0,
+                    'reused': True
+                }
+                
+        if source_key and await self.cache.contains(self.cache.telegram_key(source_key)):
+            return {'success': False, 'error': 'مدیا در کش موجود است', 'unsupported': True}
+            
+        part_size = self.uploader.chunk_size
+        total_parts = math.ceil(file_size / part_size)
+        upload_id = self.uploader._random_id()
+        task_id = f"relay_{upload_id & 0xffffffff:x}"
+        
+        self.uploader.active_uploads[task_id] = {
+            'start_time': time.time(),
+            'uploaded': 0,
+            'speed': 0,
+            'retries': 0
+        }
+        
+        # صف محدود؛ وقتی پر شود دانلود منتظر آپلود می‌ماند
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.buffer_parts)
+        state = {'downloaded': 0, 'uploaded': 0}
+        
+        # هر دو سمت انتقال از سهم پهنای باند اکانت مصرف می‌کنند
+        download_shaper = self.download_bandwidth.open(client.name)
+        upload_shaper = self.uploader.bandwidth.open(client.name)
+        state['download_shaper'] = download_shaper
+        state['upload_shaper'] = upload_shaper
+        
+        tasks = [asyncio.create_task(
+            self._produce(client, message, queue, part_size, total_parts, state)
+        )]
+        tasks.extend(
+            asyncio.create_task(self._consume(
+                client, queue, upload_id, total_parts, file_size, file_name,
+                state, progress_callback, task_id
+            ))
+            for _ in range(self.upload_workers)
+        )
+        
+        try:
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                # با خطا یا لغو، بقیه طرف‌ها متوقف و تا پایان واقعی‌شان منتظر می‌مانیم
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                
+            result = await self.uploader._send_big_file(
+                client, chat_id, upload_id, total_parts, file_name
+            )
+            
+            file_id = self.uploader._extract_file_id(result)
+            if content_key and file_id:
+                await self.uploader.file_ids.remember(
+                    content_key, self.uploader.file_ids.account_key(client),
+                    file_id, 'document', file_size
+                )
+                
+            return {
+                'success': True,
+                'message_id': result.id,
+                'file_id': file_id,
+                'file_name': file_name,
+                'file_size': file_size,
+                'upload_time': time.time() - self.uploader.active_uploads[task_id]['start_time']
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'task_id': task_id
+            }
+        finally:
+            self.download_bandwidth.close(download_shaper)
+            self.uploader.bandwidth.close(upload_shaper)
+            self.uploader.active_uploads.pop(task_id, None)
+            
+    async def _produce(self, client: Client, message: Message, queue: asyncio.Queue,
+                      part_size: int, total_parts: int, state: Dict):
+        """دریافت جریان مدیا و تبدیل آن به قطعه‌های هم‌اندازه آپلود"""
+        
+        part = 0
+        pending = bytearray()
+        
+        async for chunk in client.stream_media(message):
+            await state['download_shaper'].consume(len(chunk))
+            pending.extend(chunk)
+            state['downloaded'] += len(chunk)
+            
+            while len(pending) >= part_size:
+                await queue.put((part, bytes(pending[:part_size])))
+                del pending[:part_size]
+                part += 1
+                
+        if pending:
+            await queue.put((part, bytes(pending)))
+            part += 1
+            
+        if part != total_parts:
+            raise IOError(f"تعداد قطعه‌های دریافتی ({part}) با حجم فایل ({total_parts}) برابر نیست")
+            
+        # پایان کار هر آپلودکننده
+        for _ in range(self.upload_workers):
+            await queue.put(None)
+            
+    async def _consume(self, client: Client, queue: asyncio.Queue, upload_id: int,
+                      total_parts: int, file_size: int, file_name: str, state: Dict,
+                      progress_callback: Optional[Callable], task_id: str):
+        """ارسال قطعه‌ها به محض رسیدن از صف"""
+        
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+                
+            part, chunk = item
+            await state['upload_shaper'].consume(len(chunk))
+            await self.uploader._save_big_file_part(
+                client, upload_id, part, total_parts, chunk, task_id
+            )
+            
+            state['uploaded'] += len(chunk)
+            uploaded = state['uploaded']
+            
+            speed = state['upload_shaper'].meter.speed
+            
+            self.uploader.active_uploads[task_id].update({
+                'uploaded': uploaded,
+                'speed': speed
+            })
+            
+            if progress_callback:
+                await progress_callback({
+                    'task_id': task_id,
+                    'progress': (uploaded / file_size) * 100,
+                    'downloaded': state['downloaded'],
+                    'uploaded': uploaded,
+                    'total': file_size,
+                    'speed': speed,
+                    'eta': state['upload_shaper'].meter.eta(file_size, uploaded),
+                    'filename': file_name,
+                    'status': 'relaying',
+                    'part': part
+                })
+                
+    def _get_unique_id(self, message: Message) -> Optional[str]:
+        """file_unique_id مدیای پیام (کلید کش و file_id)"""
+        
+        for attr in ('document', 'video', 'audio', 'animation', 'voice', 'video_note'):
+            media = getattr(message, attr, None)
+            if media:
+                return getattr(media, 'file_unique_id', None)
+        return None
+        
+    def _get_media_size(self, message: Message) -> int:
+        """حجم مدیای پیام"""
+        
+        for attr in ('document', 'video', 'audio', 'animation', 'voice', 'video_note'):
+            media = getattr(message, attr, None)
+            if media:
+                return getattr(media, 'file_size', 0) or 0
+        return 0
@@ -0,0 +1,231 @@
+# modules/utils/activity_log.py
+import bisect
+import json
+import logging
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Iterator
+
+def read_lines_reverse(path, block_size: int = 64 * 1024) -> Iterator[bytes]:
+    """خواندن خطوط فایل از انتها به ابتدا بدون بارگذاری کل فایل"""
+    
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b''
+        
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            
+            lines = (f.read(read_size) + remainder).split(b'\n')
+            remainder = lines.pop(0)  # ممکن است ادامه‌اش در بلوک قبلی باشد
+            
+            for line in reversed(lines):
+                if line:
+                    yield line
+                    
+        if remainder:
+            yield remainder
+
+class ActivityLog:
+    """لاگ فعالیت ساختاریافته (JSON lines) با ایندکس پراکنده زمان -> آفست"""
+    
+    INDEX_ENTRY = struct.Struct('<dQ')  # (timestamp, offset)
+    
+    def __init__(self, path, index_interval: int = 64 * 1024, max_bytes: int = 50 * 1024 * 1024):
+        self.path = Path(path)
+        self.index_path = self.path.with_suffix(self.path.suffix + '.idx')
+        self.index_interval = index_interval  # هر چند بایت یک ورودی ایندکس
+        self.max_bytes = max_bytes  # پس از آن فایل به .1 منتقل می‌شود
+        
+        self._lock = threading.Lock()
+        self._file = None
+        self._index_file = None
+        self._last_indexed = -index_interval
+        
+    # ========== نوشتن (از thread نویسنده لاگ) ==========
+    
+    def append(self, entry: Dict):
+        """افزودن یک رکورد؛ entry باید کلید ts (epoch) داشته باشد"""
+        
+        line = (json.dumps(entry, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+        
+        with self._lock:
+            if self._file is None:
+                self._open()
+                
+            offset = self._file.tell()
+            if offset + len(line) > self.max_bytes and offset > 0:
+                self._rotate()
+                offset = 0
+                
+            self._file.write(line)
+            
+            if offset - self._last_indexed >= self.index_interval:
+                self._index_file.write(self.INDEX_ENTRY.pack(entry['ts'], offset))
+                self._last_indexed = offset
+                
+    def flush(self):
+        with self._lock:
+            if self._file:
+                self._file.flush()
+                self._index_file.flush()
+                
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._index_file.close()
+                self._file = None
+                self._index_file = None
+                
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'ab')
+        self._index_file = open(self.index_path, 'ab')
+        
+        index_size = self._index_file.tell()
+        if index_size >= self.INDEX_ENTRY.size:
+            with open(self.index_path, 'rb') as f:
+                f.seek(index_size - index_size % self.INDEX_ENTRY.size - self.INDEX_ENTRY.size)
+                self._last_indexed = self.INDEX_ENTRY.unpack(f.read(self.INDEX_ENTRY.size))[1]
+                
+    def _rotate(self):
+        self._file.close()
+        self._index_file.close()
+        
+        for source in (self.path, self.index_path):
+            os.replace(source, f"{source}.1")
+            
+        self._last_indexed = -self.index_interval
+        self._open()
+        
+    # ========== خواندن ==========
+    
+    def tail(self, limit: int = 50, user_id: Optional[int] = None,
+             action: Optional[str] = None, since: Optional[float] = None,
+             until: Optional[float] = None) -> List[Dict]:
+        """جدیدترین رکوردها (جدید به قدیم) با فیلتر؛ فقط به اندازه لازم از انتهای فایل خوانده می‌شود"""
+        
+        self.flush()
+        results = []
+        
+        for path in self._files_newest_first():
+            for raw_line in read_lines_reverse(path):
+                entry = self._parse(raw_line)
+                if entry is None:
+                    continue
+                    
+                if since is not None and entry['ts'] < since:
+                    return results
+                if self._matches(entry, user_id, action, None, until):
+                    results.append(entry)
+                    if len(results) >= limit:
+                        return results
+                        
+        return results
+        
+    def query_range(self, since: float, until: Optional[float] = None,
+                    user_id: Optional[int] = None, action: Optional[str] = None,
+                    limit: int = 1000) -> List[Dict]:
+        """رکوردهای یک بازه زمانی (قدیم به جدید)؛ نقطه شروع با جستجوی دودویی در ایندکس"""
+        
+        self.flush()
+        results = []
+        
+        for path in reversed(self._files_newest_first()):
+            with open(path, 'rb') as f:
+                f.seek(self._start_offset(path, since))
+                
+                for raw_line in f:
+                    entry = self._parse(raw_line)
+                    if entry is None:
+                        continue
+                    if until is not None and entry['ts'] > until:
+                        return results
+                    if self._matches(entry, user_id, action, since, until):
+                        results.append(entry)
+                        if len(results) >= limit:
+                            return results
+                            
+        return results
+        
+    def _start_offset(self, path: Path, since: float) -> int:
+        """آفست آخرین نقطه ایندکس شده با ts <= since"""
+        
+        index_path = Path(str(path).replace(str(self.path), str(self.index_path), 1))
+        if not index_path.exists():
+            return 0
+            
+        with open(index_path, 'rb') as f:
+            data = f.read()
+            
+        count = len(data) // self.INDEX_ENTRY.size
+        entries = [self.INDEX_ENTRY.unpack_from(data, i * self.INDEX_ENTRY.size) for i in range(count)]
+        
+        position = bisect.bisect_right([ts for ts, _ in entries], since) - 1
+        return entries[position][1] if position >= 0 else 0
+        
+    def _files_newest_first(self) -> List[Path]:
+        rotated = Path(f"{self.path}.1")
+        return [p for p in (self.path, rotated) if p.exists()]
+        
+    @staticmethod
+    def _parse(raw_line: bytes) -> Optional[Dict]:
+        try:
+            return json.loads(raw_line)
+        except ValueError:
+            return None  # خط ناقص در حال نوشتن
+            
+    @staticmethod
+    def _matches(entry: Dict, user_id, action, since, until) -> bool:
+        if user_id is not None and entry.get('user_id') != user_id:
+            return False
+        if action is not None and entry.get('action') != action:
+            return False
+        if since is not None and entry['ts'] < since:
+            return False
+        if until is not None and entry['ts'] > until:
+            return False
+        return True
+
+class ActivityLogHandler(logging.Handler):
+    """نوشتن رکوردهای دارای action در ActivityLog (از thread نویسنده لاگ)"""
+    
+    # فیلدهای استاندارد LogRecord که جزو داده رکورد نیستند
+    _RESERVED = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'user_id', 'action'}
+    
+    def __init__(self, activity_log: ActivityLog):
+        super().__init__()
+        self.activity_log = activity_log
+        self.addFilter(lambda record: hasattr(record, 'action'))
+        
+    def emit(self, record):
+        try:
+            user_id = record.user_id
+            entry = {
+                'ts': record.created,
+                'level': record.levelname,
+                'user_id': user_id if isinstance(user_id, int) else None,
+                'action': record.action,
+                'details': record.getMessage()
+            }
+            
+            data = {k: v for k, v in vars(record).items() if k not in self._RESERVED}
+            if data:
+                entry['data'] = data
+                
+            self.activity_log.append(entry)
+        except Exception:
+            self.handleError(record)
+            
+    def flush(self):
+        self.activity_log.flush()
+        
+    def close(self):
+        self.activity_log.close()
+        super().close()
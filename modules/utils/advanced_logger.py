@@ -1,15 +1,113 @@
 # modules/utils/advanced_logger.py
 import logging
 import logging.handlers
-import json
-from datetime import datetime
+import queue
+import threading
+import atexit
+from itertools import islice
 from pathlib import Path
 import sys
+from modules.utils.activity_log import ActivityLog, ActivityLogHandler, read_lines_reverse
+
+class BatchRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler که flush را تا پایان هر دسته به تعویق می‌اندازد"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.deferred = False
+        
+    def flush(self):
+        if not self.deferred:
+            super().flush()
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler با صف محدود؛ در صورت پر بودن صف رکورد حذف و شمارش می‌شود (INFO/DEBUG بلافاصله)"""
+    
+    def __init__(self, log_queue: queue.Queue, counters: dict):
+        super().__init__(log_queue)
+        self.counters = counters
+        
+    def enqueue(self, record):
+        try:
+            if record.levelno >= logging.WARNING:
+                # هشدارها، خطاها و رویدادهای امنیتی کوتاه منتظر جا می‌مانند
+                self.queue.put(record, timeout=0.5)
+            else:
+                self.queue.put_nowait(record)
+            self.counters['enqueued'] += 1
+        except queue.Full:
+            self.counters['dropped'] += 1
+            by_level = self.counters['dropped_by_level']
+            by_level[record.levelname] = by_level.get(record.levelname, 0) + 1
+
+class BatchingQueueListener:
+    """یک thread نویسنده که رکوردهای صف را دسته‌ای به handlerها می‌دهد و یک بار flush می‌کند"""
+    
+    _STOP = object()
+    
+    def __init__(self, log_queue: queue.Queue, handlers: list, counters: dict,
+                 batch_size: int = 256):
+        self.queue = log_queue
+        self.handlers = handlers
+        self.counters = counters
+        self.batch_size = batch_size
+        self._thread = None
+        
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+        
+    def stop(self):
+        """نوشتن رکوردهای باقی‌مانده و توقف thread"""
+        if self._thread:
+            self.queue.put(self._STOP)
+            self._thread.join()
+            self._thread = None
+            
+    def _run(self):
+        running = True
+        while running:
+            record = self.queue.get()
+            if record is self._STOP:
+                break
+                
+            batch = [record]
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is self._STOP:
+                    running = False
+                    break
+                batch.append(record)
+                
+            self._write_batch(batch)
+            
+    def _write_batch(self, batch: list):
+        for handler in self.handlers:
+            if isinstance(handler, BatchRotatingFileHandler):
+                handler.deferred = True
+                
+        for record in batch:
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+                    
+        for handler in self.handlers:
+            if isinstance(handler, BatchRotatingFileHandler):
+                handler.deferred = False
+            handler.flush()
+            
+        self.counters['written'] += len(batch)
+        self.counters['batches'] += 1
+        self.counters['max_batch'] = max(self.counters['max_batch'], len(batch))
 
 class AdvancedLogger:
-    """سیستم لاگ‌گیری پیشرفته"""
+    """سیستم لاگ‌گیری پیشرفته (نوشتن غیرمسدودکننده از طریق صف و یک thread نویسنده)"""
     
-    def __init__(self, name: str, log_dir: str = "logs"):
+    def __init__(self, name: str, log_dir: str = "logs", queue_size: int = 10000,
+                 batch_size: int = 256):
         self.name = name
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(exist_ok=True)
@@ -30,10 +128,9 @@ class AdvancedLogger:
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setLevel(logging.INFO)
         console_handler.setFormatter(formatter)
-        self.logger.addHandler(console_handler)
         
         # Handler فایل برای همه لاگ‌ها
-        file_handler = logging.handlers.RotatingFileHandler(
+        file_handler = BatchRotatingFileHandler(
             self.log_dir / 'bot.log',
             maxBytes=10 * 1024 * 1024,  # 10MB
             backupCount=5,
@@ -41,10 +138,9 @@ class AdvancedLogger:
         )
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(formatter)
-        self.logger.addHandler(file_handler)
         
         # Handler فایل برای خطاها
-        error_handler = logging.handlers.RotatingFileHandler(
+        error_handler = BatchRotatingFileHandler(
             self.log_dir / 'errors.log',
             maxBytes=5 * 1024 * 1024,  # 5MB
             backupCount=3,
@@ -52,10 +148,9 @@ class AdvancedLogger:
         )
         error_handler.setLevel(logging.ERROR)
         error_handler.setFormatter(formatter)
-        self.logger.addHandler(error_handler)
         
-        # Handler فایل برای فعالیت کاربران
-        user_handler = logging.handlers.RotatingFileHandler(
+        # Handler فایل برای فعالیت کاربران (فقط رکوردهای دارای user_id)
+        user_handler = BatchRotatingFileHandler(
             self.log_dir / 'users.log',
             maxBytes=10 * 1024 * 1024,
             backupCount=5,
@@ -66,7 +161,55 @@ class AdvancedLogger:
             '%(asctime)s - USER:%(user_id)s - ACTION:%(action)s - %(message)s'
         )
         user_handler.setFormatter(user_formatter)
-        self.logger.addHandler(user_handler)
+        user_handler.addFilter(lambda record: hasattr(record, 'user_id'))
+        
+        # لاگ فعالیت ساختاریافته (JSON lines + ایندکس زمانی) برای فعالیت کاربران و رویدادهای امنیتی
+        self.activity = ActivityLog(self.log_dir / 'activity.jsonl')
+        activity_handler = ActivityLogHandler(self.activity)
+        
+        # صف محدود + یک thread نویسنده؛ فراخوانی‌های لاگ فقط رکورد را در صف می‌گذارند
+        self.counters = {
+            'enqueued': 0,
+            'dropped': 0,
+            'dropped_by_level': {},
+            'written': 0,
+            'batches': 0,
+            'max_batch': 0
+        }
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.queue_handler = BoundedQueueHandler(self.queue, self.counters)
+        self.logger.addHandler(self.queue_handler)
+        
+        self.listener = BatchingQueueListener(
+            self.queue,
+            [console_handler, file_handler, error_handler, user_handler, activity_handler],
+            self.counters,
+            batch_size=batch_size
+        )
+        self.listener.start()
+        atexit.register(self.close)
+        
+    def capture_root_logger(self):
+        """هدایت لاگ‌های سایر ماژول‌ها (root logger) به همین صف به جای handlerهای مستقیم"""
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.queue_handler)
+        
+    def get_pipeline_stats(self) -> dict:
+        """آمار صف لاگ (تعداد حذف شده، عمق صف و ...)"""
+        return {
+            **self.counters,
+            'dropped_by_level': dict(self.counters['dropped_by_level']),
+            'queue_depth': self.queue.qsize(),
+            'queue_size': self.queue.maxsize
+        }
+        
+    def close(self):
+        """نوشتن همه رکوردهای صف و بستن فایل‌ها"""
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
     
     def log_user_action(self, user_id: int, action: str, details: str = "", 
                        extra_data: dict = None):
@@ -117,35 +260,36 @@ class AdvancedLogger:
     def log_security_event(self, event_type: str, user_id: int = None, 
                           details: str = "", severity: str = "MEDIUM"):
         """ثبت رویداد امنیتی"""
-        log_data = {
-            'timestamp': datetime.now().isoformat(),
-            'event_type': event_type,
-            'user_id': user_id,
-            'severity': severity,
-            'details': details
-        }
-        
-        # ذخیره در فایل JSON
-        security_log = self.log_dir / 'security.json'
-        with open(security_log, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
         
-        # همچنین در لاگ معمولی
+        # یک رکورد: متن در لاگ معمولی و رکورد ساختاریافته در activity.jsonl (توسط thread نویسنده)
         self.logger.warning(
             f"رویداد امنیتی: {event_type} - کاربر: {user_id} - جزئیات: {details}",
-            extra={'user_id': user_id or 'system', 'action': 'security_event'}
+            extra={
+                'user_id': user_id or 'system',
+                'action': 'security_event',
+                'event_type': event_type,
+                'severity': severity
+            }
         )
     
+    def get_activity(self, limit: int = 50, user_id: int = None, action: str = None,
+                     since: float = None, until: float = None) -> list:
+        """جدیدترین رکوردهای فعالیت با فیلتر (خواندن از انتهای فایل، بدون بارگذاری کامل)"""
+        return self.activity.tail(limit, user_id=user_id, action=action, since=since, until=until)
+        
+    def get_security_events(self, limit: int = 20, since: float = None) -> list:
+        """جدیدترین رویدادهای امنیتی"""
+        return self.activity.tail(limit, action='security_event', since=since)
+        
     def get_recent_logs(self, lines: int = 100, log_type: str = "bot") -> list:
-        """دریافت لاگ‌های اخیر"""
+        """دریافت لاگ‌های اخیر (خواندن بلوکی از انتهای فایل)"""
         log_file = self.log_dir / f"{log_type}.log"
         
         if not log_file.exists():
             return []
         
         try:
-            with open(log_file, 'r', encoding='utf-8') as f:
-                all_lines = f.readlines()
-                return all_lines[-lines:]
-        except:
+            recent = list(islice(read_lines_reverse(log_file), lines))
+            return [line.decode('utf-8', errors='replace') + '\n' for line in reversed(recent)]
+        except OSError:
             return []
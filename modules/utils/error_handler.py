@@ -4,12 +4,14 @@ import sys
 from typing import Optional, Dict, Any
 from datetime import datetime
 from pyrogram.errors import FloodWait, BadRequest, Unauthorized
+from database.crud import CRUDOperations
 
 class ErrorHandler:
     """مدیریت خطاهای ربات"""
     
-    def __init__(self, db_manager=None):
+    def __init__(self, db_manager=None, stats_collector=None):
         self.db = db_manager
+        self.stats_collector = stats_collector  # شمارنده خطاهای امروز پنل ادمین (اختیاری)
         
     async def handle_error(self, error: Exception, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """مدیریت خطاها"""
@@ -115,6 +117,9 @@ class ErrorHandler:
                         context: Optional[Dict], traceback_str: str = None):
         """ذخیره خطا در دیتابیس"""
         
+        if self.stats_collector:
+            self.stats_collector.record_error()
+            
         if self.db:
             try:
                 log_data = {
@@ -130,11 +135,8 @@ class ErrorHandler:
                 }
                 
                 # ذخیره در دیتابیس
-                with self.db.get_session() as session:
-                    from database.models import SystemLog
-                    log = SystemLog(**log_data)
-                    session.add(log)
-                    session.commit()
+                async with self.db.get_async_session() as session:
+                    await CRUDOperations.log_system_event(session, log_data)
                     
             except Exception as e:
                 # اگر ذخیره در دیتابیس شکست خورد، در فایل ذخیره کن
@@ -2,10 +2,11 @@
 import os
 import hashlib
 import re
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Dict
 from urllib.parse import urlparse
 from pathlib import Path
 import mimetypes
+from modules.core.executor import executor
 
 class Helpers:
     """توابع کمکی"""
@@ -47,11 +48,17 @@ class Helpers:
         """محاسبه هش فایل"""
         hash_func = getattr(hashlib, algorithm)()
         
+        # بلوک‌های 1MB؛ hashlib برای بلوک‌های بزرگ GIL را آزاد می‌کند
         with open(file_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b''):
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
                 hash_func.update(chunk)
         
         return hash_func.hexdigest()
+        
+    @staticmethod
+    async def get_file_hash_async(file_path: str, algorithm: str = 'md5') -> str:
+        """محاسبه هش فایل در executor بدون مسدود کردن event loop"""
+        return await executor.run_cpu(Helpers.get_file_hash, file_path, algorithm)
     
     @staticmethod
     def get_file_info(file_path: str) -> Dict:
@@ -1,7 +1,8 @@
 # modules/utils/speed_limiter.py
 import asyncio
 import time
-from typing import Optional, Callable
+from collections import OrderedDict
+from typing import Optional, Callable, Hashable
 
 class SpeedLimiter:
     """محدود کننده سرعت دانلود/آپلود"""
@@ -48,36 +49,110 @@ class SpeedLimiter:
         self.start_time = None
         self.total_bytes = 0
 
+class TokenBucket:
+    """سطل توکن؛ acquire با هزینه ثابت و صف انتظار FIFO"""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # توکن بر ثانیه
+        self.capacity = capacity  # حداکثر burst
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()  # منتظرها به ترتیب ورود سرویس می‌گیرند
+        
+    def _refill(self, clamp: bool = True) -> float:
+        now = time.monotonic()
+        self.tokens += (now - self.updated) * self.rate
+        if clamp:
+            self.tokens = min(self.capacity, self.tokens)
+        self.updated = now
+        return self.tokens
+        
+    def set_rate(self, rate: float, capacity: float):
+        """تغییر نرخ؛ توکن‌های جمع شده تا این لحظه با نرخ قبلی حساب می‌شوند"""
+        self._refill()
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = min(self.tokens, capacity)
+        
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """دریافت بدون انتظار؛ اگر کسی در صف باشد نوبت او حفظ می‌شود"""
+        if self._lock.locked() or self._refill() < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+        
+    async def acquire(self, tokens: float = 1):
+        """انتظار تا وجود توکن کافی؛ درخواست بزرگ‌تر از capacity هم به اندازه کامل خود منتظر می‌ماند"""
+        async with self._lock:
+            deficit = tokens - self._refill()
+            if deficit > 0:
+                await asyncio.sleep(deficit / self.rate)
+                # توکن‌های زمان انتظار متعلق به همین درخواست است؛ سقف capacity اعمال نمی‌شود
+                self._refill(clamp=False)
+            self.tokens -= tokens
+            
+    @property
+    def is_idle(self) -> bool:
+        """سطل پر و بدون منتظر؛ حذف آن با یک سطل تازه تفاوتی ندارد"""
+        return not self._lock.locked() and self._refill() >= self.capacity
+
 class RateLimiter:
-    """محدود کننده Rate برای API"""
+    """محدود کننده Rate برای API (سطل توکن: max_calls در هر period با burst برابر max_calls)"""
     
     def __init__(self, max_calls: int, period: float):
         self.max_calls = max_calls
         self.period = period  # ثانیه
-        self.calls = []
+        self.bucket = TokenBucket(max_calls / period, max_calls)
     
     async def acquire(self):
         """دریافت اجازه اجرا"""
-        now = time.time()
-        
-        # حذف callهای قدیمی
-        self.calls = [call for call in self.calls if now - call < self.period]
-        
-        if len(self.calls) >= self.max_calls:
-            # محاسبه زمان انتظار
-            oldest_call = self.calls[0]
-            wait_time = self.period - (now - oldest_call)
-            
-            if wait_time > 0:
-                await asyncio.sleep(wait_time)
-            
-            # حذف قدیمی‌ترین
-            self.calls.pop(0)
+        await self.bucket.acquire()
         
-        self.calls.append(time.time())
+    def try_acquire(self) -> bool:
+        """دریافت اجازه بدون انتظار"""
+        return self.bucket.try_acquire()
     
     def get_remaining_calls(self) -> int:
         """دریافت تعداد callهای باقی‌مانده"""
-        now = time.time()
-        self.calls = [call for call in self.calls if now - call < self.period]
-        return self.max_calls - len(self.calls)
+        return int(self.bucket._refill())
+
+class KeyedRateLimiter:
+    """یک سطل توکن جدا برای هر کلید (کاربر، اکانت، چت) با حذف LRU کلیدهای بیکار"""
+    
+    def __init__(self, max_calls: int, period: float, max_keys: int = 10000):
+        self.max_calls = max_calls
+        self.period = period  # ثانیه
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+        
+    def _bucket(self, key: Hashable) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.max_calls / self.period, self.max_calls)
+            self._evict()
+        else:
+            self.buckets.move_to_end(key)
+        return bucket
+        
+    def _evict(self):
+        """حذف قدیمی‌ترین کلیدها تا رسیدن به سقف؛ سطل‌های دارای منتظر حذف نمی‌شوند"""
+        for key in list(self.buckets):
+            if len(self.buckets) <= self.max_keys:
+                break
+            if not self.buckets[key]._lock.locked():
+                del self.buckets[key]
+                
+    async def acquire(self, key: Hashable):
+        """انتظار برای اجازه کلید"""
+        await self._bucket(key).acquire()
+        
+    def try_acquire(self, key: Hashable) -> bool:
+        """دریافت اجازه کلید بدون انتظار"""
+        return self._bucket(key).try_acquire()
+        
+    def prune(self) -> int:
+        """حذف همه سطل‌های پر و بیکار"""
+        idle = [key for key, bucket in self.buckets.items() if bucket.is_idle]
+        for key in idle:
+            del self.buckets[key]
+        return len(idle)
@@ -0,0 +1,87 @@
+# modules/utils/throughput.py
+import time
+from collections import deque
+from typing import Dict, Any, Optional
+
+class ThroughputMeter:
+    """تخمین سرعت لحظه‌ای یک انتقال با پنجره لغزان نمونه‌ها و هموارسازی EWMA"""
+    
+    def __init__(self, window: float = 10.0, resolution: float = 0.1, smoothing: float = 0.3):
+        self.window = window  # ثانیه؛ نمونه‌های قدیمی‌تر حذف می‌شوند
+        self.resolution = resolution  # نمونه‌های نزدیک‌تر از این فاصله ادغام می‌شوند
+        self.smoothing = smoothing  # وزن نمونه جدید در EWMA
+        
+        self.started = time.monotonic()
+        self.total = 0
+        self.samples: deque = deque()  # (زمان، بایت تجمعی)
+        self._ewma: Optional[float] = None
+        
+    def add(self, nbytes: int):
+        """ثبت nbytes بایت منتقل شده"""
+        self.total += nbytes
+        now = time.monotonic()
+        
+        if self.samples and now - self.samples[-1][0] < self.resolution:
+            self.samples[-1] = (self.samples[-1][0], self.total)
+            return
+            
+        self.samples.append((now, self.total))
+        while len(self.samples) > 2 and now - self.samples[0][0] > self.window:
+            self.samples.popleft()
+            
+        rate = self._window_rate()
+        if rate is not None:
+            self._ewma = rate if self._ewma is None else (
+                self.smoothing * rate + (1 - self.smoothing) * self._ewma
+            )
+            
+    def set_total(self, total: int):
+        """ثبت مقدار تجمعی (برای callbackهایی که فقط current می‌دهند)"""
+        if total > self.total:
+            self.add(total - self.total)
+            
+    def _window_rate(self) -> Optional[float]:
+        if len(self.samples) < 2:
+            return None
+        (start, start_bytes), (end, end_bytes) = self.samples[0], self.samples[-1]
+        if end <= start:
+            return None
+        return (end_bytes - start_bytes) / (end - start)
+        
+    @property
+    def speed(self) -> float:
+        """سرعت فعلی (بایت بر ثانیه)؛ اگر انتقال متوقف شده باشد به سمت صفر می‌رود"""
+        if self._ewma is None:
+            return self.average_speed
+        if not self.samples:
+            return 0.0
+            
+        # بدون نمونه جدید، سرعت تا آخرین نمونه پنجره کاهش می‌یابد
+        idle = time.monotonic() - self.samples[-1][0]
+        if idle > self.window:
+            return 0.0
+        return self._ewma * min(1.0, self.window / (self.window + idle))
+        
+    @property
+    def average_speed(self) -> float:
+        """میانگین سرعت از شروع انتقال"""
+        elapsed = time.monotonic() - self.started
+        return self.total / elapsed if elapsed > 0 else 0.0
+        
+    def eta(self, total_size: int, done: Optional[int] = None) -> float:
+        """زمان باقی‌مانده (ثانیه)؛ 0 اگر نامشخص"""
+        done = self.total if done is None else done
+        speed = self.speed
+        if speed <= 0 or total_size <= 0:
+            return 0.0
+        return max(0.0, (total_size - done) / speed)
+        
+    def snapshot(self, total_size: int = 0, done: Optional[int] = None) -> Dict[str, Any]:
+        """خلاصه برای پیام پیشرفت و متریک‌ها"""
+        return {
+            'speed': self.speed,
+            'average_speed': self.average_speed,
+            'eta': self.eta(total_size, done),
+            'elapsed': time.monotonic() - self.started,
+            'transferred': self.total
+        }
@@ -1,37 +1,68 @@
 # src/core/security.py
 import hashlib
 import base64
+import threading
+import time
+from collections import OrderedDict
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import os
+from modules.core.executor import executor
 
 class AdvancedSecurity:
     """سیستم امنیتی پیشرفته با رمزنگاری چند لایه"""
     
-    def __init__(self):
+    def __init__(self, key_cache_size: int = 1024, key_cache_ttl: int = 3600):
         self.master_key = self._generate_master_key()
         
+        # کش کلیدهای مشتق شده از PBKDF2 برای رمزگشایی (salt -> (key, انقضا))
+        self.key_cache_size = key_cache_size
+        self.key_cache_ttl = key_cache_ttl
+        self._key_cache: OrderedDict = OrderedDict()
+        self._key_cache_lock = threading.Lock()  # اشتقاق کلید در thread انجام می‌شود
+        
     def _generate_master_key(self) -> bytes:
         """تولید کلید اصلی از entropy سیستم"""
         entropy = os.urandom(32) + str(os.getpid()).encode() + str(time.time()).encode()
         return hashlib.sha512(entropy).digest()
     
     def encrypt_session(self, session_data: str, user_id: int) -> dict:
-        """رمزنگاری session با الگوریتم ترکیبی"""
-        # تولید salt منحصر به فرد
+        """رمزنگاری session با الگوریتم ترکیبی (salt تصادفی جدید برای هر session)"""
         salt = os.urandom(16)
+        key = self._derive_key(salt)
         
-        # تولید کلید از PBKDF2
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(self.master_key))
+        return self._encrypt_with_key(key, salt, session_data, user_id)
+        
+    async def encrypt_session_async(self, session_data: str, user_id: int) -> dict:
+        """رمزنگاری session بدون مسدود کردن event loop"""
+        salt = os.urandom(16)
+        key = await executor.run(self._derive_key, salt)
         
-        # رمزنگاری با Fernet
+        return self._encrypt_with_key(key, salt, session_data, user_id)
+        
+    def decrypt_session(self, encrypted_package: dict) -> str:
+        """رمزگشایی session"""
+        try:
+            salt = base64.b64decode(encrypted_package['salt'])
+            key = self._get_cached_key(salt) or self._derive_and_cache(salt)
+            
+            return self._decrypt_with_key(key, encrypted_package)
+        except Exception as e:
+            raise SecurityException(f"خطا در رمزگشایی: {str(e)}")
+            
+    async def decrypt_session_async(self, encrypted_package: dict) -> str:
+        """رمزگشایی session؛ PBKDF2 در thread اجرا می‌شود"""
+        try:
+            salt = base64.b64decode(encrypted_package['salt'])
+            key = self._get_cached_key(salt) or await executor.run(self._derive_and_cache, salt)
+            
+            return self._decrypt_with_key(key, encrypted_package)
+        except Exception as e:
+            raise SecurityException(f"خطا در رمزگشایی: {str(e)}")
+            
+    def _encrypt_with_key(self, key: bytes, salt: bytes, session_data: str, user_id: int) -> dict:
+        # رمزنگاری با Fernet (هر پیام IV تصادفی خودش را دارد)
         fernet = Fernet(key)
         encrypted_data = fernet.encrypt(session_data.encode())
         
@@ -42,27 +73,57 @@ class AdvancedSecurity:
             'timestamp': time.time(),
             'version': '2.0'
         }
-    
-    def decrypt_session(self, encrypted_package: dict) -> str:
-        """رمزگشایی session"""
-        try:
-            salt = base64.b64decode(encrypted_package['salt'])
-            encrypted_data = base64.b64decode(encrypted_package['encrypted_data'])
-            
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=salt,
-                iterations=100000,
-            )
-            key = base64.urlsafe_b64encode(kdf.derive(self.master_key))
+        
+    def _decrypt_with_key(self, key: bytes, encrypted_package: dict) -> str:
+        encrypted_data = base64.b64decode(encrypted_package['encrypted_data'])
+        
+        fernet = Fernet(key)
+        decrypted_data = fernet.decrypt(encrypted_data)
+        
+        return decrypted_data.decode()
+        
+    def _derive_key(self, salt: bytes) -> bytes:
+        """تولید کلید از PBKDF2 (پرهزینه؛ ~100k تکرار)"""
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=salt,
+            iterations=100000,
+        )
+        return base64.urlsafe_b64encode(kdf.derive(self.master_key))
+        
+    def _get_cached_key(self, salt: bytes):
+        """کلید کش شده salt ذخیره شده (فقط مسیر رمزگشایی؛ salt هر رمزنگاری تازه است)"""
+        with self._key_cache_lock:
+            entry = self._key_cache.get(salt)
+            if entry is None:
+                return None
+                
+            key, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._key_cache[salt]
+                return None
+                
+            self._key_cache.move_to_end(salt)
+            return key
             
-            fernet = Fernet(key)
-            decrypted_data = fernet.decrypt(encrypted_data)
+    def _derive_and_cache(self, salt: bytes) -> bytes:
+        key = self._derive_key(salt)
+        
+        with self._key_cache_lock:
+            self._key_cache[salt] = (key, time.monotonic() + self.key_cache_ttl)
+            self._key_cache.move_to_end(salt)
             
-            return decrypted_data.decode()
-        except Exception as e:
-            raise SecurityException(f"خطا در رمزگشایی: {str(e)}")
+            # حذف قدیمی‌ترین کلیدها (LRU)
+            while len(self._key_cache) > self.key_cache_size:
+                self._key_cache.popitem(last=False)
+                
+        return key
+        
+    def clear_key_cache(self):
+        """پاک کردن همه کلیدهای مشتق شده از حافظه"""
+        with self._key_cache_lock:
+            self._key_cache.clear()
 
 class SecurityException(Exception):
     """خطاهای امنیتی"""
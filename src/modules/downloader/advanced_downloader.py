@@ -2,62 +2,471 @@
 import asyncio
 import aiohttp
 import aiofiles
-from typing import List, Dict
+from typing import List, Dict, Optional
+from collections import deque
 import math
+import os
 from concurrent.futures import ThreadPoolExecutor
+from modules.core.http_pool import http_pool as default_http_pool
+from modules.core.bandwidth import download_bandwidth as default_download_bandwidth
+
+class PreallocatedFile:
+    """فایل مقصد از پیش رزرو شده برای نوشتن موقعیتی (pwrite) توسط چند worker"""
+    
+    def __init__(self, file_path: str, total_size: int):
+        self.file_path = file_path
+        self.total_size = total_size
+        self.fd: Optional[int] = None
+        
+    async def open(self):
+        """باز کردن فایل و رزرو فضای کامل آن روی دیسک"""
+        await asyncio.to_thread(self._open_sync)
+        
+    def _open_sync(self):
+        self.fd = os.open(self.file_path, os.O_RDWR | os.O_CREAT, 0o644)
+        
+        # رزرو فضا؛ در صورت عدم پشتیبانی فایل‌سیستم از fallocate، فقط طول فایل تنظیم می‌شود
+        try:
+            os.posix_fallocate(self.fd, 0, self.total_size)
+        except (AttributeError, OSError):
+            pass
+            
+        # fallocate فایل بزرگ‌تر قبلی را کوتاه نمی‌کند؛ بایت‌های اضافه آن نباید در خروجی بمانند
+        # (هنگام ادامه دانلود طول فایل همین است و چیزی تغییر نمی‌کند)
+        if os.fstat(self.fd).st_size != self.total_size:
+            os.ftruncate(self.fd, self.total_size)
+            
+    async def write_at(self, offset: int, data: bytes):
+        """نوشتن داده در آفست مشخص بدون جابجایی اشاره‌گر مشترک فایل"""
+        await asyncio.to_thread(self._write_at_sync, offset, data)
+        
+    def _write_at_sync(self, offset: int, data: bytes):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(self.fd, view, offset)
+            view = view[written:]
+            offset += written
+            
+    async def close(self, sync: bool = True):
+        """بستن فایل (به همراه fsync)"""
+        if self.fd is None:
+            return
+            
+        fd, self.fd = self.fd, None
+        
+        def _close():
+            try:
+                if sync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+                
+        await asyncio.to_thread(_close)
+
+class ByteRange:
+    """یک بازه بایتی از فایل که به یک worker سپرده شده است"""
+    
+    def __init__(self, start: int, end: int, attempts: int = 0):
+        self.start = start
+        self.end = end
+        self.position = start  # اولین بایتی که هنوز دریافت نشده
+        self.attempts = attempts
+        
+    @property
+    def remaining(self) -> int:
+        return self.end - self.position + 1
+
+class RangeScheduler:
+    """زمان‌بند پویای بازه‌ها با صف مشترک و قابلیت work-stealing"""
+    
+    def __init__(self, total_size: int, range_size: int, min_steal_size: int,
+                 max_retries: int = 3, missing: Optional[List[tuple]] = None):
+        # missing: بازه‌های (start, end) باقی‌مانده هنگام ادامه دانلود؛ پیش‌فرض کل فایل
+        if missing is None:
+            missing = [(0, total_size - 1)]
+            
+        self.pending = deque(
+            ByteRange(start, min(start + range_size - 1, gap_end))
+            for gap_start, gap_end in missing
+            for start in range(gap_start, gap_end + 1, range_size)
+        )
+        self.active: Dict[int, ByteRange] = {}  # worker_id -> بازه در حال دانلود
+        self.min_steal_size = min_steal_size
+        self.max_retries = max_retries
+        
+        # آمار
+        self.stolen = 0
+        self.reissued = 0
+        
+    def acquire(self, worker_id: int) -> Optional[ByteRange]:
+        """دریافت بازه بعدی؛ اگر صف خالی باشد، نیمه انتهایی کندترین بازه دزدیده می‌شود"""
+        byte_range = self.pending.popleft() if self.pending else self._steal()
+        
+        if byte_range is not None:
+            self.active[worker_id] = byte_range
+            
+        return byte_range
+        
+    def _steal(self) -> Optional[ByteRange]:
+        victim = max(self.active.values(), key=lambda r: r.remaining, default=None)
+        
+        if victim is None or victim.remaining < 2 * self.min_steal_size:
+            return None
+            
+        # worker قبلی با رسیدن به end جدید متوقف می‌شود
+        middle = victim.position + victim.remaining // 2
+        stolen = ByteRange(middle, victim.end)
+        victim.end = middle - 1
+        self.stolen += 1
+        
+        return stolen
+        
+    def complete(self, worker_id: int):
+        """اتمام موفق بازه worker"""
+        self.active.pop(worker_id, None)
+        
+    def reissue(self, worker_id: int) -> bool:
+        """بازگرداندن باقی‌مانده بازه متوقف/خطادار به ابتدای صف برای اتصال جدید"""
+        byte_range = self.active.pop(worker_id, None)
+        
+        if byte_range is None or byte_range.remaining <= 0:
+            return True
+            
+        if byte_range.attempts >= self.max_retries:
+            return False
+            
+        self.pending.appendleft(
+            ByteRange(byte_range.position, byte_range.end, byte_range.attempts + 1)
+        )
+        self.reissued += 1
+        
+        return True
 
 class MultiPartDownloader:
     """دانلود چند بخشی برای افزایش سرعت"""
     
-    def __init__(self, max_workers: int = 8):
+    def __init__(self, max_workers: int = 8, in_place: bool = True,
+                 work_stealing: bool = True, resume_store=None, http_pool=None,
+                 bandwidth=None):
         self.max_workers = max_workers
         self.chunk_size = 1024 * 1024 * 2  # 2MB chunks
         
-    async def download_file(self, url: str, file_path: str, 
-                           progress_callback=None) -> Dict:
+        # نوشتن مستقیم هر بخش در آفست خودش (بدون فایل‌های .part و مرحله ادغام)
+        self.in_place = in_place
+        self.write_buffer_size = 1024 * 1024  # 1MB بافر قبل از هر pwrite
+        
+        # زمان‌بندی پویا (فقط در حالت in_place)
+        self.work_stealing = work_stealing
+        self.range_size = 1024 * 1024 * 4  # 4MB بازه‌های صف مشترک
+        self.min_steal_size = 512 * 1024
+        self.stall_timeout = 15  # ثانیه بدون دریافت داده = اتصال متوقف
+        self.max_retries = 3
+        
+        # ژورنال Resume (اختیاری، فقط در حالت زمان‌بندی پویا)
+        self.resume_store = resume_store
+        
+        # استخر اتصال مشترک؛ بخش‌های یک فایل از اتصال‌های keep-alive همان میزبان استفاده می‌کنند
+        self.http_pool = http_pool or default_http_pool
+        
+        # همه بخش‌های یک فایل یک انتقال هستند و سهم پهنای باند مشترکی دارند
+        self.bandwidth = bandwidth or default_download_bandwidth
+        
+    async def download_file(self, url: str, file_path: str,
+                           progress_callback=None, account_key: Optional[str] = None) -> Dict:
         """دانلود فایل با تقسیم به بخش‌های موازی"""
         
-        async with aiohttp.ClientSession() as session:
+        async with self.bandwidth.transfer(account_key) as shaper:
+            return await self._download_file(url, file_path, progress_callback, shaper)
+            
+    async def _download_file(self, url: str, file_path: str, progress_callback, shaper) -> Dict:
+        async with self.http_pool.session() as session:
             # دریافت اطلاعات فایل
             async with session.head(url) as response:
                 total_size = int(response.headers.get('content-length', 0))
+                accepts_ranges = response.headers.get('accept-ranges', '').lower() == 'bytes'
                 
-                if total_size == 0:
-                    # اگر سایز مشخص نبود، دانلود عادی
-                    return await self._simple_download(session, url, file_path, progress_callback)
+            if total_size == 0 or not accepts_ranges:
+                # اگر سایز مشخص نبود یا سرور Range پشتیبانی نمی‌کند، دانلود عادی
+                return await self._simple_download(session, url, file_path, progress_callback, shaper)
                 
-                # محاسبه تعداد بخش‌ها
-                num_parts = min(self.max_workers, math.ceil(total_size / self.chunk_size))
-                chunk_size = math.ceil(total_size / num_parts)
+            if self.in_place and self.work_stealing:
+                validator = response.headers.get('etag') or response.headers.get('last-modified')
+                return await self._download_dynamic(
+                    session, url, file_path, total_size, progress_callback, validator, shaper
+                )
                 
+            # محاسبه تعداد بخش‌ها
+            num_parts = min(self.max_workers, math.ceil(total_size / self.chunk_size))
+            chunk_size = math.ceil(total_size / num_parts)
+            
+            progress_state = {'downloaded': 0, 'shaper': shaper}
+            target = None
+            errors = None
+            
+            if self.in_place:
+                target = PreallocatedFile(file_path, total_size)
+                await target.open()
+                
+            try:
                 # ایجاد لیست وظایف
                 tasks = []
                 for i in range(num_parts):
                     start = i * chunk_size
                     end = start + chunk_size - 1 if i < num_parts - 1 else total_size - 1
                     
-                    task = self._download_chunk(
-                        session, url, file_path, start, end, i, 
-                        progress_callback, total_size
-                    )
+                    if self.in_place:
+                        task = self._download_range_in_place(
+                            session, url, target, start, end, i,
+                            progress_callback, total_size, progress_state
+                        )
+                    else:
+                        task = self._download_chunk(
+                            session, url, file_path, start, end, i,
+                            progress_callback, total_size, progress_state
+                        )
                     tasks.append(task)
-                
+                    
                 # اجرای موازی
                 results = await asyncio.gather(*tasks, return_exceptions=True)
+                errors = [r for r in results if isinstance(r, Exception)]
+            finally:
+                if target:
+                    await target.close()
+                    if errors is None or errors:
+                        # فایل پیش‌رزرو شده با حفره‌های صفر نباید به جای فایل کامل باقی بماند
+                        await asyncio.to_thread(self._discard, file_path)
+                        
+            if errors:
+                return {
+                    'success': False,
+                    'error': f'خطا در دانلود {len(errors)} بخش: {errors[0]}',
+                    'file_path': file_path
+                }
                 
+            if not self.in_place:
                 # ترکیب بخش‌ها
                 await self._merge_chunks(file_path, num_parts)
                 
-                return {
-                    'success': True,
-                    'file_path': file_path,
-                    'total_size': total_size,
-                    'num_parts': num_parts,
-                    'chunk_size': chunk_size
-                }
-    
-    async def _download_chunk(self, session, url, file_path, 
-                             start, end, part_num, progress_callback, total_size):
+            return {
+                'success': True,
+                'file_path': file_path,
+                'total_size': total_size,
+                'num_parts': num_parts,
+                'chunk_size': chunk_size,
+                'in_place': self.in_place
+            }
+            
+    async def _download_dynamic(self, session, url: str, file_path: str,
+                               total_size: int, progress_callback=None,
+                               validator: Optional[str] = None, shaper=None) -> Dict:
+        """دانلود با صف مشترک بازه‌ها؛ اتصال‌های سریع دنباله اتصال‌های کند را برمی‌دارند"""
+        
+        resume_key, completed = await self._load_resume(url, file_path, total_size, validator)
+        missing = self.resume_store.missing_ranges(total_size, completed) if resume_key else None
+        
+        scheduler = RangeScheduler(
+            total_size, self.range_size, self.min_steal_size, self.max_retries, missing
+        )
+        num_workers = min(self.max_workers, len(scheduler.pending))
+        progress_state = {
+            'downloaded': sum(p['length'] for p in completed),
+            'resume_key': resume_key,
+            'shaper': shaper
+        }
+        
+        target = PreallocatedFile(file_path, total_size)
+        await target.open()
+        failed = True
+        
+        try:
+            results = await asyncio.gather(*[
+                self._range_worker(
+                    session, url, target, scheduler, worker_id,
+                    progress_callback, total_size, progress_state
+                )
+                for worker_id in range(num_workers)
+            ], return_exceptions=True)
+            errors = [r for r in results if isinstance(r, Exception)]
+            failed = bool(errors or scheduler.pending or scheduler.active)
+        finally:
+            await target.close()
+            if failed and not resume_key:
+                # بدون ژورنال Resume بازه‌های دریافت شده قابل استفاده نیستند
+                await asyncio.to_thread(self._discard, file_path)
+                
+        if failed:
+            return {
+                'success': False,
+                'error': f'خطا در دانلود: {errors[0] if errors else "بازه‌های ناتمام باقی ماند"}',
+                'file_path': file_path
+            }
+            
+        if resume_key:
+            await self.resume_store.clear(resume_key)
+            
+        return {
+            'success': True,
+            'file_path': file_path,
+            'total_size': total_size,
+            'num_parts': num_workers,
+            'chunk_size': self.range_size,
+            'in_place': True,
+            'stolen_ranges': scheduler.stolen,
+            'reissued_ranges': scheduler.reissued,
+            'resumed_bytes': sum(p['length'] for p in completed)
+        }
+        
+    async def _load_resume(self, url: str, file_path: str, total_size: int,
+                          validator: Optional[str]) -> tuple:
+        """بارگذاری بازه‌های تکمیل شده قبلی (با بررسی CRC روی دیسک)"""
+        
+        if not self.resume_store:
+            return None, []
+            
+        resume_key = self.resume_store.make_key('multipart', url, os.path.abspath(file_path))
+        state = await self.resume_store.get(resume_key)
+        
+        if state and state['total_size'] == total_size and state['validator'] == validator:
+            completed = await self.resume_store.verify_parts(file_path, state['parts'])
+            if completed:
+                return resume_key, completed
+                
+        await self.resume_store.begin(
+            resume_key, 'download', url, os.path.abspath(file_path), total_size,
+            part_size=self.write_buffer_size, validator=validator
+        )
+        
+        return resume_key, []
+        
+    async def _write_and_commit(self, target: PreallocatedFile, offset: int,
+                               data: bytes, progress_state: Dict):
+        """نوشتن داده و ثبت آن در ژورنال Resume"""
+        
+        await target.write_at(offset, data)
+        
+        if progress_state.get('resume_key'):
+            await self.resume_store.commit_part(
+                progress_state['resume_key'], offset, len(data),
+                await self.resume_store.checksum_async(data)
+            )
+        
+    async def _range_worker(self, session, url, target: PreallocatedFile,
+                           scheduler: RangeScheduler, worker_id: int,
+                           progress_callback, total_size, progress_state):
+        """یک اتصال که تا خالی شدن صف، بازه دریافت و دانلود می‌کند"""
+        
+        while True:
+            byte_range = scheduler.acquire(worker_id)
+            if byte_range is None:
+                return worker_id
+                
+            try:
+                await self._fetch_range(
+                    session, url, target, byte_range,
+                    progress_callback, total_size, progress_state, worker_id
+                )
+                scheduler.complete(worker_id)
+                
+            except (aiohttp.ClientError, asyncio.TimeoutError, IOError):
+                # اتصال متوقف یا قطع شد؛ باقی‌مانده با یک اتصال تازه دوباره درخواست می‌شود
+                if not scheduler.reissue(worker_id):
+                    raise
+                    
+    async def _fetch_range(self, session, url, target: PreallocatedFile,
+                          byte_range: ByteRange, progress_callback,
+                          total_size, progress_state, worker_id):
+        """دانلود یک بازه تا رسیدن به end (که ممکن است در حین دانلود با stealing کوچک شود)"""
+        
+        headers = {'Range': f'bytes={byte_range.position}-{byte_range.end}'}
+        timeout = aiohttp.ClientTimeout(
+            total=None, sock_connect=self.stall_timeout, sock_read=self.stall_timeout
+        )
+        write_offset = byte_range.position
+        buffer = bytearray()
+        
+        try:
+            async with session.get(url, headers=headers, timeout=timeout) as response:
+                if response.status != 206:
+                    raise aiohttp.ClientResponseError(
+                        response.request_info, response.history,
+                        status=response.status,
+                        message='سرور درخواست Range را نپذیرفت'
+                    )
+                    
+                async for chunk in response.content.iter_chunked(65536):
+                    allowed = byte_range.end - byte_range.position + 1
+                    if len(chunk) > allowed:
+                        chunk = chunk[:allowed]
+                        
+                    buffer.extend(chunk)
+                    byte_range.position += len(chunk)
+                    
+                    if len(buffer) >= self.write_buffer_size:
+                        await self._write_and_commit(
+                            target, write_offset, bytes(buffer), progress_state
+                        )
+                        write_offset += len(buffer)
+                        buffer.clear()
+                        
+                    await self._report_progress(
+                        progress_callback, progress_state, len(chunk), total_size, worker_id
+                    )
+                    
+                    if byte_range.position > byte_range.end:
+                        # بقیه بازه دزدیده شده است؛ اتصال رها می‌شود
+                        response.close()
+                        break
+        finally:
+            # داده‌های دریافت‌شده همیشه نوشته می‌شوند تا position با فایل هم‌خوان بماند
+            if buffer:
+                await self._write_and_commit(
+                    target, write_offset, bytes(buffer), progress_state
+                )
+                
+        if byte_range.position <= byte_range.end:
+            raise IOError(f'اتصال پیش از پایان بازه بسته شد ({byte_range.remaining} بایت باقی‌مانده)')
+            
+    async def _download_range_in_place(self, session, url, target: PreallocatedFile,
+                                      start, end, part_num, progress_callback,
+                                      total_size, progress_state):
+        """دانلود یک بازه و نوشتن مستقیم آن در آفست مربوطه از فایل نهایی"""
+        
+        headers = {'Range': f'bytes={start}-{end}'}
+        offset = start
+        buffer = bytearray()
+        
+        async with session.get(url, headers=headers) as response:
+            if response.status != 206:
+                raise aiohttp.ClientResponseError(
+                    response.request_info, response.history,
+                    status=response.status,
+                    message='سرور درخواست Range را نپذیرفت'
+                )
+                
+            async for chunk in response.content.iter_chunked(65536):
+                buffer.extend(chunk)
+                
+                if len(buffer) >= self.write_buffer_size:
+                    await target.write_at(offset, bytes(buffer))
+                    offset += len(buffer)
+                    buffer.clear()
+                    
+                await self._report_progress(
+                    progress_callback, progress_state, len(chunk), total_size, part_num
+                )
+                
+        if buffer:
+            await target.write_at(offset, bytes(buffer))
+            offset += len(buffer)
+            
+        if offset != end + 1:
+            raise IOError(f'بخش {part_num} ناقص دریافت شد ({offset - start} از {end - start + 1} بایت)')
+            
+        return part_num
+        
+    async def _download_chunk(self, session, url, file_path,
+                             start, end, part_num, progress_callback, total_size,
+                             progress_state):
         """دانلود یک بخش از فایل"""
         
         chunk_path = f"{file_path}.part{part_num}"
@@ -65,20 +474,99 @@ class MultiPartDownloader:
         
         async with session.get(url, headers=headers) as response:
             async with aiofiles.open(chunk_path, 'wb') as f:
-                downloaded = 0
                 async for chunk in response.content.iter_chunked(8192):
                     await f.write(chunk)
-                    downloaded += len(chunk)
                     
-                    if progress_callback:
-                        global_progress = start + downloaded
-                        percentage = (global_progress / total_size) * 100
-                        await progress_callback({
-                            'percentage': percentage,
-                            'downloaded': global_progress,
-                            'total': total_size,
-                            'part': part_num,
-                            'speed': 0  # محاسبه سرعت جداگانه
-                        })
-        
+                    await self._report_progress(
+                        progress_callback, progress_state, len(chunk), total_size, part_num
+                    )
+                    
         return chunk_path
+        
+    async def _report_progress(self, progress_callback, progress_state: Dict,
+                              chunk_len: int, total_size: int, part_num: int):
+        """به‌روزرسانی پیشرفت کلی تمام بخش‌ها (و مصرف سهم پهنای باند انتقال)"""
+        
+        progress_state['downloaded'] += chunk_len
+        
+        if progress_state.get('shaper'):
+            await progress_state['shaper'].consume(chunk_len)
+        
+        if progress_callback:
+            downloaded = progress_state['downloaded']
+            meter = progress_state['shaper'].meter if progress_state.get('shaper') else None
+            await progress_callback({
+                'percentage': (downloaded / total_size) * 100,
+                'downloaded': downloaded,
+                'total': total_size,
+                'part': part_num,
+                'speed': meter.speed if meter else 0,
+                'eta': meter.eta(total_size, downloaded) if meter else 0
+            })
+            
+    async def _merge_chunks(self, file_path: str, num_parts: int):
+        """ادغام فایل‌های .part در فایل نهایی (فقط در حالت غیر in_place)"""
+        
+        async with aiofiles.open(file_path, 'wb') as output:
+            for i in range(num_parts):
+                chunk_path = f"{file_path}.part{i}"
+                async with aiofiles.open(chunk_path, 'rb') as part:
+                    while True:
+                        data = await part.read(self.chunk_size)
+                        if not data:
+                            break
+                        await output.write(data)
+                os.remove(chunk_path)
+                
+    @staticmethod
+    def _discard(file_path: str):
+        """حذف فایل مقصد دانلود ناموفق"""
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+            
+    async def _simple_download(self, session, url: str, file_path: str,
+                              progress_callback=None, shaper=None) -> Dict:
+        """دانلود تک اتصالی برای سرورهایی که Range پشتیبانی نمی‌کنند"""
+        
+        downloaded = 0
+        
+        try:
+            async with session.get(url) as response:
+                # صفحه خطای سرور نباید به عنوان فایل ذخیره شود
+                response.raise_for_status()
+                total_size = int(response.headers.get('content-length', 0))
+                
+                async with aiofiles.open(file_path, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(65536):
+                        if shaper:
+                            await shaper.consume(len(chunk))
+                            
+                        await f.write(chunk)
+                        downloaded += len(chunk)
+                        
+                        if progress_callback and total_size > 0:
+                            await progress_callback({
+                                'percentage': (downloaded / total_size) * 100,
+                                'downloaded': downloaded,
+                                'total': total_size,
+                                'part': 0,
+                                'speed': shaper.meter.speed if shaper else 0,
+                                'eta': shaper.meter.eta(total_size, downloaded) if shaper else 0
+                            })
+                            
+            if total_size and downloaded != total_size:
+                raise IOError(f'فایل ناقص دریافت شد ({downloaded} از {total_size} بایت)')
+        except BaseException:
+            await asyncio.to_thread(self._discard, file_path)
+            raise
+            
+        return {
+            'success': True,
+            'file_path': file_path,
+            'total_size': downloaded,
+            'num_parts': 1,
+            'chunk_size': downloaded,
+            'in_place': False
+        }
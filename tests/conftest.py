@@ -0,0 +1,12 @@
+# tests/conftest.py
+import asyncio
+import pytest
+from database.models import DatabaseManager
+
+@pytest.fixture
+def db(tmp_path):
+    """دیتابیس SQLite موقت با همه جداول"""
+    db = DatabaseManager(f"sqlite:///{tmp_path / 'bot.db'}")
+    db.init_db()
+    yield db
+    asyncio.run(db.dispose())
@@ -0,0 +1,35 @@
+# tests/test_account_balancer.py
+import pytest
+from modules.core.account_balancer import AccountBalancer
+
+def test_acquire_spreads_by_in_flight_and_release_frees():
+    balancer = AccountBalancer()
+    
+    first = balancer.acquire(['a', 'b'], preferred='a')
+    second = balancer.acquire(['a', 'b'], preferred='a')
+    
+    assert (first, second) == ('a', 'b')
+    balancer.release('b')
+    assert balancer.pick(['a', 'b']) == 'b'
+
+def test_faster_account_takes_more_work():
+    balancer = AccountBalancer()
+    balancer.record_transfer('fast', 40 * 1024 * 1024, 10)
+    balancer.record_transfer('slow', 10 * 1024 * 1024, 10)
+    
+    picks = [balancer.acquire(['fast', 'slow']) for _ in range(5)]
+    
+    assert picks.count('fast') == 4
+
+def test_penalized_account_is_skipped_unless_all_are():
+    balancer = AccountBalancer()
+    balancer.penalize('a', 60)
+    
+    assert balancer.pick(['a', 'b'], preferred='a') == 'b'
+    
+    balancer.penalize('b', 120)
+    assert balancer.pick(['a', 'b']) == 'a'
+
+def test_pick_without_candidates_raises():
+    with pytest.raises(ValueError):
+        AccountBalancer().pick([])
@@ -0,0 +1,35 @@
+# tests/test_activity_log.py
+from modules.utils.activity_log import ActivityLog, read_lines_reverse
+
+def _filled_log(tmp_path, count=40):
+    # فایل کوچک و ایندکس متراکم تا چرخش و جستجوی ایندکس هر دو رخ دهند
+    log = ActivityLog(tmp_path / 'activity.jsonl', index_interval=200, max_bytes=1500)
+    for i in range(count):
+        log.append({'ts': 1000.0 + i, 'user_id': i % 3, 'action': 'download' if i % 2 else 'login'})
+    return log
+
+def test_read_lines_reverse_spans_blocks(tmp_path):
+    path = tmp_path / 'lines.txt'
+    path.write_bytes(b'one\ntwo\nthree\n')
+    
+    assert list(read_lines_reverse(path, block_size=4)) == [b'three', b'two', b'one']
+
+def test_tail_reads_newest_first_across_rotation(tmp_path):
+    log = _filled_log(tmp_path)
+    
+    assert (tmp_path / 'activity.jsonl.1').exists()
+    recent = log.tail(limit=20, user_id=0)
+    assert [e['ts'] for e in recent] == [1000.0 + i for i in range(39, -1, -1) if i % 3 == 0][:20]
+    assert [e['ts'] for e in log.tail(since=1037)] == [1039.0, 1038.0, 1037.0]
+    log.close()
+
+def test_query_range_is_ordered_and_bounded(tmp_path):
+    log = _filled_log(tmp_path)
+    
+    # فایل چرخیده شده فقط بخشی از تاریخچه را دارد؛ بازه هر دو فایل را پوشش می‌دهد
+    oldest = log.query_range(0)[0]['ts']
+    entries = log.query_range(oldest + 5, oldest + 30, action='download')
+    
+    expected = [t for t in range(int(oldest) + 5, int(oldest) + 31) if t % 2]
+    assert [e['ts'] for e in entries] == expected
+    log.close()
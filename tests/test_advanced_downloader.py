@@ -0,0 +1,146 @@
+# tests/test_advanced_downloader.py
+import asyncio
+import os
+import pytest
+from src.modules.downloader.advanced_downloader import (
+    PreallocatedFile, RangeScheduler, MultiPartDownloader
+)
+
+def _preallocate(path, size):
+    async def scenario():
+        target = PreallocatedFile(str(path), size)
+        await target.open()
+        await target.write_at(2, b'XY')
+        await target.close()
+    asyncio.run(scenario())
+
+def test_preallocated_file_truncates_stale_larger_file(tmp_path):
+    path = tmp_path / 'out.bin'
+    path.write_bytes(b'a' * 100)
+    
+    _preallocate(path, 6)
+    
+    assert path.read_bytes() == b'aaXYaa'
+
+def test_preallocated_file_extends_new_file(tmp_path):
+    path = tmp_path / 'out.bin'
+    
+    _preallocate(path, 6)
+    
+    assert path.read_bytes() == b'\0\0XY\0\0'
+
+def test_scheduler_splits_missing_ranges():
+    scheduler = RangeScheduler(100, 40, 10, missing=[(0, 49), (80, 99)])
+    
+    assert [(r.start, r.end) for r in scheduler.pending] == [(0, 39), (40, 49), (80, 99)]
+
+def test_idle_worker_steals_tail_of_largest_range():
+    scheduler = RangeScheduler(100, 100, 10)
+    victim = scheduler.acquire(0)
+    victim.position = 20
+    
+    stolen = scheduler.acquire(1)
+    
+    assert (stolen.start, stolen.end) == (60, 99)
+    assert victim.end == 59
+    assert scheduler.stolen == 1
+
+def test_small_remainder_is_not_stolen():
+    scheduler = RangeScheduler(100, 100, 30)
+    scheduler.acquire(0).position = 50
+    
+    assert scheduler.acquire(1) is None
+
+def test_reissue_resumes_from_position_until_retries_run_out():
+    scheduler = RangeScheduler(100, 100, 10, max_retries=1)
+    scheduler.acquire(0).position = 30
+    
+    assert scheduler.reissue(0)
+    retry = scheduler.acquire(0)
+    assert (retry.start, retry.end, retry.attempts) == (30, 99, 1)
+    
+    assert not scheduler.reissue(0)
+    assert not scheduler.pending and not scheduler.active
+
+class _Response:
+    def __init__(self, status, body):
+        self.status = status
+        self.headers = {'content-length': str(len(body) + 10)}
+        self.content = self
+        self.body = body
+        
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise IOError(f'HTTP {self.status}')
+            
+    async def iter_chunked(self, size):
+        yield self.body
+        
+    async def __aenter__(self):
+        return self
+        
+    async def __aexit__(self, *exc):
+        return False
+
+class _Session:
+    def __init__(self, response):
+        self.response = response
+        
+    def get(self, url, **kwargs):
+        return self.response
+
+@pytest.mark.parametrize('status', [200, 404])
+def test_simple_download_removes_failed_or_partial_file(tmp_path, status):
+    path = tmp_path / 'out.bin'
+    path.write_bytes(b'stale')
+    downloader = MultiPartDownloader()
+    
+    with pytest.raises(IOError):
+        asyncio.run(downloader._simple_download(
+            _Session(_Response(status, b'partial')), 'http://x', str(path)
+        ))
+        
+    assert not os.path.exists(path)
+
+class _RangeResponse(_Response):
+    def __init__(self, body, cut=None):
+        super().__init__(206, body[:cut] if cut else body)
+        
+    def close(self):
+        pass
+
+class _RangeSession:
+    """سرور Range ساختگی؛ cut_first پاسخ‌های نخست را ناقص می‌بندد"""
+    
+    def __init__(self, payload, cut_first=0):
+        self.payload = payload
+        self.cut_first = cut_first
+        self.requests = []
+        
+    def get(self, url, headers=None, **kwargs):
+        start, end = map(int, headers['Range'][len('bytes='):].split('-'))
+        self.requests.append((start, end))
+        body = self.payload[start:end + 1]
+        if self.cut_first:
+            self.cut_first -= 1
+            return _RangeResponse(body, cut=len(body) // 2)
+        return _RangeResponse(body)
+
+def test_dynamic_download_reissues_dropped_ranges(tmp_path):
+    payload = bytes(range(256)) * 40
+    path = tmp_path / 'out.bin'
+    downloader = MultiPartDownloader(max_workers=2)
+    downloader.range_size = 4096
+    downloader.min_steal_size = 256
+    downloader.write_buffer_size = 1024
+    session = _RangeSession(payload, cut_first=1)
+    
+    result = asyncio.run(downloader._download_dynamic(
+        session, 'http://x', str(path), len(payload)
+    ))
+    
+    assert result['success']
+    assert result['reissued_ranges'] == 1
+    assert path.read_bytes() == payload
+    # بازه قطع شده از position ادامه یافت، نه از ابتدا
+    assert (2048, 4095) in session.requests
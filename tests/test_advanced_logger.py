@@ -0,0 +1,49 @@
+# tests/test_advanced_logger.py
+import logging
+import queue
+from modules.utils.advanced_logger import BoundedQueueHandler, BatchingQueueListener
+
+def _counters():
+    return {'enqueued': 0, 'dropped': 0, 'dropped_by_level': {},
+            'written': 0, 'batches': 0, 'max_batch': 0}
+
+def _record(level, msg='m'):
+    return logging.LogRecord('test', level, __file__, 1, msg, None, None)
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.flushes = 0
+        
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+        
+    def flush(self):
+        self.flushes += 1
+
+def test_full_queue_drops_and_counts_by_level():
+    counters = _counters()
+    handler = BoundedQueueHandler(queue.Queue(maxsize=1), counters)
+    
+    for level in (logging.INFO, logging.DEBUG, logging.WARNING):
+        handler.handle(_record(level))
+        
+    assert counters['enqueued'] == 1
+    assert counters['dropped'] == 2
+    assert counters['dropped_by_level'] == {'DEBUG': 1, 'WARNING': 1}
+
+def test_listener_writes_queued_records_in_one_batch():
+    counters = _counters()
+    log_queue = queue.Queue()
+    for i in range(5):
+        log_queue.put(_record(logging.INFO, f'r{i}'))
+    target = RecordingHandler()
+    listener = BatchingQueueListener(log_queue, [target], counters, batch_size=10)
+    
+    listener.start()
+    listener.stop()
+    
+    assert target.messages == [f'r{i}' for i in range(5)]
+    assert counters['written'] == 5
+    assert counters['batches'] == 1 and target.flushes == 1
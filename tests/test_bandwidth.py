@@ -0,0 +1,39 @@
+# tests/test_bandwidth.py
+import asyncio
+import time
+from modules.core.bandwidth import BandwidthAllocator
+
+PART = 1024 * 1024  # اندازه قطعه GetFile
+
+async def _measure(shaper, parts: int) -> float:
+    """نرخ پایدار انتقال (پس از خالی شدن burst اولیه سطل)"""
+    await shaper.consume(int(shaper.bucket.capacity))
+    started = time.monotonic()
+    for _ in range(parts):
+        await shaper.consume(PART)
+    return parts * PART / (time.monotonic() - started)
+
+def test_single_transfer_reaches_configured_rate():
+    """نرخ هر انتقال کمتر از یک قطعه در ثانیه است (سطل بر اساس نرخ کوچک‌تر از قطعه می‌شد)"""
+    rate = PART
+    allocator = BandwidthAllocator(rate=rate)
+    
+    async def run():
+        async with allocator.transfer('acc') as shaper:
+            return await _measure(shaper, 3)
+            
+    achieved = asyncio.run(run())
+    assert rate * 0.9 <= achieved <= rate * 1.05
+
+def test_parallel_transfers_share_the_cap():
+    rate = 2 * PART
+    allocator = BandwidthAllocator(rate=rate)
+    
+    async def run():
+        async with allocator.transfer('a') as first, allocator.transfer('b') as second:
+            return await asyncio.gather(_measure(first, 2), _measure(second, 2))
+            
+    speeds = asyncio.run(run())
+    assert rate * 0.9 <= sum(speeds) <= rate * 1.05
+    for speed in speeds:
+        assert rate / 2 * 0.9 <= speed <= rate / 2 * 1.05
@@ -0,0 +1,76 @@
+# tests/test_client_pool.py
+import asyncio
+from modules.core.client_pool import ClientPool
+
+class FakeClient:
+    def __init__(self, name):
+        self.name = name
+        self.is_connected = False
+        
+    async def connect(self):
+        self.is_connected = True
+        
+    async def disconnect(self):
+        self.is_connected = False
+
+def _register(pool, *names):
+    for name in names:
+        pool.register(name, lambda name=name: FakeClient(name))
+
+def test_connects_lazily_and_evicts_least_recently_used():
+    pool = ClientPool(max_clients=2)
+    _register(pool, 'a', 'b', 'c')
+    disconnected = []
+    
+    async def on_disconnect(client):
+        disconnected.append(client.name)
+        
+    pool.add_disconnect_listener(on_disconnect)
+    
+    async def scenario():
+        assert pool.live_count == 0
+        for name in ('a', 'b', 'a', 'c'):
+            async with pool.client(name) as client:
+                assert client.is_connected
+                
+    asyncio.run(scenario())
+    
+    assert disconnected == ['b']
+    assert pool.stats['connects'] == 3 and pool.stats['evictions'] == 1
+
+def test_waits_for_a_slot_when_all_clients_are_busy():
+    order = []
+    
+    async def use(pool, name, hold):
+        async with pool.client(name):
+            order.append(f'+{name}')
+            await asyncio.sleep(hold)
+            order.append(f'-{name}')
+            
+    async def scenario():
+        # Condition داخل همان loop ساخته می‌شود (پایتون 3.9)
+        pool = ClientPool(max_clients=1)
+        _register(pool, 'a', 'b')
+        first = asyncio.create_task(use(pool, 'a', 0.05))
+        await asyncio.sleep(0.01)
+        await asyncio.gather(first, use(pool, 'b', 0))
+        return pool
+        
+    pool = asyncio.run(scenario())
+    
+    assert order == ['+a', '-a', '+b', '-b']
+    assert pool.stats['waits'] >= 1
+
+def test_reap_idle_disconnects_only_idle_clients():
+    pool = ClientPool(idle_timeout=0)
+    _register(pool, 'a', 'b')
+    
+    async def scenario():
+        async with pool.client('a'):
+            pass
+        async with pool.client('b'):
+            return await pool.reap_idle()
+            
+    assert asyncio.run(scenario()) == 1
+    assert pool.entries['a'].client is None
+    assert pool.entries['b'].client is not None
@@ -0,0 +1,26 @@
+# tests/test_database.py
+import asyncio
+from sqlalchemy import text
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+from database.models import DatabaseManager
+
+def test_file_sqlite_uses_queue_pool(tmp_path):
+    """URL پیش‌فرض (فایل SQLite) باید بدون خطا با pool ساخته شود"""
+    db = DatabaseManager(f"sqlite:///{tmp_path / 'bot.db'}", pool_size=3, max_overflow=2)
+    
+    async def check():
+        try:
+            async with db.async_engine.connect() as conn:
+                return (await conn.execute(text('PRAGMA journal_mode'))).scalar()
+        finally:
+            await db.async_engine.dispose()
+            
+    assert isinstance(db.async_engine.pool, AsyncAdaptedQueuePool)
+    assert db.async_engine.pool.size() == 3
+    assert asyncio.run(check()) == 'wal'
+    db.engine.dispose()
+
+def test_memory_sqlite_keeps_default_pool():
+    db = DatabaseManager("sqlite:///:memory:")
+    assert isinstance(db.async_engine.pool, StaticPool)
+    db.engine.dispose()
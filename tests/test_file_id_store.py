@@ -0,0 +1,43 @@
+# tests/test_file_id_store.py
+import asyncio
+import hashlib
+import os
+from modules.core.file_id_store import FileIdStore
+
+def test_file_ids_are_per_account_and_can_be_replaced_or_forgotten(db):
+    store = FileIdStore(db)
+    
+    async def scenario():
+        await store.remember('c1', 'acc1', 'FILE_A', 'document', 10)
+        miss_other_account = await store.get('c1', 'acc2')
+        await store.remember('c1', 'acc1', 'FILE_B', 'video', 10)
+        hit = await store.get('c1', 'acc1')
+        await store.forget('c1', 'acc1')
+        return miss_other_account, hit, await store.get('c1', 'acc1')
+        
+    miss_other_account, hit, forgotten = asyncio.run(scenario())
+    
+    assert miss_other_account is None
+    assert hit == {'file_id': 'FILE_B', 'media_type': 'video', 'file_size': 10}
+    assert forgotten is None
+
+def test_content_key_hashes_file_once_until_it_changes(tmp_path):
+    store = FileIdStore(db_manager=None)
+    path = tmp_path / 'a.bin'
+    path.write_bytes(b'hello')
+    
+    first = asyncio.run(store.content_key(str(path)))
+    assert first == hashlib.sha256(b'hello').hexdigest()
+    assert asyncio.run(store.content_key(str(path))) == first
+    assert len(store._memo) == 1
+    
+    path.write_bytes(b'hello, world')
+    os.utime(path, ns=(0, 1))  # mtime متفاوت حتی روی فایل‌سیستم کم‌دقت
+    assert asyncio.run(store.content_key(str(path))) == hashlib.sha256(b'hello, world').hexdigest()
+
+def test_source_key_skips_reading_the_file():
+    store = FileIdStore(db_manager=None)
+    
+    key = asyncio.run(store.content_key('/does/not/exist', source_key='uniq'))
+    
+    assert key == hashlib.sha256(b'source|uniq').hexdigest()
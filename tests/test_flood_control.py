@@ -0,0 +1,50 @@
+# tests/test_flood_control.py
+import asyncio
+import pytest
+from pyrogram.errors import FloodWait
+from modules.core.flood_control import FloodController
+
+def _failing(errors, result='ok'):
+    """تابعی که ابتدا errors را به ترتیب raise می‌کند و سپس result برمی‌گرداند"""
+    calls = []
+    
+    async def func():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+        
+    return func, calls
+
+def test_flood_wait_is_retried_and_reported():
+    flood = FloodController(jitter=0)
+    penalties = []
+    flood.add_listener(lambda key, seconds: penalties.append((key, seconds)))
+    func, calls = _failing([FloodWait(value=0)])
+    
+    assert asyncio.run(flood.call('acc', 'send_document', func)) == 'ok'
+    assert len(calls) == 2
+    assert penalties == [('acc', 0)]
+    assert flood.get_stats()['retries'] == 1
+
+def test_long_flood_wait_is_raised():
+    flood = FloodController(max_wait=10)
+    func, calls = _failing([FloodWait(value=60)])
+    
+    with pytest.raises(FloodWait):
+        asyncio.run(flood.call('acc', 'GetFile', func))
+    assert len(calls) == 1
+    assert flood.penalty('acc', 'GetFile') > 50
+
+def test_network_error_retried_only_for_idempotent_methods():
+    flood = FloodController(base_delay=0, jitter=0)
+    
+    func, calls = _failing([ConnectionError('reset')])
+    assert asyncio.run(flood.call('acc', 'SaveBigFilePart', func)) == 'ok'
+    assert len(calls) == 2
+    
+    # ارسال ممکن است قبل از timeout ثبت شده باشد؛ تکرار آن پیام تکراری می‌فرستد
+    func, calls = _failing([asyncio.TimeoutError()])
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(flood.call('acc', 'send_document', func))
+    assert len(calls) == 1
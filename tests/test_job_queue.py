@@ -0,0 +1,75 @@
+# tests/test_job_queue.py
+import asyncio
+from database.models import DownloadTask
+from modules.core.job_queue import DownloadJobQueue, DownloadJob
+
+def _task(db, task_id):
+    with db.get_session() as session:
+        return session.query(DownloadTask).filter_by(task_id=task_id).first()
+
+def test_per_user_limit_does_not_block_other_users(db):
+    running = {}
+    peak = {}
+    
+    async def scenario():
+        gate = asyncio.Event()
+        
+        async def handler(job):
+            running[job.user_id] = running.get(job.user_id, 0) + 1
+            peak[job.user_id] = max(peak.get(job.user_id, 0), running[job.user_id])
+            await gate.wait()
+            running[job.user_id] -= 1
+            return {'success': True}
+            
+        queue = DownloadJobQueue(db, handler, workers=4, per_user_limit=1)
+        await queue.start()
+        first = await queue.submit(1, {'url': 'a'})
+        await queue.submit(1, {'url': 'b'})
+        await queue.submit(2, {'url': 'c'})
+        await asyncio.sleep(0.2)
+        
+        stats = queue.get_stats()
+        gate.set()
+        while queue.pending or queue.running:
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return stats, first
+        
+    stats, first = asyncio.run(scenario())
+    
+    assert stats['running'] == 2 and stats['pending'] == 1
+    assert peak == {1: 1, 2: 1}
+    assert _task(db, first).status == 'completed'
+
+def test_crashed_jobs_are_retried_then_failed(db):
+    queue = DownloadJobQueue(db, None, max_attempts=2)
+    queue._create_task_sync(DownloadJob('dl_1', 1, {'url': 'a'}))
+    
+    queue._update_status_sync('dl_1', 'downloading')
+    assert [j.task_id for j in queue._load_unfinished_sync()] == ['dl_1']
+    assert _task(db, 'dl_1').retry_count == 1
+    
+    queue._update_status_sync('dl_1', 'downloading')
+    assert queue._load_unfinished_sync() == []
+    assert _task(db, 'dl_1').status == 'failed'
+
+def test_stop_returns_running_jobs_to_pending_without_counting(db):
+    async def scenario():
+        started = asyncio.Event()
+        
+        async def handler(job):
+            started.set()
+            await asyncio.sleep(60)
+            
+        queue = DownloadJobQueue(db, handler, workers=1, max_attempts=1)
+        await queue.start()
+        task_id = await queue.submit(1, {'url': 'a'})
+        await started.wait()
+        await queue.stop()
+        return queue, task_id
+        
+    queue, task_id = asyncio.run(scenario())
+    
+    assert _task(db, task_id).status == 'pending'
+    assert [j.task_id for j in queue._load_unfinished_sync()] == [task_id]
+    assert not _task(db, task_id).retry_count
@@ -0,0 +1,72 @@
+# tests/test_media_cache.py
+import asyncio
+from modules.core.media_cache import MediaCache
+
+def test_fetch_returns_independent_copy(tmp_path):
+    source = tmp_path / 'a.bin'
+    source.write_bytes(b'original')
+    cache = MediaCache(tmp_path / 'cache', 1024)
+    
+    async def scenario():
+        await cache.put('k', source, 'a.bin')
+        source.write_bytes(b'changed!')  # نوشتن دوباره روی مسیر دانلود
+        return await cache.fetch('k', tmp_path / 'out.bin')
+        
+    entry = asyncio.run(scenario())
+    
+    assert entry['size'] == 8
+    assert (tmp_path / 'out.bin').read_bytes() == b'original'
+    assert cache.get_stats()['hits'] == 1
+
+def test_truncated_cache_file_is_dropped(tmp_path):
+    source = tmp_path / 'a.bin'
+    source.write_bytes(b'original')
+    cache = MediaCache(tmp_path / 'cache', 1024)
+    
+    async def scenario():
+        entry = await cache.put('k', source, 'a.bin')
+        with open(entry['path'], 'wb') as f:
+            f.write(b'ori')
+        return await cache.fetch('k', tmp_path / 'out.bin')
+        
+    assert asyncio.run(scenario()) is None
+    assert 'k' not in cache.entries
+
+def test_lock_serializes_waiters_and_is_released_after_last_user(tmp_path):
+    cache = MediaCache(tmp_path, 1024)
+    inside = []
+    overlaps = []
+    
+    async def user(delay):
+        await asyncio.sleep(delay)
+        async with cache.lock('k'):
+            if inside:
+                overlaps.append(delay)
+            inside.append(delay)
+            await asyncio.sleep(0.01)
+            inside.remove(delay)
+            
+    async def scenario():
+        # سومی وقتی می‌رسد که اولی آزاد کرده ولی دومی هنوز منتظر است
+        await asyncio.gather(user(0), user(0.001), user(0.011))
+        
+    asyncio.run(scenario())
+    
+    assert overlaps == []
+    assert cache._locks == {}
+
+def test_eviction_skips_locked_keys(tmp_path):
+    cache = MediaCache(tmp_path / 'cache', 10)
+    for name in ('a', 'b'):
+        (tmp_path / name).write_bytes(b'123456')
+        
+    async def scenario():
+        await cache.put('a', tmp_path / 'a', 'a')
+        async with cache.lock('a'):
+            await cache.put('b', tmp_path / 'b', 'b')
+            
+    asyncio.run(scenario())
+    
+    # a قفل بود و حذف نشد؛ b جدیدتر است ولی تنها کلید قابل حذف بود
+    assert list(cache.entries) == ['a']
+    assert cache.get_stats()['evicted'] == 1
@@ -0,0 +1,74 @@
+# tests/test_parallel_media_downloader.py
+import asyncio
+import importlib.util
+import os
+import types
+import pytest
+from pyrogram.errors import FileReferenceExpired
+from pyrogram.file_id import FileId, FileType
+from modules.core.flood_control import FloodController
+
+# modules/downloader.py پوشه هم‌نام (namespace package) را پنهان می‌کند؛ ماژول از مسیر فایل بارگذاری می‌شود
+_spec = importlib.util.spec_from_file_location(
+    'parallel_media_downloader',
+    os.path.join(os.path.dirname(__file__), '..', 'modules', 'downloader', 'parallel_media_downloader.py')
+)
+_module = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_module)
+ParallelMediaDownloader = _module.ParallelMediaDownloader
+ParallelDownloadUnsupported = _module.ParallelDownloadUnsupported
+
+PART = 4
+
+def _message(reference: bytes, file_size: int = 10):
+    file_id = FileId(
+        file_type=FileType.DOCUMENT, dc_id=2, media_id=1,
+        access_hash=2, file_reference=reference
+    ).encode()
+    return types.SimpleNamespace(
+        id=7, chat=types.SimpleNamespace(id=100),
+        document=types.SimpleNamespace(file_id=file_id, file_size=file_size)
+    )
+
+class FakeClient:
+    name = 'acc'
+    
+    def __init__(self, fresh):
+        self.fresh = fresh
+        self.refetched = 0
+        
+    async def get_messages(self, chat_id, message_ids):
+        self.refetched += 1
+        return self.fresh
+
+def _downloader(payload: bytes):
+    downloader = ParallelMediaDownloader(window=3, max_retries=2, flood=FloodController())
+    downloader.part_size = PART
+    
+    async def fetch_part(client, location, dc_id, session_index, part):
+        if location.file_reference != b'new':
+            raise FileReferenceExpired()
+        return payload[part * PART:(part + 1) * PART]
+        
+    downloader._fetch_part = fetch_part
+    return downloader
+
+def test_expired_reference_is_refreshed_once_and_download_resumes(tmp_path):
+    payload = b'0123456789'
+    client = FakeClient(_message(b'new'))
+    target = str(tmp_path / 'out.bin')
+    
+    result = asyncio.run(_downloader(payload).download(client, _message(b'old'), target))
+    
+    assert result['file_size'] == len(payload)
+    assert open(target, 'rb').read() == payload
+    # همه workerها منقضی می‌شوند ولی پیام فقط یک بار دوباره دریافت می‌شود
+    assert client.refetched == 1
+
+def test_failed_refresh_falls_back(tmp_path):
+    client = FakeClient(None)
+    target = str(tmp_path / 'out.bin')
+    
+    with pytest.raises(ParallelDownloadUnsupported):
+        asyncio.run(_downloader(b'0123456789').download(client, _message(b'old'), target))
+    assert os.path.exists(target)
@@ -0,0 +1,69 @@
+# tests/test_progress_publisher.py
+import asyncio
+import types
+from pyrogram.errors import FloodWait
+from modules.ui.progress_publisher import ProgressPublisher
+
+class FakeMessage:
+    def __init__(self, flood_first=False):
+        self.chat = types.SimpleNamespace(id=1)
+        self.id = 2
+        self.edits = []
+        self.flood_first = flood_first
+        
+    async def edit_text(self, text):
+        if self.flood_first:
+            self.flood_first = False
+            raise FloodWait(value=0)
+        self.edits.append(text)
+
+def _publisher():
+    return ProgressPublisher(lambda data: f"{data['progress']}%", interval=0.05)
+
+def test_bursts_are_coalesced_to_latest_value():
+    publisher = _publisher()
+    message = FakeMessage()
+    
+    async def scenario():
+        for progress in range(10):
+            await publisher.update(message, {'progress': progress})
+        await asyncio.sleep(0.01)
+        for progress in range(10, 20):
+            await publisher.update(message, {'progress': progress})
+        await asyncio.sleep(0.1)
+        
+    asyncio.run(scenario())
+    
+    # هر دسته فقط با آخرین مقدارش ویرایش می‌شود؛ دسته دوم پس از interval
+    assert message.edits == ['9%', '19%']
+    assert publisher.stats['updates'] == 20
+
+def test_flood_wait_backs_off_and_retries_same_text():
+    publisher = _publisher()
+    message = FakeMessage(flood_first=True)
+    
+    async def scenario():
+        await publisher.update(message, {'progress': 5})
+        await asyncio.sleep(0.05)
+        
+    asyncio.run(scenario())
+    
+    assert message.edits == ['5%']
+    assert publisher.stats['flood_waits'] == 1
+    assert publisher.current_interval < 0.1  # پس از ویرایش موفق دوباره کوچک می‌شود
+
+def test_finish_cancels_pending_edit():
+    publisher = _publisher()
+    message = FakeMessage()
+    
+    async def scenario():
+        await publisher.update(message, {'progress': 1})
+        await asyncio.sleep(0.01)
+        await publisher.update(message, {'progress': 2})
+        await publisher.finish(message)
+        await asyncio.sleep(0.1)
+        
+    asyncio.run(scenario())
+    
+    assert message.edits == ['1%']
+    assert publisher.states == {}
@@ -0,0 +1,37 @@
+# tests/test_resume_store.py
+import asyncio
+from modules.core.resume_store import ResumeStore
+
+def _parts(*ranges):
+    return [{'offset': offset, 'length': length, 'checksum': 0} for offset, length in ranges]
+
+def test_missing_ranges_fill_gaps_and_tail():
+    parts = _parts((20, 10), (0, 10), (25, 10))
+    
+    assert ResumeStore.missing_ranges(50, parts) == [(10, 19), (35, 49)]
+    assert ResumeStore.missing_ranges(50, []) == [(0, 49)]
+
+def test_contiguous_size_stops_at_first_gap():
+    assert ResumeStore.contiguous_size(_parts((10, 10), (0, 10), (30, 5))) == 20
+    assert ResumeStore.contiguous_size(_parts((5, 5))) == 0
+
+def test_journal_round_trip_keeps_only_parts_that_match_disk(db, tmp_path):
+    store = ResumeStore(db)
+    path = tmp_path / 'out.bin'
+    path.write_bytes(b'aaaabbbb')
+    key = store.make_key('multipart', 'http://x', str(path))
+    
+    async def scenario():
+        await store.begin(key, 'download', 'http://x', str(path), 8, part_size=4)
+        await store.commit_part(key, 0, 4, store.checksum(b'aaaa'))
+        await store.commit_part(key, 4, 4, store.checksum(b'cccc'))  # روی دیسک تغییر کرده
+        state = await store.get(key)
+        valid = await store.verify_parts(str(path), state['parts'])
+        await store.clear(key)
+        return state, valid, await store.get(key)
+        
+    state, valid, cleared = asyncio.run(scenario())
+    
+    assert state['total_size'] == 8 and len(state['parts']) == 2
+    assert valid == [{'offset': 0, 'length': 4, 'checksum': store.checksum(b'aaaa')}]
+    assert cleared is None
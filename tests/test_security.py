@@ -0,0 +1,27 @@
+# tests/test_security.py
+import asyncio
+import base64
+from src.core.security import AdvancedSecurity
+
+def test_each_encryption_uses_a_fresh_salt():
+    security = AdvancedSecurity()
+    first = security.encrypt_session('session-a', 1)
+    second = asyncio.run(security.encrypt_session_async('session-b', 1))
+    
+    assert first['salt'] != second['salt']
+    assert security.decrypt_session(first) == 'session-a'
+    assert asyncio.run(security.decrypt_session_async(second)) == 'session-b'
+
+def test_decrypt_reuses_cached_key():
+    security = AdvancedSecurity()
+    package = security.encrypt_session('session', 7)
+    salt = base64.b64decode(package['salt'])
+    
+    assert security._get_cached_key(salt) is None  # رمزنگاری کلید را کش نمی‌کند
+    security.decrypt_session(package)
+    assert security._get_cached_key(salt) is not None
+    
+    derived = []
+    security._derive_key = lambda s: derived.append(s)
+    assert security.decrypt_session(package) == 'session'
+    assert derived == []
@@ -0,0 +1,60 @@
+# tests/test_smart_uploader.py
+import asyncio
+import pytest
+from modules.core.flood_control import FloodController
+from modules.uploader.smart_uploader import SmartUploader
+
+class FakeClient:
+    name = 'acc'
+    
+    def __init__(self, fail_part=None):
+        self.parts = {}
+        self.fail_part = fail_part
+        
+    async def invoke(self, query):
+        await asyncio.sleep(0)
+        if query.file_part == self.fail_part:
+            raise IOError('part rejected')
+        assert query.file_part not in self.parts
+        self.parts[query.file_part] = query.bytes
+        return True
+
+def _uploader():
+    uploader = SmartUploader(flood=FloodController())
+    uploader.chunk_size = 1024
+    uploader.upload_workers = 3
+    uploader.max_retries = 0
+    
+    async def send_big_file(client, chat_id, upload_id, total_parts, file_name):
+        return total_parts
+        
+    uploader._send_big_file = send_big_file
+    uploader.active_uploads['t'] = {'retries': 0}
+    return uploader
+
+def _upload(uploader, client, path, size):
+    return asyncio.run(uploader._upload_large_file(
+        client, str(path), 1, 'a.bin', 'document', None, 't', size
+    ))
+
+def test_parts_are_uploaded_once_each_in_parallel(tmp_path):
+    payload = bytes(range(256)) * 40  # 10 قطعه، آخری ناقص
+    path = tmp_path / 'a.bin'
+    path.write_bytes(payload)
+    client = FakeClient()
+    
+    total_parts = _upload(_uploader(), client, path, len(payload))
+    
+    assert total_parts == 10
+    assert b''.join(client.parts[p] for p in range(total_parts)) == payload
+
+def test_failed_part_stops_the_other_workers(tmp_path):
+    path = tmp_path / 'a.bin'
+    path.write_bytes(b'x' * 1024 * 20)
+    client = FakeClient(fail_part=1)
+    
+    with pytest.raises(IOError):
+        _upload(_uploader(), client, path, 1024 * 20)
+        
+    # workerهای دیگر پس از خطا قطعه جدیدی برنمی‌دارند
+    assert len(client.parts) < 19
@@ -0,0 +1,31 @@
+# tests/test_speed_limiter.py
+import asyncio
+import time
+from modules.utils.speed_limiter import TokenBucket
+
+def test_acquire_larger_than_capacity_keeps_rate():
+    """درخواست‌های بزرگ‌تر از capacity باید با همان نرخ سطل سرویس بگیرند"""
+    rate, capacity, request, count = 10_000_000, 100_000, 1_000_000, 5
+    bucket = TokenBucket(rate, capacity)
+    
+    async def run():
+        started = time.monotonic()
+        for _ in range(count):
+            await bucket.acquire(request)
+        return time.monotonic() - started
+        
+    elapsed = asyncio.run(run())
+    expected = (request * count - capacity) / rate
+    assert expected * 0.95 <= elapsed <= expected * 1.25
+    assert abs(bucket.tokens) < request * 0.25
+
+def test_acquire_within_capacity_is_immediate():
+    bucket = TokenBucket(1000, 500)
+    
+    async def run():
+        started = time.monotonic()
+        await bucket.acquire(400)
+        return time.monotonic() - started
+        
+    assert asyncio.run(run()) < 0.05
+    assert not bucket.try_acquire(400)
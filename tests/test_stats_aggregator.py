@@ -0,0 +1,40 @@
+# tests/test_stats_aggregator.py
+import asyncio
+from database.models import User
+from modules.core.stats_aggregator import UserStatsAggregator
+
+def _user(db, user_id):
+    with db.get_session() as session:
+        return session.query(User).filter_by(user_id=user_id).first()
+
+def test_flush_adds_batched_counters_to_rows(db):
+    with db.get_session() as session:
+        session.add_all([User(user_id=1, total_downloads=2), User(user_id=2)])
+        session.commit()
+        
+    aggregator = UserStatsAggregator(db)
+    aggregator.record(1, 'download', 100)
+    aggregator.record(1, 'download', 50)
+    aggregator.record(2, 'upload', 10)
+    
+    assert asyncio.run(aggregator.flush()) == 2
+    assert aggregator.pending == {}
+    
+    first, second = _user(db, 1), _user(db, 2)
+    assert (first.total_downloads, first.total_download_size) == (4, 150)
+    assert (second.total_uploads, second.total_upload_size) == (1, 10)
+
+class FailingDb:
+    def get_async_session(self):
+        raise ConnectionError('database is down')
+
+def test_failed_flush_merges_counters_back():
+    aggregator = UserStatsAggregator(FailingDb())
+    aggregator.record(1, 'download', 100)
+    
+    assert asyncio.run(aggregator.flush()) == 0
+    aggregator.record(1, 'download', 20)
+    
+    entry = aggregator.pending[1]
+    assert (entry['total_downloads'], entry['total_download_size']) == (2, 120)
+    assert aggregator.stats['failed_flushes'] == 1
@@ -0,0 +1,55 @@
+# tests/test_stats_collector.py
+import asyncio
+from datetime import datetime, timedelta
+from database.models import User, DownloadTask, SystemLog
+from modules.admin.stats_collector import DashboardStatsCollector
+
+def test_events_update_counters_and_avg_speed():
+    stats = DashboardStatsCollector(db_manager=None)
+    stats.record_transfer(1, 'download', 100, seconds=1)
+    stats.record_transfer(2, 'upload', 300, seconds=1)
+    stats.record_new_user(3)
+    stats.record_error()
+    
+    snapshot = stats.get_snapshot()
+    
+    assert snapshot['counters']['today_downloads'] == 1
+    assert snapshot['counters']['upload_size'] == 300
+    assert snapshot['counters']['new_today'] == 1
+    assert snapshot['active_24h'] == 3
+    assert snapshot['avg_speed'] == 200
+
+def test_roll_day_resets_only_daily_counters():
+    stats = DashboardStatsCollector(db_manager=None)
+    stats.record_transfer(1, 'download', 100)
+    stats.record_error()
+    stats.today -= timedelta(days=1)
+    
+    counters = stats.get_snapshot()['counters']
+    
+    assert counters['today_downloads'] == 0 and counters['today_errors'] == 0
+    assert counters['total_downloads'] == 1 and counters['download_size'] == 100
+
+def test_resync_replaces_drifted_counters_with_database_totals(db):
+    now = datetime.utcnow()
+    with db.get_session() as session:
+        session.add_all([
+            User(user_id=1, total_downloads=3, total_download_size=300, last_activity=now),
+            User(user_id=2, total_uploads=1, total_upload_size=50,
+                 last_activity=now - timedelta(days=3)),
+            DownloadTask(user_id=1, task_id='t1', status='completed', file_size=100),
+            DownloadTask(user_id=1, task_id='t2', status='failed', file_size=999),
+            SystemLog(level='ERROR', module='test', message='boom')
+        ])
+        session.commit()
+        
+    stats = DashboardStatsCollector(db)
+    stats.counters['total_downloads'] = 42  # انحراف شمارنده حافظه
+    asyncio.run(stats.resync())
+    
+    counters = stats.counters
+    assert (counters['total_users'], counters['total_downloads'], counters['download_size']) == (2, 3, 300)
+    assert (counters['total_uploads'], counters['upload_size']) == (1, 50)
+    assert (counters['today_downloads'], counters['today_download_size']) == (1, 100)
+    assert counters['today_errors'] == 1
+    assert stats.active_24h == 1
@@ -0,0 +1,65 @@
+# tests/test_stream_relay.py
+import asyncio
+import types
+from modules.core.media_cache import MediaCache
+from modules.uploader.stream_relay import StreamRelay
+
+class FakeFileIds:
+    def __init__(self, known=None):
+        self.known = known or {}
+        self.remembered = []
+        
+    async def content_key(self, file_path, source_key=None):
+        return f"key:{source_key}"
+        
+    @staticmethod
+    def account_key(client):
+        return client.name
+
+class FakeUploader:
+    chunk_size = 4
+    
+    def __init__(self, file_ids):
+        self.file_ids = file_ids
+        self.active_uploads = {}
+        
+    async def _send_known_file(self, client, chat_id, file_name, media_type, content_key):
+        file_id = self.file_ids.known.get(content_key)
+        if file_id:
+            return types.SimpleNamespace(id=55, document=types.SimpleNamespace(file_id=file_id))
+        return None
+        
+    @staticmethod
+    def _extract_file_id(message):
+        return message.document.file_id
+
+class FakeClient:
+    name = 'acc'
+    
+    def stream_media(self, message):
+        raise AssertionError('نباید دانلود شود')
+
+def _message():
+    return types.SimpleNamespace(
+        document=types.SimpleNamespace(file_unique_id='uniq', file_size=64 * 1024 * 1024)
+    )
+
+def test_known_file_id_is_resent_without_streaming(tmp_path):
+    uploader = FakeUploader(FakeFileIds({'key:uniq': 'FILE'}))
+    relay = StreamRelay(uploader, cache=MediaCache(tmp_path, 0))
+    
+    result = asyncio.run(relay.relay_message(FakeClient(), _message(), 1, 'a.bin'))
+    
+    assert result['success'] and result['reused']
+    assert result['file_id'] == 'FILE'
+
+def test_cached_media_falls_back_to_disk_path(tmp_path):
+    source = tmp_path / 'src.bin'
+    source.write_bytes(b'data')
+    cache = MediaCache(tmp_path / 'cache', 1024)
+    asyncio.run(cache.put(MediaCache.telegram_key('uniq'), source, 'src.bin'))
+    relay = StreamRelay(FakeUploader(FakeFileIds()), cache=cache)
+    
+    result = asyncio.run(relay.relay_message(FakeClient(), _message(), 1, 'a.bin'))
+    
+    assert not result['success'] and result['unsupported']
@@ -0,0 +1,51 @@
+# tests/test_throughput.py
+import pytest
+from modules.utils import throughput
+from modules.utils.throughput import ThroughputMeter
+
+MB = 1024 * 1024
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+        
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(throughput.time, 'monotonic', clock)
+    return clock
+
+def _feed(meter, clock, seconds, rate, step=0.5):
+    for _ in range(int(seconds / step)):
+        clock.now += step
+        meter.add(int(rate * step))
+
+def test_speed_follows_rate_change_and_eta(clock):
+    meter = ThroughputMeter(window=4)
+    _feed(meter, clock, 10, MB)
+    assert meter.speed == pytest.approx(MB, rel=0.01)
+    
+    _feed(meter, clock, 10, 4 * MB)
+    assert meter.speed == pytest.approx(4 * MB, rel=0.05)
+    assert meter.eta(meter.total + 8 * MB) == pytest.approx(2, rel=0.05)
+
+def test_stalled_transfer_decays_to_zero(clock):
+    meter = ThroughputMeter(window=4)
+    _feed(meter, clock, 4, MB)
+    
+    clock.now += 4
+    assert 0 < meter.speed < MB
+    clock.now += 1
+    assert meter.speed == 0 and meter.eta(10 * MB) == 0
+
+def test_close_samples_are_merged(clock):
+    meter = ThroughputMeter(resolution=0.1)
+    for _ in range(5):
+        clock.now += 0.01
+        meter.add(10)
+        
+    assert len(meter.samples) == 1 and meter.samples[0][1] == 50
+    assert meter.average_speed == pytest.approx(50 / 0.05)